@@ -1,8 +1,20 @@
+from __future__ import annotations
 from array import *
 from chessplayer import ChessPlayer
-from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+from functools import reduce
 from game import Game
+import json
+import numpy as np
+import random
+from resultstore import ResultStore
+from searchstats import SearchReport
 from tqdm import tqdm
+from typing import Any, Dict, List, Tuple
+
+# Copies of the players of the tournament in a worker process, set by the pool initializer
+_tournament_players: List[ChessPlayer] = None
 
 
 @dataclass
@@ -16,61 +28,253 @@ class Results:
     average_decision_time_player2: float
     average_moves_per_game: float
     iterations: int
+    # Searches of the matchup, for players that report them
+    search_report_player1: SearchReport = None
+    search_report_player2: SearchReport = None
 
     def __str__(self) -> str:
         return self.player1_name + " win percent:" + str(self.percent_wins_player1) + '\n' + \
             self.player2_name + " win percent:" + str(self.percent_wins_player2) + '\n' + \
             "draws percent:" + str(self.percent_draws) + '\n' +\
-            "number iterations:" + str(self.iterations) + '\n'
+            "number iterations:" + str(self.iterations) + '\n' + \
+            (self.player1_name + " search:" + str(self.search_report_player1) + '\n' if self.search_report_player1 is not None else "") + \
+            (self.player2_name + " search:" + str(self.search_report_player2) + '\n' if self.search_report_player2 is not None else "")
+
+@dataclass
+class GameOutcome:
+    # What a matchup needs to know of one of its games. The winner is 1 or 2 for player1 or
+    # player2 and None for a draw; the other fields hold player1 and player2 in that order.
+    winner: int
+    moves: Tuple[int, int]
+    decision_seconds: Tuple[float, float]
+    search_reports: Tuple[SearchReport, SearchReport]
+    # Process time of every move in the order they were made, player1's first when it started
+    player1_starts: bool = True
+    decision_times: List[float] = None
+    # Playouts and search seconds of the game, for players that count them
+    playouts: Tuple[int, int] = (None, None)
+    search_seconds: Tuple[float, float] = (None, None)
+
+    def to_record(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> GameOutcome:
+        return cls(
+            winner=record['winner'],
+            moves=tuple(record['moves']),
+            decision_seconds=tuple(record['decision_seconds']),
+            search_reports=tuple(SearchReport(**report) if report is not None else None for report in record['search_reports']),
+            player1_starts=record['player1_starts'],
+            decision_times=record['decision_times'],
+            playouts=tuple(record.get('playouts', (None, None))),
+            search_seconds=tuple(record.get('search_seconds', (None, None)))
+        )
+
+
+def game_seed(seed: int, baseline_index: int, testplayer_index: int, game_index: int) -> int:
+    # Seed of the random generators for one game of a tournament, the same in every process
+    return random.Random("%d:%d:%d:%d" % (seed, baseline_index, testplayer_index, game_index)).getrandbits(32)
+
+
+def play_game(player1: ChessPlayer, player2: ChessPlayer, player1_starts: bool, seed: int,
+        visual: bool, verbose: bool, ponder: bool) -> GameOutcome:
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed)
+    players = (player1, player2)
+    for player in players:
+        player.new_game()
+    moves_before = [player.total_moves for player in players]
+    seconds_before = [player.average_time_to_get_move * player.total_moves for player in players]
+    reports_before = [getattr(player, 'total_search_report', None) for player in players]
+    playouts_before = [getattr(player, 'total_playouts', None) for player in players]
+    search_seconds_before = [getattr(player, 'total_search_seconds', None) for player in players]
+    game = Game(
+        white=player1 if player1_starts else player2,
+        black=player2 if player1_starts else player1,
+        visual=visual,
+        verbose=verbose,
+        ponder=ponder
+    )
+    winner = game.run()
+    # If winner is True and player1_starts is True, player1 won
+    # If winner is False and player1_starts is False, player1 won
+    if winner is not None:
+        winner = 1 if winner == player1_starts else 2
+    return GameOutcome(
+        winner=winner,
+        moves=tuple(player.total_moves - before for player, before in zip(players, moves_before)),
+        decision_seconds=tuple(player.average_time_to_get_move * player.total_moves - before for player, before in zip(players, seconds_before)),
+        search_reports=tuple(player.total_search_report.since(before) if before is not None else None
+            for player, before in zip(players, reports_before)),
+        player1_starts=player1_starts,
+        decision_times=game.decision_times,
+        playouts=tuple(player.total_playouts - before if before is not None else None
+            for player, before in zip(players, playouts_before)),
+        search_seconds=tuple(player.total_search_seconds - before if before is not None else None
+            for player, before in zip(players, search_seconds_before))
+    )
+
+
+def _initialize_tournament_worker(players: List[ChessPlayer]) -> None:
+    global _tournament_players
+    _tournament_players = players
+
+
+def _play_tournament_game(player1_index: int, player2_index: int, player1_starts: bool, seed: int,
+        visual: bool, verbose: bool, ponder: bool) -> GameOutcome:
+    return play_game(_tournament_players[player1_index], _tournament_players[player2_index], player1_starts, seed,
+        visual, verbose, ponder)
+
 
 class AIChess:
-    def __init__(self, iterations: int, baselines: ChessPlayer, testplayers: array, visual: bool=False, verbose: bool=False) -> None:
+    def __init__(self, iterations: int, baselines: ChessPlayer, testplayers: array, visual: bool=False, verbose: bool=False, ponder: bool=False,
+            workers: int=1, seed: int=None, result_store: str=None) -> None:
         self.__iterations: int = iterations
         self.__visual: bool = visual
         self.__verbose: bool = verbose
+        self.__ponder: bool = ponder
         self.__results: array[array[Results]] = []
         self.__baselines: array[ChessPlayer] = baselines
         self.__testplayers: array[ChessPlayer] = testplayers
+        # With more than one worker the games of all matchups are played on a process pool, one
+        # game per task so long games do not hold up the others. Every worker has its own copy of
+        # the players, and what they learn in their games is added to the players afterwards.
+        self.__workers: int = workers
+        # Every game seeds random and NumPy from seed and its place in the tournament. Parallel
+        # tournaments always do, from a random seed when none is given.
+        self.__seed: int = seed
+        # Every finished game is appended to the JSON lines file result_store with the configuration
+        # of both players. Run again with players of the same configurations, the games found there
+        # are not played again but read back, and the seed of the stored games is used when none is given.
+        self.__store: ResultStore = ResultStore(result_store) if result_store is not None else None
+        self.__finished_games: Dict[tuple, GameOutcome] = {}
 
     def run(self) -> array:
+        self.__results = []
+        if self.__store is not None:
+            records = self.__store.records()
+            if self.__seed is None and records:
+                self.__seed = records[0]['tournament_seed']
+            self.__finished_games = {self.__record_key(record): GameOutcome.from_record(record) for record in records}
+        if self.__workers > 1:
+            return self.__run_in_parallel()
         counter: int = 0
         for baseline in self.__baselines:
-            for player in self.__testplayers:
-                self.__run_one_set_of_opponents(player1=player, player2=baseline, current_index=counter)
+            for index, player in enumerate(self.__testplayers):
+                self.__run_one_set_of_opponents(player1=player, player2=baseline, current_index=counter, testplayer_index=index)
             counter += 1
         return self.__results
 
-    def __run_one_set_of_opponents(self, player1: ChessPlayer, player2: ChessPlayer, current_index: int) -> None:
-        player1_wins = 0
-        draws = 0
-        total_moves = 0
-        player1_starts = True
+    def __game_key(self, baseline_index: int, testplayer_index: int, game_index: int) -> tuple:
+        return (self.__seed, baseline_index, testplayer_index, game_index,
+            self.__config_key(self.__testplayers[testplayer_index].get_config()),
+            self.__config_key(self.__baselines[baseline_index].get_config()))
 
-        for i in tqdm(range(self.__iterations)):
-            
-            game = Game(
-                white=player1 if player1_starts else player2,
-                black=player2 if player1_starts else player1,
-                visual=self.__visual,
-                verbose=self.__verbose
-            )
+    @staticmethod
+    def __config_key(config: Dict[str, Any]) -> str:
+        return json.dumps(config, sort_keys=True)
+
+    @staticmethod
+    def __record_key(record: Dict[str, Any]) -> tuple:
+        return (record['tournament_seed'], record['baseline'], record['testplayer'], record['game'],
+            AIChess.__config_key(record.get('player1_config')), AIChess.__config_key(record.get('player2_config')))
 
-            winner = game.run()
-            if winner is None:
-                draws += 1
+    def __store_game(self, key: tuple, seed: int, outcome: GameOutcome) -> None:
+        if self.__store is None:
+            return
+        tournament_seed, baseline_index, testplayer_index, game_index, _, _ = key
+        record = {
+            'tournament_seed': tournament_seed,
+            'baseline': baseline_index,
+            'testplayer': testplayer_index,
+            'game': game_index,
+            'player1': self.__testplayers[testplayer_index].get_name(),
+            'player2': self.__baselines[baseline_index].get_name(),
+            'player1_config': self.__testplayers[testplayer_index].get_config(),
+            'player2_config': self.__baselines[baseline_index].get_config(),
+            'seed': seed
+        }
+        record.update(outcome.to_record())
+        self.__store.append(record)
 
-            # If winner is True and player1_starts is True, player1 won
-            # If winner is False and player1_starts is False, player1 won
-            elif winner == player1_starts:
-                player1_wins += 1
+    def __run_one_set_of_opponents(self, player1: ChessPlayer, player2: ChessPlayer, current_index: int, testplayer_index: int) -> None:
+        outcomes: List[GameOutcome] = []
+        for i in tqdm(range(self.__iterations)):
+            key = self.__game_key(current_index, testplayer_index, i)
+            if key in self.__finished_games:
+                outcomes.append(self.__finished_games[key])
+                continue
+            seed = game_seed(self.__seed, current_index, testplayer_index, i) if self.__seed is not None else None
+            outcome = play_game(player1, player2, player1_starts=i % 2 == 0, seed=seed,
+                visual=self.__visual, verbose=self.__verbose, ponder=self.__ponder)
+            self.__store_game(key, seed, outcome)
+            outcomes.append(outcome)
+        self.__add_results(player1, player2, current_index, outcomes)
+
+    def __run_in_parallel(self) -> array:
+        if self.__seed is None:
+            self.__seed = random.getrandbits(32)
+        players = list(self.__baselines) + list(self.__testplayers)
+        played = {}
+        with ProcessPoolExecutor(max_workers=self.__workers, initializer=_initialize_tournament_worker, initargs=(players,)) as executor:
+            futures = {}
+            for baseline_index in range(len(self.__baselines)):
+                for testplayer_index in range(len(self.__testplayers)):
+                    for i in range(self.__iterations):
+                        key = self.__game_key(baseline_index, testplayer_index, i)
+                        if key in self.__finished_games:
+                            continue
+                        seed = game_seed(self.__seed, baseline_index, testplayer_index, i)
+                        future = executor.submit(_play_tournament_game, len(self.__baselines) + testplayer_index, baseline_index,
+                            i % 2 == 0, seed, self.__visual, self.__verbose, self.__ponder)
+                        futures[future] = (key, seed)
+            for future in tqdm(as_completed(futures), total=len(futures)):
+                key, seed = futures[future]
+                played[key] = future.result()
+                self.__store_game(key, seed, played[key])
+        for baseline_index, baseline in enumerate(self.__baselines):
+            for testplayer_index, player in enumerate(self.__testplayers):
+                keys = [self.__game_key(baseline_index, testplayer_index, i) for i in range(self.__iterations)]
+                # Only the games played now were played by the players
+                for number, matchup_player in ((0, player), (1, baseline)):
+                    self.__add_to_player(matchup_player, [played[key] for key in keys if key in played], number)
+                games = [played[key] if key in played else self.__finished_games[key] for key in keys]
+                self.__add_results(player, baseline, baseline_index, games)
+        return self.__results
 
-            total_moves += game.player_white.total_moves + game.player_black.total_moves
+    @staticmethod
+    def __add_to_player(player: ChessPlayer, games: List[GameOutcome], number: int) -> None:
+        # The moves, decision times, searches and playouts of the copies of player in the workers
+        moves = sum(game.moves[number] for game in games)
+        if moves == 0:
+            return
+        seconds = sum(game.decision_seconds[number] for game in games)
+        total_seconds = player.average_time_to_get_move * player.total_moves + seconds
+        player.total_moves += moves
+        player.average_time_to_get_move = total_seconds / player.total_moves
+        for game in games:
+            if game.search_reports[number] is not None:
+                player.total_search_report = player.total_search_report.merged(game.search_reports[number])
+            if game.playouts[number] is not None:
+                player.total_playouts += game.playouts[number]
+                player.total_search_seconds += game.search_seconds[number]
 
-            player1_starts = not player1_starts
-        
+    def __add_results(self, player1: ChessPlayer, player2: ChessPlayer, current_index: int, games: List[GameOutcome]) -> None:
+        player1_wins = sum(1 for game in games if game.winner == 1)
+        draws = sum(1 for game in games if game.winner is None)
         percent_wins_player1 = player1_wins / self.__iterations
         percent_draws = draws / self.__iterations
         percent_wins_player2 = 1 - (percent_wins_player1 + percent_draws)
+        # Decision times are averaged over the moves of the matchup, so long games weigh more
+        average_decision_times = []
+        search_reports = []
+        for number in range(2):
+            moves = sum(game.moves[number] for game in games)
+            average_decision_times.append(sum(game.decision_seconds[number] for game in games) / moves if moves else 0)
+            reports = [game.search_reports[number] for game in games if game.search_reports[number] is not None]
+            search_reports.append(reduce(SearchReport.merged, reports) if reports else None)
         if(len(self.__results) != current_index + 1):
             self.__results.append([])
         self.__results[current_index].append(
@@ -80,10 +284,12 @@ class AIChess:
                 percent_wins_player1,
                 percent_wins_player2,
                 percent_draws,
-                player1.average_time_to_get_move,
-                player2.average_time_to_get_move,
-                total_moves / self.__iterations,
-                self.__iterations
+                average_decision_times[0],
+                average_decision_times[1],
+                sum(sum(game.moves) for game in games) / self.__iterations,
+                self.__iterations,
+                search_reports[0],
+                search_reports[1]
             )
         )
 
@@ -1,7 +1,37 @@
 from  abc import ABC, abstractmethod
 from aichessboard import AIChessBoard
 from chess import Move
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+import importlib
+import multiprocessing
 import time
+from transpositiontable import zobrist_hash
+import types
+from typing import Any, Dict, List, Tuple
+
+# The copy of the player that ponders in the background process, set by the pool initializer
+_ponder_player: Any = None
+
+
+def _initialize_ponder_worker(player: Any, stop_event: Any) -> None:
+    global _ponder_player
+    _ponder_player = player
+    # Searches that support it stop early once their reply was not played
+    player.stop_event = stop_event
+
+
+# The answer to board and the process time the background search took. There is no answer when
+# board has no moves or the search was stopped because its reply was not played; any other error
+# is raised again by the result of the future.
+def _ponder(board: AIChessBoard) -> Tuple[Move, float]:
+    timer = _ponder_player._ChessPlayer__time
+    start = timer.process_time()
+    try:
+        move = _ponder_player._ChessPlayer__get_next_move(board)
+    except (ChessPlayer.ChessPlayerException, ChessPlayer.SearchStopped):
+        move = None
+    return move, timer.process_time() - start
+
 
 class ChessPlayer(ABC):
 
@@ -10,15 +40,47 @@ class ChessPlayer(ABC):
         self.__name = self.__class__.__name__
         self.total_moves = 0
         self.average_time_to_get_move = 0
+        self.last_decision_time = 0
+        self.ponder_hits = 0
+        self.ponder_probes = 0
+        self.__ponder_pool: ProcessPoolExecutor = None
+        self.__ponder_stop_event: Any = None
+        self.__pondering: Dict[int, Future] = {}
+        self.__stale_ponders: List[Future] = []
 
     def get_name(self) -> str:
         return self.__name
 
+    # Every setting that changes how the player plays, as JSON values. Unlike the name it tells
+    # apart players that differ in any option, so stored games are only reused by the same player.
+    def get_config(self) -> Dict[str, Any]:
+        return {'player': self.__class__.__name__}
+
+    # Modules cannot be pickled, so a timer module is sent by name to other processes
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        if isinstance(self.__time, types.ModuleType):
+            state['_ChessPlayer__time'] = self.__time.__name__
+        state['_ChessPlayer__ponder_pool'] = None
+        state['_ChessPlayer__ponder_stop_event'] = None
+        state['_ChessPlayer__pondering'] = {}
+        state['_ChessPlayer__stale_ponders'] = []
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        if isinstance(state['_ChessPlayer__time'], str):
+            state['_ChessPlayer__time'] = importlib.import_module(state['_ChessPlayer__time'])
+        self.__dict__.update(state)
+
+    # The process time of a move played from a ponder hit includes the background search that found it
     def get_next_move(self, board: AIChessBoard) -> Move:
         self.total_moves += 1
         start = self.__time.process_time()
-        next_move = self.__get_next_move(board)
-        process_time = self.__time.process_time() - start
+        next_move, ponder_time = self.__take_ponder_move(board)
+        if next_move is None:
+            next_move = self.__get_next_move(board)
+        process_time = self.__time.process_time() - start + ponder_time
+        self.last_decision_time = process_time
         self.average_time_to_get_move += (process_time - self.average_time_to_get_move) / self.total_moves
         return next_move
 
@@ -26,6 +88,86 @@ class ChessPlayer(ABC):
     def __get_next_move(self, board: AIChessBoard) -> Move:
         pass
 
+    # Forgets what the player kept from earlier games, so a game is played the same whichever
+    # games the player, or its copy in another process, played before
+    def new_game(self) -> None:
+        pass
+
+    # The reply the opponent is expected to play on board, or None if the player has no idea
+    def predict_reply(self, board: AIChessBoard) -> Move:
+        return None
+
+    def ponder_hit_rate(self) -> float:
+        return self.ponder_hits / self.ponder_probes if self.ponder_probes else 0.0
+
+    # Search answers to the opponent's replies in a background process while the opponent
+    # decides on board. The predicted reply is searched first. Called again with the next
+    # position, it throws away what is left of the last ponder.
+    def start_pondering(self, board: AIChessBoard, all_replies: bool=True) -> None:
+        self.__discard_ponders()
+        if self.__ponder_pool is None:
+            context = multiprocessing.get_context()
+            self.__ponder_stop_event = context.Event()
+            self.__ponder_pool = ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=context,
+                initializer=_initialize_ponder_worker,
+                initargs=(self, self.__ponder_stop_event)
+            )
+        # A search that missed must have stopped before the stop event is reset
+        wait(self.__stale_ponders)
+        self.__stale_ponders = []
+        self.__ponder_stop_event.clear()
+        replies = list(board.legal_moves)
+        predicted_reply = self.predict_reply(board)
+        if predicted_reply in replies:
+            replies.remove(predicted_reply)
+            replies.insert(0, predicted_reply)
+        elif not all_replies:
+            return
+        if not all_replies:
+            replies = replies[:1]
+        for reply in replies:
+            reply_board = board.copy(stack=False)
+            reply_board.push(reply)
+            self.__pondering[zobrist_hash(reply_board)] = self.__ponder_pool.submit(_ponder, reply_board)
+
+    def stop_pondering(self) -> None:
+        self.__discard_ponders()
+        if self.__ponder_pool is not None:
+            self.__ponder_pool.shutdown(cancel_futures=True)
+            self.__ponder_pool = None
+            self.__stale_ponders = []
+
+    def __take_ponder_move(self, board: AIChessBoard) -> Tuple[Move, float]:
+        # On a ponder hit the answer and the process time of its search are taken from the
+        # background search, waiting for it if it is still running. A ponder that has not
+        # started yet is a miss.
+        if not self.__pondering:
+            return None, 0
+        self.ponder_probes += 1
+        future = self.__pondering.pop(zobrist_hash(board), None)
+        if future is not None and not future.running() and future.cancel():
+            future = None
+        move, ponder_time = future.result() if future is not None else (None, 0)
+        self.__discard_ponders()
+        if move is None or move not in board.legal_moves:
+            return None, 0
+        self.ponder_hits += 1
+        return move, ponder_time
+
+    def __discard_ponders(self) -> None:
+        for future in self.__pondering.values():
+            if not future.cancel():
+                self.__stale_ponders.append(future)
+        if self.__stale_ponders:
+            self.__ponder_stop_event.set()
+        self.__pondering = {}
+
+    # Raised by a search that was stopped from another process before it finished
+    class SearchStopped(Exception):
+        pass
+
     class ChessPlayerException(Exception):
         def __init__(self, message=''):
-            self.message = 'Error in the ChessPlayer:' + message
\ No newline at end of file
+            self.message = 'Error in the ChessPlayer:' + message
@@ -0,0 +1,116 @@
+from array import array
+import chess
+import hashlib
+from typing import List, Tuple
+
+BYTES_PER_MEGABYTE = 1 << 20
+# white and black bitboards, value, tag and last use are stored in parallel arrays
+BYTES_PER_ENTRY = 8 + 8 + 8 + 8 + 4
+WAYS = 4
+EMPTY_TAG = 0
+# Odd 64 bit constants that spread the bits of the bitboards over the index
+WHITE_MULTIPLIER = 0x9E3779B97F4A7C15
+BLACK_MULTIPLIER = 0xC2B2AE3D27D4EB4F
+MASK_64 = (1 << 64) - 1
+# Tags of tuned weights have the top bit set, so they never equal the tag of default weights
+TUNED_TAG_BIT = 1 << 63
+
+
+def heuristic_set_mask(list_of_heuristics: List) -> int:
+    # One bit per Heuristic, so every set of heuristics has its own entries
+    mask = 0
+    for heuristic in list_of_heuristics:
+        mask |= 1 << heuristic.value
+    return mask
+
+
+def _number_of_sets(size_in_bytes: int) -> int:
+    if size_in_bytes < BYTES_PER_ENTRY * WAYS:
+        raise ValueError("Evaluation cache needs at least " + str(BYTES_PER_ENTRY * WAYS) + " bytes")
+    return 1 << ((size_in_bytes // (BYTES_PER_ENTRY * WAYS)).bit_length() - 1)
+
+
+class EvaluationCache:
+    # Heuristic values by white and black bitboard, player color and set of heuristics.
+    # Each position hashes to a set of WAYS entries, and when the set is full the entry that
+    # was used longest ago is replaced. The whole key is stored, so a hit is always exact.
+    # The tag of an entry holds the color and heuristic set, and is 0 when the entry is empty.
+    # With tuned weights it is a 64 bit digest of the color, set and weights instead.
+    # One cache can be shared by the players of a tournament. Sent to another process it
+    # arrives empty.
+    def __init__(self, size_in_bytes: int) -> None:
+        number_of_sets = _number_of_sets(size_in_bytes)
+        self.size_in_bytes = size_in_bytes
+        self.__set_mask = number_of_sets - 1
+        self.size = number_of_sets * WAYS
+        # Standard library arrays hand out Python integers, which is quicker than NumPy for single items
+        self.whites = array('Q', bytes(8 * self.size))
+        self.blacks = array('Q', bytes(8 * self.size))
+        self.values = array('q', bytes(8 * self.size))
+        self.tags = array('Q', bytes(8 * self.size))
+        self.last_uses = array('L', bytes(array('L').itemsize * self.size))
+        self.__clock = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __getstate__(self) -> dict:
+        return {'size_in_bytes': self.size_in_bytes}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state['size_in_bytes'])
+
+    def __len__(self) -> int:
+        return self.size - self.tags.count(EMPTY_TAG)
+
+    @property
+    def probes(self) -> int:
+        return self.hits + self.misses
+
+    def hit_rate(self) -> float:
+        return self.hits / self.probes if self.probes else 0.0
+
+    def clear(self) -> None:
+        self.tags = array('Q', bytes(8 * self.size))
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def tag(player_color: chess.Color, heuristic_mask: int, weights: Tuple[int, ...]=()) -> int:
+        if weights:
+            key = repr((player_color == chess.WHITE, heuristic_mask, weights)).encode()
+            return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little') | TUNED_TAG_BIT
+        return (heuristic_mask << 1 | (player_color == chess.WHITE)) + 1
+
+    def __first_slot(self, white: int, black: int, tag: int) -> int:
+        mixed = (white * WHITE_MULTIPLIER ^ black * BLACK_MULTIPLIER) & MASK_64
+        return (((mixed >> 32) ^ mixed ^ tag) & self.__set_mask) * WAYS
+
+    def __tick(self) -> int:
+        # Ages of the entries only matter within a set, so the clock may wrap around
+        self.__clock = (self.__clock + 1) & 0xffffffff
+        return self.__clock
+
+    def probe(self, white: int, black: int, tag: int) -> int:
+        first_slot = self.__first_slot(white, black, tag)
+        for slot in range(first_slot, first_slot + WAYS):
+            if self.whites[slot] == white and self.blacks[slot] == black and self.tags[slot] == tag:
+                self.hits += 1
+                self.last_uses[slot] = self.__tick()
+                return self.values[slot]
+        self.misses += 1
+        return None
+
+    def store(self, white: int, black: int, tag: int, value: int) -> None:
+        first_slot = self.__first_slot(white, black, tag)
+        slot = first_slot
+        for way in range(first_slot, first_slot + WAYS):
+            if self.tags[way] == EMPTY_TAG:
+                slot = way
+                break
+            if self.last_uses[way] < self.last_uses[slot]:
+                slot = way
+        self.whites[slot] = white
+        self.blacks[slot] = black
+        self.tags[slot] = tag
+        self.values[slot] = value
+        self.last_uses[slot] = self.__tick()
@@ -2,17 +2,30 @@ from aichessboard import AIChessBoard
 import chess
 from chess import Move
 from chessplayer import ChessPlayer
+from gamerecord import GameRecordWriter
+from typing import List
 
 
 class Game:
-    def __init__(self, white: ChessPlayer, black: ChessPlayer, visual: bool, verbose: bool) -> None:
+    def __init__(self, white: ChessPlayer, black: ChessPlayer, visual: bool, verbose: bool,
+            ponder: bool=False, ponder_all_replies: bool=True, record_writer: GameRecordWriter=None) -> None:
         self.player_white = white
         self.player_black = black
         self.__visual = visual
         self.__verbose = verbose
+        # The player waiting for its opponent searches the replies it expects in the background
+        self.__ponder = ponder
+        self.__ponder_all_replies = ponder_all_replies
+        # Ponder hits and moves played while pondering in this game, by color
+        self.ponder_hits = {chess.WHITE: 0, chess.BLACK: 0}
+        self.ponder_probes = {chess.WHITE: 0, chess.BLACK: 0}
+        # Process time each move of the game took, in the order the moves were made
+        self.decision_times: List[float] = []
         self.board = AIChessBoard('8/pppppppp/8/8/8/8/PPPPPPPP/8')
         self.terminated = False
         self.winner: bool = None
+        # Finished games are appended to record_writer in the compact binary game record format
+        self.__record_writer = record_writer
 
     def __make_a_move(self, move: Move) -> None:
         if move != None:
@@ -27,10 +40,34 @@ class Game:
                 print("white" if outcome.winner else "black", " wins")
 
     def run(self) -> ChessPlayer:
+        winner = self.__run_pondering() if self.__ponder else self.__run()
+        if self.__record_writer is not None:
+            self.__record_writer.write(self.board.move_stack, winner)
+        return winner
+
+    def __run_pondering(self) -> ChessPlayer:
+        players = {chess.WHITE: self.player_white, chess.BLACK: self.player_black}
+        hits = {color: player.ponder_hits for color, player in players.items()}
+        probes = {color: player.ponder_probes for color, player in players.items()}
+        try:
+            return self.__run()
+        finally:
+            for color, player in players.items():
+                player.stop_pondering()
+                self.ponder_hits[color] = player.ponder_hits - hits[color]
+                self.ponder_probes[color] = player.ponder_probes - probes[color]
+            if self.__verbose:
+                print("ponder hit rate white:", self.ponder_hit_rate(chess.WHITE), "black:", self.ponder_hit_rate(chess.BLACK))
+
+    def __run(self) -> ChessPlayer:
         while self.terminated is False:
             player = self.player_white if self.board.turn is True else self.player_black
             try:
+                if self.__ponder:
+                    opponent = self.player_black if self.board.turn is True else self.player_white
+                    opponent.start_pondering(self.board, all_replies=self.__ponder_all_replies)
                 player_move = player.get_next_move(self.board)
+                self.decision_times.append(player.last_decision_time)
                 if player_move == None:
                     self.terminated = True
                     return None
@@ -40,6 +77,9 @@ class Game:
                 return None
         return self.winner
 
+    def ponder_hit_rate(self, color: chess.Color) -> float:
+        return self.ponder_hits[color] / self.ponder_probes[color] if self.ponder_probes[color] else 0.0
+
     def run_example_game(self) -> None:
         print("start game\n", self.board, "\n")
         self.__make_a_move(chess.A2, chess.A4)
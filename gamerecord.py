@@ -0,0 +1,168 @@
+from __future__ import annotations
+import chess
+from chess import Move
+from dataclasses import dataclass
+import mmap
+import numpy as np
+import os
+import struct
+from typing import Iterator, List, Tuple
+
+# A games file starts with FILE_HEADER, followed by the games. Every game is a GAME_HEADER of
+# its number of plies, number of move bytes and result (1 white won, -1 black won, 0 draw),
+# followed by its moves. The offsets of the games are appended to the index file next to it
+# once a game is written, so a game cut off by a crash is never read.
+MAGIC = b'PAWNGAME'
+VERSION = 1
+FILE_HEADER = struct.Struct('<8sH6x')
+GAME_HEADER = struct.Struct('<HHb')
+INDEX_SUFFIX = '.index'
+RESULTS = {True: 1, False: -1, None: 0}
+WINNERS = {1: True, -1: False, 0: None}
+# A move is one byte, the from square times 4 plus its kind, and a second byte with the piece
+# it promotes to when it reaches the last rank. Which way is forward follows from the side to
+# move, as white always moves first.
+PUSH, DOUBLE_PUSH, CAPTURE_TOWARD_FILE_A, CAPTURE_TOWARD_FILE_H = range(4)
+TARGET_OFFSETS = {
+    chess.WHITE: {PUSH: 8, DOUBLE_PUSH: 16, CAPTURE_TOWARD_FILE_A: 7, CAPTURE_TOWARD_FILE_H: 9},
+    chess.BLACK: {PUSH: -8, DOUBLE_PUSH: -16, CAPTURE_TOWARD_FILE_A: -9, CAPTURE_TOWARD_FILE_H: -7}
+}
+KINDS = {color: {offset: kind for kind, offset in offsets.items()} for color, offsets in TARGET_OFFSETS.items()}
+BB_STARTING_WHITE = chess.BB_RANK_2
+BB_STARTING_BLACK = chess.BB_RANK_7
+
+
+def encode_moves(moves: List[Move]) -> bytes:
+    encoded = bytearray()
+    color = chess.WHITE
+    for move in moves:
+        encoded.append(move.from_square << 2 | KINDS[color][move.to_square - move.from_square])
+        if chess.BB_SQUARES[move.to_square] & chess.BB_BACKRANKS:
+            encoded.append(move.promotion or chess.QUEEN)
+        color = not color
+    return bytes(encoded)
+
+
+def decode_moves(encoded: bytes) -> List[Tuple[chess.Square, chess.Square, chess.PieceType]]:
+    # From square, to square and promotion piece, or None, of every move
+    moves = []
+    color = chess.WHITE
+    position = 0
+    while position < len(encoded):
+        from_square, kind = encoded[position] >> 2, encoded[position] & 3
+        to_square = from_square + TARGET_OFFSETS[color][kind]
+        promotion = None
+        position += 1
+        if chess.BB_SQUARES[to_square] & chess.BB_BACKRANKS:
+            promotion = encoded[position]
+            position += 1
+        moves.append((from_square, to_square, promotion))
+        color = not color
+    return moves
+
+
+@dataclass
+class GameRecord:
+    winner: bool
+    plies: int
+    encoded_moves: bytes
+
+    def moves(self) -> List[Tuple[chess.Square, chess.Square, chess.PieceType]]:
+        return decode_moves(self.encoded_moves)
+
+    def replay(self) -> Tuple[np.ndarray, np.ndarray]:
+        # Occupancy bitboards of white and black from the starting position to the last
+        # position, plies + 1 of each. A capture of an empty square is en passant.
+        whites = np.empty(self.plies + 1, dtype=np.uint64)
+        blacks = np.empty(self.plies + 1, dtype=np.uint64)
+        white, black = BB_STARTING_WHITE, BB_STARTING_BLACK
+        whites[0], blacks[0] = white, black
+        color = chess.WHITE
+        for ply, (from_square, to_square, _) in enumerate(self.moves(), start=1):
+            from_bitboard, to_bitboard = chess.BB_SQUARES[from_square], chess.BB_SQUARES[to_square]
+            own, opponent = (white, black) if color == chess.WHITE else (black, white)
+            if chess.square_file(from_square) != chess.square_file(to_square) and not to_bitboard & opponent:
+                opponent &= ~chess.BB_SQUARES[to_square - 8 if color == chess.WHITE else to_square + 8]
+            own = own & ~from_bitboard | to_bitboard
+            opponent &= ~to_bitboard
+            white, black = (own, opponent) if color == chess.WHITE else (opponent, own)
+            whites[ply], blacks[ply] = white, black
+            color = not color
+        return whites, blacks
+
+
+class GameRecordWriter:
+    # Appends games to a games file and its index. An existing file is added to.
+    def __init__(self, path: str) -> None:
+        self.path = path
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.__games = open(path, 'ab')
+        self.__index = open(path + INDEX_SUFFIX, 'ab')
+        if new_file:
+            self.__games.write(FILE_HEADER.pack(MAGIC, VERSION))
+
+    def write(self, moves: List[Move], winner: bool) -> None:
+        encoded = encode_moves(moves)
+        offset = self.__games.tell()
+        self.__games.write(GAME_HEADER.pack(len(moves), len(encoded), RESULTS[winner]) + encoded)
+        self.__games.flush()
+        self.__index.write(struct.pack('<Q', offset))
+        self.__index.flush()
+
+    def close(self) -> None:
+        self.__games.close()
+        self.__index.close()
+
+    def __enter__(self) -> GameRecordWriter:
+        return self
+
+    def __exit__(self, *exception) -> None:
+        self.close()
+
+
+class GameRecordReader:
+    # Reads the games of a games file through mmap. Games are decoded only when they are read,
+    # straight from the mapped bytes, without python-chess.
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.offsets = np.fromfile(path + INDEX_SUFFIX, dtype='<u8') if os.path.exists(path + INDEX_SUFFIX) else np.zeros(0, dtype='<u8')
+        self.__file = open(path, 'rb')
+        self.__data = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = FILE_HEADER.unpack_from(self.__data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise GameRecordReader.UnknownFormat(path + " is not a version " + str(VERSION) + " games file")
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __getitem__(self, index: int) -> GameRecord:
+        offset = int(self.offsets[index])
+        plies, length, result = GAME_HEADER.unpack_from(self.__data, offset)
+        start = offset + GAME_HEADER.size
+        return GameRecord(winner=WINNERS[result], plies=plies, encoded_moves=self.__data[start:start + length])
+
+    def __iter__(self) -> Iterator[GameRecord]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def positions(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # White and black bitboards of every position of every game, with the index of its game
+        replays = [game.replay() for game in self]
+        if not replays:
+            return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.int64)
+        lengths = [len(game_whites) for game_whites, _ in replays]
+        return np.concatenate([game_whites for game_whites, _ in replays]), np.concatenate([game_blacks for _, game_blacks in replays]), \
+            np.repeat(np.arange(len(replays)), lengths)
+
+    def close(self) -> None:
+        self.__data.close()
+        self.__file.close()
+
+    def __enter__(self) -> GameRecordReader:
+        return self
+
+    def __exit__(self, *exception) -> None:
+        self.close()
+
+    class UnknownFormat(Exception):
+        pass
@@ -1,13 +1,76 @@
 import chess
 from chess import *
+from dataclasses import dataclass
 from enum import Enum
+from evaluationcache import EvaluationCache, heuristic_set_mask
+from gmpy2 import popcount
+import json
 import numpy as np
-from typing import List
+from typing import Dict, List, Tuple
 
 # Using global variables to avoid chess library calls.
 PLAYER_WHITE = chess.WHITE
 PLAYER_BLACK = chess.BLACK
 BOARD_SIZE = 64
+BB_NOT_FILE_A = chess.BB_ALL & ~chess.BB_FILE_A
+BB_NOT_FILE_H = chess.BB_ALL & ~chess.BB_FILE_H
+# Pieces on a back rank may be anything a pawn promoted to, which the bitboards of the players do not tell
+BB_BACK_RANKS = chess.BB_RANK_1 | chess.BB_RANK_8
+# The k-th mask holds the ranks at least k ranks past the second rank of the player, so a pawn
+# adds one for every mask it is on
+DISTANCE_MASKS = {
+    PLAYER_WHITE: [sum(chess.BB_RANKS[rank] for rank in range(1 + k, 8)) for k in range(1, 7)],
+    PLAYER_BLACK: [sum(chess.BB_RANKS[rank] for rank in range(0, 7 - k)) for k in range(1, 7)]
+}
+# Set bits of every byte, for counting the bits of NumPy arrays of bitboards byte by byte
+POPCOUNT_TABLE = np.array([bin(byte).count('1') for byte in range(256)], dtype=np.uint8)
+UINT64_SHIFTS = {shift: np.uint64(shift) for shift in [1, 7, 8, 9]}
+# Bitboards that evaluate_batch counts for each position, one byte, so one rank, at a time
+BATCH_WORDS = 4
+BATCH_OWN, BATCH_OPPONENT, BATCH_RISK_LEFT, BATCH_RISK_RIGHT = range(BATCH_WORDS)
+# Pairs of pawns by rank pattern, built by rank_pattern_tables the first time they are needed
+_rank_pattern_tables: Dict[str, np.ndarray] = {}
+# Weighted sums of the pair tables by weights of the chain, side by side and stacked terms
+_structure_tables: Dict[Tuple[int, int, int], Tuple[np.ndarray, np.ndarray]] = {}
+
+
+def rank_pattern_tables() -> Dict[str, np.ndarray]:
+    # The pairs behind the pawn structure terms, by the 8 bit occupancy of a rank or the 16 bit
+    # occupancy of a rank (low byte) and the rank above it (high byte):
+    # 'side' pairs on one rank, 'diagonal' and 'stacked' pairs between two adjacent ranks
+    if not _rank_pattern_tables:
+        patterns = np.arange(1 << 16, dtype=np.uint32)
+        lower, upper = patterns & 0xff, patterns >> 8
+        rank = np.arange(256, dtype=np.uint32)
+        _rank_pattern_tables['side'] = POPCOUNT_TABLE[(rank & 0x7f) << 1 & rank]
+        _rank_pattern_tables['diagonal'] = POPCOUNT_TABLE[lower >> 1 & upper] + POPCOUNT_TABLE[(lower & 0x7f) << 1 & upper]
+        _rank_pattern_tables['stacked'] = POPCOUNT_TABLE[lower & upper]
+    return _rank_pattern_tables
+
+
+def _structure_table(chain_weight: int, side_weight: int, stacked_weight: int) -> Tuple[np.ndarray, np.ndarray]:
+    # The chain, side by side and stacked terms of a rank and the rank above it, counting the
+    # side by side pairs of the lower rank only, and the side by side term of a single rank for
+    # the last rank of the board
+    weights = (chain_weight, side_weight, stacked_weight)
+    if weights not in _structure_tables:
+        tables = rank_pattern_tables()
+        side = side_weight * tables['side'].astype(np.int64)
+        pairs = chain_weight * tables['diagonal'].astype(np.int64) + stacked_weight * tables['stacked'].astype(np.int64) + \
+            np.tile(side, 256)
+        _structure_tables[weights] = (pairs, side)
+    return _structure_tables[weights]
+
+
+def rank_pattern_structure(pieces: np.ndarray, weights: Tuple[int, int, int]) -> np.ndarray:
+    # The chain, side by side and stacked terms of an array of bitboards with the given weights.
+    # Every rank is read together with the rank above it as one 16 bit number, from overlapping
+    # windows on the bytes of the bitboards, and looked up in the weighted pair table.
+    pairs, side = _structure_table(*weights)
+    pieces = np.ascontiguousarray(pieces, dtype='<u8')
+    rank_pairs = np.lib.stride_tricks.as_strided(pieces.view('<u2'), shape=(len(pieces), 7), strides=(8, 1), writeable=False)
+    return pairs[rank_pairs].sum(axis=1) + side[pieces.view(np.uint8)[7::8]]
+
 
 class Heuristic(Enum):
     Maximize_Number_Of_Pieces = 0
@@ -18,9 +81,56 @@ class Heuristic(Enum):
     Piece_Could_Be_Captured = 5
 
 
+@dataclass(frozen=True)
+class EvaluationPlan:
+    # What return_heuristic_value computes for one player color and set of heuristics: the
+    # weight of every shared feature, 0 for a feature no heuristic of the set needs.
+    # Material counts pawns minus the opponent's pawns, plus queens at 100.
+    material: int
+    # Bitboards of the ranks whose advancement has a bit set, with the weight of that bit
+    advancement: Tuple[Tuple[int, int], ...]
+    # Pairs of pawns on the forward diagonals of the player's pawns, for the chain and risk terms
+    chain: int
+    risk: int
+    side: int
+    stacked: int
+
+
+# What one unit of the feature behind each heuristic is worth: a pawn of material (a queen is
+# 100 pawns), a pair of diagonally adjacent pawns, a pair of side by side pawns, a rank advanced,
+# a pair of stacked pawns and a pawn the opponent can capture
+DEFAULT_WEIGHTS: Dict[Heuristic, int] = {
+    Heuristic.Maximize_Number_Of_Pieces: 1,
+    Heuristic.Keep_Pawns_Diagonally_Supported: 1,
+    Heuristic.Side_By_Side_Pawns: 2,
+    Heuristic.Distance_From_Starting_Location: 5,
+    Heuristic.Stacked_Pawns: -1,
+    Heuristic.Piece_Could_Be_Captured: -20
+}
+
+
+def load_weight_profile(path: str) -> Dict[Heuristic, int]:
+    # A JSON object of weights by heuristic name, as written by tuning.py. Heuristics it leaves
+    # out keep their default weight.
+    with open(path) as file:
+        profile = json.load(file)
+    return {Heuristic[name]: int(weight) for name, weight in profile.items()}
+
+
 class Heuristics: 
-    def __init__(self, list_of_heuristics: List[Heuristic]):
+    def __init__(self, list_of_heuristics: List[Heuristic], cache: EvaluationCache=None, weights: Dict[Heuristic, int]=None):
         self.list_of_heuristics: List[Heuristic] = list_of_heuristics
+        # Weights of a tuned profile replace the default weight of their heuristics
+        self.weights: Dict[Heuristic, int] = dict(DEFAULT_WEIGHTS)
+        self.weights.update(weights or {})
+        # Values of pawn structures already evaluated, possibly shared with other players
+        self.cache = cache
+        tuned_weights = tuple(self.weights[heuristic] for heuristic in Heuristic) if self.weights != DEFAULT_WEIGHTS else ()
+        self.__cache_tags = {color: EvaluationCache.tag(color, heuristic_set_mask(list_of_heuristics), tuned_weights) \
+            for color in chess.COLORS}
+        self.__plans = {color: self.__compile_plan(color) for color in chess.COLORS}
+        self.__batch_weights = {color: self.__create_batch_weights(color) for color in chess.COLORS}
+        self.__structure_weights = self.__create_structure_weights()
 
     def __str__(self) -> str:
         heuristics = ''
@@ -28,116 +138,147 @@ class Heuristics:
             heuristics += str(heuristic.value)
             if heuristic is not self.list_of_heuristics[-1]:
                 heuristics += ","
+        if self.weights != DEFAULT_WEIGHTS:
+            heuristics += " weights " + ",".join(str(self.weights[heuristic]) for heuristic in self.list_of_heuristics)
         return heuristics
 
     def return_heuristic_value(self, board: Board, player_color: chess.Color) -> int:
-        matrix_board = self.create_matrix_from_board(board, player_color)
-        heuristic_value: int = 0
-        for heuristic in self.list_of_heuristics: 
-                if heuristic == Heuristic.Maximize_Number_Of_Pieces:
-                    heuristic_value += self.number_of_pieces_greater_than_opponent(board, player_color)
-                elif heuristic == Heuristic.Keep_Pawns_Diagonally_Supported:
-                    heuristic_value += self.pawn_chain_support(matrix_board, player_color)
-                elif heuristic == Heuristic.Side_By_Side_Pawns:
-                    heuristic_value += self.pawn_side_by_side_support(matrix_board, player_color)
-                elif heuristic == Heuristic.Distance_From_Starting_Location:
-                    heuristic_value += self.distance_from_opposite_side_of_board(matrix_board, player_color)
-                elif heuristic == Heuristic.Stacked_Pawns:
-                    heuristic_value += self.number_of_stacked_pawns(matrix_board, player_color)
-                elif heuristic == Heuristic.Piece_Could_Be_Captured:
-                    heuristic_value += self.is_piece_at_risk(matrix_board, player_color)
+        pieces = board.occupied_co[player_color]
+        opponent_pieces = board.occupied_co[not player_color]
+        cached = self.cache is not None and not (pieces | opponent_pieces) & BB_BACK_RANKS
+        if cached:
+            white, black = board.occupied_co[PLAYER_WHITE], board.occupied_co[PLAYER_BLACK]
+            heuristic_value = self.cache.probe(white, black, self.__cache_tags[player_color])
+            if heuristic_value is not None:
+                return heuristic_value
+        heuristic_value = self.__evaluate(board, pieces, opponent_pieces, self.__plans[player_color], player_color)
+        if cached:
+            self.cache.store(white, black, self.__cache_tags[player_color], heuristic_value)
         return heuristic_value
 
 
 
-    def number_of_pieces_greater_than_opponent(self, board: List, player_color: chess.Color) -> int:
-        # Takes the number of pawns and queens of the Player and subtracts the opponents pieces
-        number_of_pawns: int = len(board.pieces(chess.PAWN, player_color)) * 1
-        number_of_queens: int = len(board.pieces(chess.QUEEN, player_color)) * 100
-        number_of_opponent_pawns: int = len(board.pieces(chess.PAWN, not player_color)) * 1
-        number_of_opponent_queens: int = len(board.pieces(chess.QUEEN, not player_color)) * 100
+    def __compile_plan(self, player_color: chess.Color) -> EvaluationPlan:
+        # Adds up the weights of the features behind the terms of the set, so every feature is
+        # computed at most once and a set only pays for the terms it uses
+        material, advanced, chain, risk, side, stacked = 0, 0, 0, 0, 0, 0
+        for heuristic in self.list_of_heuristics:
+            if heuristic == Heuristic.Maximize_Number_Of_Pieces:
+                material += self.weights[heuristic]
+            elif heuristic == Heuristic.Keep_Pawns_Diagonally_Supported:
+                chain += self.weights[heuristic]
+            elif heuristic == Heuristic.Side_By_Side_Pawns:
+                side += self.weights[heuristic]
+            elif heuristic == Heuristic.Distance_From_Starting_Location:
+                advanced += self.weights[heuristic]
+            elif heuristic == Heuristic.Stacked_Pawns:
+                stacked += self.weights[heuristic]
+            elif heuristic == Heuristic.Piece_Could_Be_Captured:
+                risk += self.weights[heuristic]
+        # The advancement of a rank is the number of DISTANCE_MASKS it is on, at most 6, so three
+        # bitboards of the ranks by the bits of their advancement count it with three popcounts
+        advancement = []
+        if advanced:
+            rank_advancement = [sum(1 for mask in DISTANCE_MASKS[player_color] if chess.BB_RANKS[rank] & mask) for rank in range(8)]
+            for bit in range(max(rank_advancement).bit_length()):
+                ranks = sum(chess.BB_RANKS[rank] for rank in range(8) if rank_advancement[rank] >> bit & 1)
+                advancement.append((ranks, advanced * (1 << bit)))
+        return EvaluationPlan(material, tuple(advancement), chain, risk, side, stacked)
 
-        return ((number_of_pawns + number_of_queens) - (number_of_opponent_pawns + number_of_opponent_queens))
+    @staticmethod
+    def __evaluate(board: Board, pieces: int, opponent_pieces: int, plan: EvaluationPlan, player_color: chess.Color) -> int:
+        heuristic_value = 0
+        if plan.material:
+            material = popcount(board.pawns & pieces) - popcount(board.pawns & opponent_pieces)
+            queens = board.queens
+            if queens:
+                material += 100 * (popcount(queens & pieces) - popcount(queens & opponent_pieces))
+            heuristic_value += plan.material * material
+        for ranks, weight in plan.advancement:
+            heuristic_value += weight * popcount(pieces & ranks)
+        if plan.chain or plan.risk:
+            # Squares the pawns of the player attack. A diagonal pair is the same whichever of
+            # its pawns it is seen from, so the chain counts these too.
+            if player_color == PLAYER_WHITE:
+                left, right = (pieces & BB_NOT_FILE_A) << 7, (pieces & BB_NOT_FILE_H) << 9
+            else:
+                left, right = (pieces & BB_NOT_FILE_H) >> 7, (pieces & BB_NOT_FILE_A) >> 9
+            if plan.chain:
+                heuristic_value += plan.chain * (popcount(left & pieces) + popcount(right & pieces))
+            if plan.risk:
+                heuristic_value += plan.risk * (popcount(left & opponent_pieces) + popcount(right & opponent_pieces))
+        if plan.side:
+            heuristic_value += plan.side * popcount((pieces & BB_NOT_FILE_H) << 1 & pieces)
+        if plan.stacked:
+            heuristic_value += plan.stacked * popcount(pieces << 8 & pieces)
+        return heuristic_value
 
+    # The pawn structure features below count pairs of pawns on the occupancy bitboard of one
+    # player, unweighted; callers apply the weights. Shifting by 8 moves every square one rank up
+    # and by 1 one file right, and the file masks drop the squares that would wrap around to the
+    # other side of the board.
 
-    def create_matrix_from_board(self, board: Board, player_color: chess.Color) -> int:
-         # Get black and white pieces.
-        white = self.int_to_array(board.occupied_co[1], 'white')
-        black = self.int_to_array(board.occupied_co[0], 'black')
-        # Combine them with a mask.
-        white[np.where(black is PLAYER_BLACK)] = PLAYER_BLACK
-        mask = (white == ".")
-        white[mask] = black[mask]
-        if(player_color == PLAYER_BLACK):
-            white = np.flip(white)
-        return white
+    def pawn_chain_support(self, pieces: int) -> int:
+        # One for every pair of pawns on diagonally adjacent squares
+        return popcount((pieces & BB_NOT_FILE_A) << 7 & pieces) + popcount((pieces & BB_NOT_FILE_H) << 9 & pieces)
 
-    def int_to_array(self, number, color: chess.Color):
-        player = PLAYER_WHITE if color == 'white' else PLAYER_BLACK
-        binary = ["." if int(x) == 0 else player for x in bin(number)[2:]]
-        length = BOARD_SIZE - len(binary)
-        padding = ["."] * length
-        binary = (*padding, *binary) # appending this way requires python >= 3.5
-        board_array = np.reshape(binary, (8,8))
-        return np.flip(board_array, axis=1)
+    def pawn_side_by_side_support(self, pieces: int) -> int:
+        # One for every pair of pawns next to each other on the same rank
+        return popcount((pieces & BB_NOT_FILE_H) << 1 & pieces)
 
-    def pawn_chain_support(self, matrix_board: List, player_color: chess.Color) -> int: 
-        heuristic_value = 0
-        for counter, row in enumerate(matrix_board):
-            if(counter == 0): 
-                continue
-            for element, square in enumerate(row):
-                if(square == player_color):
-                    if(element > 0 and (matrix_board[counter - 1][element - 1] == player_color)):
-                        heuristic_value += 1
-                    if(element < len(row) - 1 and (matrix_board[counter - 1][element + 1] == player_color)):
-                        heuristic_value += 1
-        return heuristic_value
+    def number_of_stacked_pawns(self, pieces: int) -> int:
+        # One for every pawn directly in front of another one of the same player
+        return popcount(pieces << 8 & pieces)
 
-    def pawn_side_by_side_support(self, matrix_board: List, player_color: chess.Color) -> int:
-        heuristic_value = 0
-        for counter, row in enumerate(matrix_board):
-            for element, square in enumerate(row):
-                if(square == player_color):
-                    if(element > 0 and (matrix_board[counter][element - 1] == player_color)):
-                        heuristic_value += 1
-                    if(element < len(row) - 1 and (matrix_board[counter][element + 1] == player_color)):
-                        heuristic_value += 1
-        return heuristic_value
+    def __create_batch_weights(self, player_color: chess.Color) -> np.ndarray:
+        # What a set bit on each rank of each of the BATCH_WORDS bitboards is worth. Pieces on
+        # a back rank count as queens, the only piece a pawn board promotes to.
+        weights = np.zeros((BATCH_WORDS, 8), dtype=np.int64)
+        ranks = np.arange(8)
+        advanced = np.maximum(ranks - 1, 0) if player_color == PLAYER_WHITE else np.maximum(6 - ranks, 0)
+        for heuristic in self.list_of_heuristics:
+            if heuristic == Heuristic.Maximize_Number_Of_Pieces:
+                material = np.where((ranks == 0) | (ranks == 7), 100, 1)
+                weights[BATCH_OWN] += self.weights[heuristic] * material
+                weights[BATCH_OPPONENT] -= self.weights[heuristic] * material
+            elif heuristic == Heuristic.Distance_From_Starting_Location:
+                weights[BATCH_OWN] += self.weights[heuristic] * advanced
+            elif heuristic == Heuristic.Piece_Could_Be_Captured:
+                weights[BATCH_RISK_LEFT] += self.weights[heuristic]
+                weights[BATCH_RISK_RIGHT] += self.weights[heuristic]
+        return weights.reshape(-1)
 
-    def distance_from_opposite_side_of_board(self, matrix_board: List, player_color: chess.Color) -> int:
-        heuristic_value = 0
-        length_of_board = len(matrix_board)
-        for counter, row in enumerate(matrix_board):
-            if(counter > (length_of_board - 2)):
-                continue
-            for square in row:
-                if(square == player_color):
-                    heuristic_value += (length_of_board - counter - 2) 
-        return heuristic_value * 5
-
-    def number_of_stacked_pawns(self, matrix_board: List, player_color: chess.Color) -> int:
-        heuristic_value = 0
-        for counter, row in enumerate(matrix_board):
-            if(counter == 0): # skip the back row since there will be no pawns behind them 
-                continue
-            for element, square in enumerate(row):
-                if(square == player_color):
-                    if(matrix_board[counter - 1][element] == player_color):
-                        heuristic_value -= 1
-        return heuristic_value
+    def __create_structure_weights(self) -> Tuple[int, int, int]:
+        # Weights of the diagonal, side by side and stacked pairs, which are looked up by rank pattern
+        chain_weight, side_weight, stacked_weight = 0, 0, 0
+        for heuristic in self.list_of_heuristics:
+            if heuristic == Heuristic.Keep_Pawns_Diagonally_Supported:
+                chain_weight += self.weights[heuristic]
+            elif heuristic == Heuristic.Side_By_Side_Pawns:
+                side_weight += self.weights[heuristic]
+            elif heuristic == Heuristic.Stacked_Pawns:
+                stacked_weight += self.weights[heuristic]
+        return chain_weight, side_weight, stacked_weight
 
-    def is_piece_at_risk(self, matrix_board: List, player_color: chess.Color) -> int:
-        heuristic_value: int = 0
-        for counter, row in enumerate(matrix_board):
-            if(counter == 0): # skip the back row since there will be no pawns behind them 
-                continue
-            for element, square in enumerate(row):
-                if(square == player_color):
-                    if(element > 0):
-                        if(matrix_board[counter - 1][element - 1] == (not player_color)):
-                            heuristic_value -= 20
-                    if(element < len(row) - 1):
-                        if(matrix_board[counter - 1][element + 1] == (not player_color)):
-                            heuristic_value -= 20
-        return heuristic_value
+    def evaluate_batch(self, white: np.ndarray, black: np.ndarray, player_color: chess.Color) -> np.ndarray:
+        # The value of return_heuristic_value for many positions at once, given as arrays of
+        # occupancy bitboards. Material, advancement and pawns at risk are sums of set bits of a
+        # masked bitboard times a weight per rank, so they are one byte table lookup and one
+        # product with the weights. The pawn structure terms are looked up in the rank pattern
+        # tables for every rank of the player and the rank above it.
+        white = np.asarray(white, dtype='<u8')
+        black = np.asarray(black, dtype='<u8')
+        own, opponent = (white, black) if player_color == PLAYER_WHITE else (black, white)
+        not_file_a, not_file_h = np.uint64(BB_NOT_FILE_A), np.uint64(BB_NOT_FILE_H)
+        if player_color == PLAYER_WHITE:
+            risk_left = (own & not_file_a) << UINT64_SHIFTS[7] & opponent
+            risk_right = (own & not_file_h) << UINT64_SHIFTS[9] & opponent
+        else:
+            risk_left = (own & not_file_h) >> UINT64_SHIFTS[7] & opponent
+            risk_right = (own & not_file_a) >> UINT64_SHIFTS[9] & opponent
+        words = np.stack([own, opponent, risk_left, risk_right], axis=1).astype('<u8')
+        ranks = words.view(np.uint8).reshape(len(own), BATCH_WORDS * 8)
+        values = POPCOUNT_TABLE[ranks] @ self.__batch_weights[player_color]
+        if any(self.__structure_weights):
+            values += rank_pattern_structure(own, self.__structure_weights)
+        return values
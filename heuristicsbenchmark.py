@@ -0,0 +1,78 @@
+import argparse
+import chess
+from heuristics import BB_NOT_FILE_A, BB_NOT_FILE_H, Heuristic, Heuristics, POPCOUNT_TABLE, UINT64_SHIFTS, rank_pattern_structure, rank_pattern_tables
+import numpy as np
+import random
+import timeit
+from typing import Callable, List
+
+# Pawns anywhere between the second and seventh rank
+BB_PAWN_RANKS = chess.BB_ALL & ~(chess.BB_RANK_1 | chess.BB_RANK_8)
+# Weights of the chain, side by side and stacked pairs
+STRUCTURE_WEIGHTS = (1, 2, -1)
+STRUCTURE_HEURISTICS = [Heuristic.Keep_Pawns_Diagonally_Supported, Heuristic.Side_By_Side_Pawns, Heuristic.Stacked_Pawns]
+
+
+def random_bitboards(count: int, seed: int) -> np.ndarray:
+    generator = random.Random(seed)
+    return np.array([generator.getrandbits(64) & generator.getrandbits(64) & BB_PAWN_RANKS for _ in range(count)], dtype=np.uint64)
+
+
+def structure_by_popcount(heuristics: Heuristics, pieces: int) -> int:
+    return STRUCTURE_WEIGHTS[0] * heuristics.pawn_chain_support(pieces) + STRUCTURE_WEIGHTS[1] * heuristics.pawn_side_by_side_support(pieces) + \
+        STRUCTURE_WEIGHTS[2] * heuristics.number_of_stacked_pawns(pieces)
+
+
+def structure_by_rank_lookups(tables: dict, pieces: int) -> int:
+    # The same terms one rank and the rank above it at a time, in tables turned into lists
+    value = STRUCTURE_WEIGHTS[1] * tables['side'][pieces >> 56]
+    for shift in range(0, 56, 8):
+        rank_pair = pieces >> shift & 0xffff
+        value += STRUCTURE_WEIGHTS[0] * tables['diagonal'][rank_pair] + STRUCTURE_WEIGHTS[1] * tables['side'][rank_pair & 0xff] + \
+            STRUCTURE_WEIGHTS[2] * tables['stacked'][rank_pair]
+    return value
+
+
+def structure_by_shifts(own: np.ndarray) -> np.ndarray:
+    # The batch structure terms as they were counted before the rank pattern tables
+    not_file_a, not_file_h = np.uint64(BB_NOT_FILE_A), np.uint64(BB_NOT_FILE_H)
+    words = np.stack([
+        (own & not_file_a) << UINT64_SHIFTS[7] & own,
+        (own & not_file_h) << UINT64_SHIFTS[9] & own,
+        (own & not_file_h) << UINT64_SHIFTS[1] & own,
+        own << UINT64_SHIFTS[8] & own
+    ], axis=1).astype('<u8')
+    counts = POPCOUNT_TABLE[words.view(np.uint8)].reshape(len(own), 4, 8).sum(axis=2, dtype=np.int64)
+    return counts @ np.array([STRUCTURE_WEIGHTS[0], STRUCTURE_WEIGHTS[0], STRUCTURE_WEIGHTS[1], STRUCTURE_WEIGHTS[2]], dtype=np.int64)
+
+
+def microseconds(function: Callable, repeat: int) -> float:
+    return min(timeit.repeat(function, number=repeat, repeat=5)) / repeat * 1e6
+
+
+def run(positions: int, batch_sizes: List[int], seed: int) -> None:
+    heuristics = Heuristics(STRUCTURE_HEURISTICS)
+    tables = {name: table.tolist() for name, table in rank_pattern_tables().items()}
+    pieces = [int(bitboard) for bitboard in random_bitboards(positions, seed)]
+    assert [structure_by_rank_lookups(tables, bitboard) for bitboard in pieces] == \
+        [structure_by_popcount(heuristics, bitboard) for bitboard in pieces]
+    popcount_time = microseconds(lambda: [structure_by_popcount(heuristics, bitboard) for bitboard in pieces], 20) / positions
+    lookup_time = microseconds(lambda: [structure_by_rank_lookups(tables, bitboard) for bitboard in pieces], 20) / positions
+    print("one position, popcount:     %.2f us" % popcount_time)
+    print("one position, rank lookups: %.2f us" % lookup_time)
+    for batch_size in batch_sizes:
+        own = random_bitboards(batch_size, seed + batch_size)
+        assert rank_pattern_structure(own, STRUCTURE_WEIGHTS).tolist() == structure_by_shifts(own).tolist()
+        shifts_time = microseconds(lambda: structure_by_shifts(own), 2000)
+        lookups_time = microseconds(lambda: rank_pattern_structure(own, STRUCTURE_WEIGHTS), 2000)
+        print("batch of %4d, shifts: %7.2f us, rank lookups: %7.2f us, speedup %.2fx" %
+            (batch_size, shifts_time, lookups_time, shifts_time / lookups_time))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time the pawn structure terms by bitboard shifts and by rank pattern lookups")
+    parser.add_argument('--positions', type=int, default=1000)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[8, 20, 100, 1000])
+    parser.add_argument('--seed', type=int, default=0)
+    arguments = parser.parse_args()
+    run(arguments.positions, arguments.batch_sizes, arguments.seed)
@@ -0,0 +1,186 @@
+from __future__ import annotations
+import chess
+from chess import Move
+from gmpy2 import popcount
+from heuristics import Heuristic, Heuristics
+from typing import List, Tuple
+
+# Squares next to a square that form a pair for the chain, side by side and stacked terms
+DIAGONAL_NEIGHBOURS: List[int] = [0] * 64
+SIDE_NEIGHBOURS: List[int] = [0] * 64
+VERTICAL_NEIGHBOURS: List[int] = [0] * 64
+for _square in chess.SQUARES:
+    _file, _rank = chess.square_file(_square), chess.square_rank(_square)
+    for _file_offset, _rank_offset in [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]:
+        if 0 <= _file + _file_offset < 8 and 0 <= _rank + _rank_offset < 8:
+            _neighbour = chess.BB_SQUARES[chess.square(_file + _file_offset, _rank + _rank_offset)]
+            if _file_offset == 0:
+                VERTICAL_NEIGHBOURS[_square] |= _neighbour
+            elif _rank_offset == 0:
+                SIDE_NEIGHBOURS[_square] |= _neighbour
+            else:
+                DIAGONAL_NEIGHBOURS[_square] |= _neighbour
+# Ranks a piece on a square has advanced, as counted by Distance_From_Starting_Location
+ADVANCEMENT: List[List[int]] = [
+    [max(6 - chess.square_rank(square), 0) for square in chess.SQUARES],
+    [max(chess.square_rank(square) - 1, 0) for square in chess.SQUARES]
+]
+# Slots of the state of each color, followed by the pairs of pawns of different colors that can capture each other
+MATERIAL, ADVANCED, CHAIN_PAIRS, SIDE_PAIRS, STACKED_PAIRS = range(5)
+SLOTS_PER_COLOR = 5
+CONTACTS = 2 * SLOTS_PER_COLOR
+QUEEN_VALUE = 100
+
+
+def _piece_value(board: chess.Board, bitboard: int) -> int:
+    if board.queens & bitboard:
+        return QUEEN_VALUE
+    return 1 if board.pawns & bitboard else 0
+
+
+class IncrementalEvaluator:
+    # Keeps the raw counts behind the heuristic terms of a board up to date while moves are
+    # pushed and popped through it, so a leaf is evaluated by adding up a few numbers.
+    # A move changes the pairs of at most three squares, so only the pairs of those squares
+    # are counted again. Popping restores the counts that were saved by the push.
+    # The counts belong to the position they were made for. On any other board they are
+    # counted from scratch, so the evaluator can be used from any entry point of a search.
+    # With verify, every update is checked against a full evaluation.
+    def __init__(self, heuristics: Heuristics, verify: bool=False) -> None:
+        self.heuristics = heuristics
+        self.verify = verify
+        self.updates = 0
+        self.recomputations = 0
+        self.__weights = self.__term_weights(heuristics)
+        self.__state: Tuple[int, ...] = None
+        self.__position: Tuple[int, int, int] = None
+        self.__stack: List[Tuple[Tuple[int, ...], Tuple[int, int, int]]] = []
+
+    @staticmethod
+    def __term_weights(heuristics: Heuristics) -> List[int]:
+        # Factor of each slot of the player in its value
+        weights = [0] * SLOTS_PER_COLOR + [0]
+        for heuristic in heuristics.list_of_heuristics:
+            if heuristic == Heuristic.Maximize_Number_Of_Pieces:
+                weights[MATERIAL] += heuristics.weights[heuristic]
+            elif heuristic == Heuristic.Keep_Pawns_Diagonally_Supported:
+                weights[CHAIN_PAIRS] += heuristics.weights[heuristic]
+            elif heuristic == Heuristic.Side_By_Side_Pawns:
+                weights[SIDE_PAIRS] += heuristics.weights[heuristic]
+            elif heuristic == Heuristic.Distance_From_Starting_Location:
+                weights[ADVANCED] += heuristics.weights[heuristic]
+            elif heuristic == Heuristic.Stacked_Pawns:
+                weights[STACKED_PAIRS] += heuristics.weights[heuristic]
+            elif heuristic == Heuristic.Piece_Could_Be_Captured:
+                weights[SLOTS_PER_COLOR] += heuristics.weights[heuristic]
+        return weights
+
+    @staticmethod
+    def __position_of(board: chess.Board) -> Tuple[int, int, int]:
+        return board.occupied_co[chess.WHITE], board.occupied_co[chess.BLACK], board.queens
+
+    def reset(self, board: chess.Board) -> None:
+        self.recomputations += 1
+        self.__state = self.full_state(board)
+        self.__position = self.__position_of(board)
+        self.__stack = []
+
+    @staticmethod
+    def full_state(board: chess.Board) -> Tuple[int, ...]:
+        state = [0] * (CONTACTS + 1)
+        for color in chess.COLORS:
+            pieces = board.occupied_co[color]
+            offset = color * SLOTS_PER_COLOR
+            state[offset + MATERIAL] = popcount(board.pawns & pieces) + QUEEN_VALUE * popcount(board.queens & pieces)
+            state[offset + ADVANCED] = sum(ADVANCEMENT[color][square] for square in chess.scan_forward(pieces))
+            state[offset + CHAIN_PAIRS] = popcount((pieces & ~chess.BB_FILE_A) << 7 & pieces) + \
+                popcount((pieces & ~chess.BB_FILE_H) << 9 & pieces)
+            state[offset + SIDE_PAIRS] = popcount((pieces & ~chess.BB_FILE_H) << 1 & pieces)
+            state[offset + STACKED_PAIRS] = popcount(pieces << 8 & pieces)
+        white, black = board.occupied_co[chess.WHITE], board.occupied_co[chess.BLACK]
+        state[CONTACTS] = popcount((white & ~chess.BB_FILE_A) << 7 & black) + popcount((white & ~chess.BB_FILE_H) << 9 & black)
+        return tuple(state)
+
+    def value(self, board: chess.Board, player_color: chess.Color) -> int:
+        if self.__position != self.__position_of(board):
+            self.reset(board)
+        state, weights = self.__state, self.__weights
+        own = player_color * SLOTS_PER_COLOR
+        opponent = (not player_color) * SLOTS_PER_COLOR
+        value = weights[MATERIAL] * (state[own + MATERIAL] - state[opponent + MATERIAL]) + \
+            weights[ADVANCED] * state[own + ADVANCED] + \
+            weights[CHAIN_PAIRS] * state[own + CHAIN_PAIRS] + \
+            weights[SIDE_PAIRS] * state[own + SIDE_PAIRS] + \
+            weights[STACKED_PAIRS] * state[own + STACKED_PAIRS] + \
+            weights[SLOTS_PER_COLOR] * state[CONTACTS]
+        if self.verify:
+            expected = self.heuristics.return_heuristic_value(board, player_color)
+            if value != expected:
+                raise IncrementalEvaluator.EvaluationMismatch(
+                    board.fen() + " is worth " + str(expected) + " but was evaluated as " + str(value))
+        return value
+
+    def push(self, board: chess.Board, move: Move) -> None:
+        if self.__position != self.__position_of(board):
+            self.reset(board)
+        self.updates += 1
+        self.__stack.append((self.__state, self.__position))
+        state = list(self.__state)
+        color = board.turn
+        own_offset = color * SLOTS_PER_COLOR
+        opponent_offset = (not color) * SLOTS_PER_COLOR
+        from_bitboard = chess.BB_SQUARES[move.from_square]
+        to_bitboard = chess.BB_SQUARES[move.to_square]
+        own = board.occupied_co[color] & ~from_bitboard
+        opponent = board.occupied_co[not color]
+        moved_value = _piece_value(board, from_bitboard)
+
+        # Take the pawn off its square
+        self.__remove_pairs(state, own_offset, move.from_square, own)
+        state[own_offset + ADVANCED] -= ADVANCEMENT[color][move.from_square]
+        state[CONTACTS] -= popcount(chess.BB_PAWN_ATTACKS[color][move.from_square] & opponent)
+
+        # Take off a captured pawn, which is behind the target square for en passant
+        captured_square = None
+        if to_bitboard & opponent:
+            captured_square = move.to_square
+        elif chess.square_file(move.from_square) != chess.square_file(move.to_square):
+            captured_square = move.to_square - 8 if color == chess.WHITE else move.to_square + 8
+        if captured_square is not None:
+            captured_bitboard = chess.BB_SQUARES[captured_square]
+            state[opponent_offset + MATERIAL] -= _piece_value(board, captured_bitboard)
+            opponent &= ~captured_bitboard
+            self.__remove_pairs(state, opponent_offset, captured_square, opponent)
+            state[opponent_offset + ADVANCED] -= ADVANCEMENT[not color][captured_square]
+            state[CONTACTS] -= popcount(chess.BB_PAWN_ATTACKS[not color][captured_square] & own)
+
+        # Put the pawn, or what it promoted to, on its target square
+        board.push(move)
+        state[own_offset + MATERIAL] += _piece_value(board, to_bitboard) - moved_value
+        state[own_offset + CHAIN_PAIRS] += popcount(DIAGONAL_NEIGHBOURS[move.to_square] & own)
+        state[own_offset + SIDE_PAIRS] += popcount(SIDE_NEIGHBOURS[move.to_square] & own)
+        state[own_offset + STACKED_PAIRS] += popcount(VERTICAL_NEIGHBOURS[move.to_square] & own)
+        state[own_offset + ADVANCED] += ADVANCEMENT[color][move.to_square]
+        state[CONTACTS] += popcount(chess.BB_PAWN_ATTACKS[color][move.to_square] & opponent)
+
+        self.__state = tuple(state)
+        self.__position = self.__position_of(board)
+        if self.verify and self.__state != self.full_state(board):
+            raise IncrementalEvaluator.EvaluationMismatch(
+                "counts after " + move.uci() + " on " + board.fen() + " are " + str(self.__state) + \
+                    " instead of " + str(self.full_state(board)))
+
+    @staticmethod
+    def __remove_pairs(state: List[int], offset: int, square: chess.Square, pieces: int) -> None:
+        state[offset + CHAIN_PAIRS] -= popcount(DIAGONAL_NEIGHBOURS[square] & pieces)
+        state[offset + SIDE_PAIRS] -= popcount(SIDE_NEIGHBOURS[square] & pieces)
+        state[offset + STACKED_PAIRS] -= popcount(VERTICAL_NEIGHBOURS[square] & pieces)
+
+    def pop(self, board: chess.Board) -> Move:
+        move = board.pop()
+        if self.__stack:
+            self.__state, self.__position = self.__stack.pop()
+        return move
+
+    class EvaluationMismatch(Exception):
+        pass
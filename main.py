@@ -4,12 +4,21 @@ from dataclasses import dataclass
 from enum import Enum
 from heuristics import Heuristic
 import matplotlib.pyplot as plt
+import multiprocessing
 import numpy as np
+import os
+from mctschessplayer import MCTSPlayer
 from minimaxchessplayer import MinimaxPlayer
 from randomchessplayer import RandomChessPlayer
 import time
 from typing import Any, List
 
+# Games of the experiments are played on this many processes
+WORKERS = multiprocessing.cpu_count()
+# Every game of an experiment is stored here as it finishes, so an experiment that is run again
+# only plays the games it did not finish
+RESULTS_DIRECTORY = 'results'
+
 @dataclass
 class ResultsPerMatchup:
     results_per_matchup: List[Any]
@@ -20,10 +29,14 @@ class Main:
         # self.__run_heuristics_by_depth_experiments()
         # self.__run_heuristics_ablation_study()
         # self.__run_minimax_with_heuristics_vs_random()
+        # self.__run_mcts_vs_baselines()
          self.__compare_runtimes_of_basic_configs()
 
-    def __run_and_plot_one_experiment(self, iterations: int, baselines: List[ChessPlayer], testplayers: List[ChessPlayer], title_addition: str) -> None:
-        test_results: List[List[Results]] = AIChess(iterations=iterations, baselines=baselines, testplayers=testplayers).run()
+    def __run_and_plot_one_experiment(self, iterations: int, baselines: List[ChessPlayer], testplayers: List[ChessPlayer], title_addition: str) -> List[List[Results]]:
+        os.makedirs(RESULTS_DIRECTORY, exist_ok=True)
+        result_store = os.path.join(RESULTS_DIRECTORY, title_addition.replace(' ', '-') + '.jsonl')
+        test_results: List[List[Results]] = AIChess(iterations=iterations, baselines=baselines, testplayers=testplayers, workers=WORKERS,
+            result_store=result_store).run()
         print("test_results: ", test_results)
         for i, results_per_baseline in enumerate(test_results):
             baseline = baselines[i]
@@ -64,6 +77,7 @@ class Main:
                 ylabel='Average Processing Time Per Move in Seconds',
                 title_addition=title_addition
             )
+        return test_results
 
     def __append_as_percent(self, results_by_type: np.array(float), percent: float) -> None:
         results_by_type.append(np.round(percent, 2) * 100)
@@ -144,29 +158,34 @@ class Main:
         title = 'Heuristic Ablation Study'
         num_iterations = 100
         depth = 4
+        transposition_table_mb = 16
         all_heuristics = list(Heuristic)
         baselines =  [MinimaxPlayer(
             time=time,
             depth=depth,
             heuristics=[],
-            run_alpha_beta=True
+            run_alpha_beta=True,
+            transposition_table_mb=transposition_table_mb
         ), MinimaxPlayer(
             time=time,
             depth=depth,
             heuristics=all_heuristics,
-            run_alpha_beta=True
+            run_alpha_beta=True,
+            transposition_table_mb=transposition_table_mb
         )]
         testplayers = [MinimaxPlayer(
             time=time,
             depth=depth,
             heuristics=[heuristic],
-            run_alpha_beta=True
+            run_alpha_beta=True,
+            transposition_table_mb=transposition_table_mb
         ) for heuristic in all_heuristics] + \
             [MinimaxPlayer(
                 time=time,
                 depth=depth,
                 heuristics=[heuristic for heuristic in all_heuristics if all_heuristics.index(heuristic) != index],
-                run_alpha_beta=True
+                run_alpha_beta=True,
+                transposition_table_mb=transposition_table_mb
             ) for index in range(len(all_heuristics))]
         self.__run_and_plot_one_experiment(iterations=num_iterations, baselines=baselines, testplayers=testplayers, title_addition=title)
 
@@ -182,6 +201,32 @@ class Main:
         ) for depth in range(4)]
         self.__run_and_plot_one_experiment(iterations=num_iterations, baselines=baselines, testplayers=testplayers, title_addition=title)
 
+    def __run_mcts_vs_baselines(self) -> None:
+        title = 'MCTS by Time Budget'
+        num_iterations = 50
+        baselines = [
+            RandomChessPlayer(time=time),
+            MinimaxPlayer(
+                time=time,
+                depth=3,
+                heuristics=list(Heuristic),
+                run_alpha_beta=True
+            )
+        ]
+        testplayers = [MCTSPlayer(time=time, time_budget=time_budget) for time_budget in [0.05, 0.1, 0.2, 0.4]]
+        test_results = self.__run_and_plot_one_experiment(iterations=num_iterations, baselines=baselines, testplayers=testplayers, title_addition=title)
+        # From the results rather than the players, which have not played the games read back from the result store
+        decision_times = {player.get_name(): [] for player in testplayers + baselines}
+        for results_per_baseline in test_results:
+            for results in results_per_baseline:
+                decision_times[results.player1_name].append(results.average_decision_time_player1)
+                decision_times[results.player2_name].append(results.average_decision_time_player2)
+        for player in testplayers + baselines:
+            average_decision_time = np.mean(decision_times[player.get_name()]) if decision_times[player.get_name()] else 0
+            print(player.get_name(), "decisions per second:", round(1 / average_decision_time, 2) if average_decision_time > 0 else "n/a",
+                "playouts per second:" if isinstance(player, MCTSPlayer) else "",
+                round(player.average_playouts_per_second()) if isinstance(player, MCTSPlayer) else "")
+
     def __compare_runtimes_of_basic_configs(self) -> None:
         title = 'Runtime of Basic Configurations'
         depth = 3
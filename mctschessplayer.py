@@ -0,0 +1,218 @@
+from __future__ import annotations
+from aichessboard import AIChessBoard
+import chess
+from chess import Move
+from chessplayer import ChessPlayer
+import math
+import numpy as np
+from pawnboard import PawnBoard
+from typing import Any, Dict, List
+
+EXPLORATION = math.sqrt(2)
+ITERATIONS = 200
+PLAYOUTS_PER_LEAF = 32
+WIN = 1.0
+DRAW = 0.5
+UINT64_ONE = np.uint64(1)
+BB_BACKRANKS = np.uint64(chess.BB_BACKRANKS)
+BB_NOT_FILE_A = np.uint64(~chess.BB_FILE_A & chess.BB_ALL)
+BB_NOT_FILE_H = np.uint64(~chess.BB_FILE_H & chess.BB_ALL)
+BB_RANK_3 = np.uint64(chess.BB_RANK_3)
+BB_RANK_6 = np.uint64(chess.BB_RANK_6)
+SHIFTS = {shift: np.uint64(shift) for shift in [7, 8, 9]}
+# Distance from the origin to the target square of single pushes, double pushes and both captures
+MOVE_OFFSETS = {
+    chess.WHITE: np.array([8, 16, 7, 9]),
+    chess.BLACK: np.array([-8, -16, -7, -9])
+}
+
+
+def _move_targets(pawns: np.ndarray, opponent: np.ndarray, turn: chess.Color) -> np.ndarray:
+    # Target squares of every kind of move, one bitboard per kind and game, in the order of MOVE_OFFSETS
+    empty = ~(pawns | opponent)
+    if turn == chess.WHITE:
+        single = (pawns << SHIFTS[8]) & empty
+        double = ((single & BB_RANK_3) << SHIFTS[8]) & empty
+        left = ((pawns & BB_NOT_FILE_A) << SHIFTS[7]) & opponent
+        right = ((pawns & BB_NOT_FILE_H) << SHIFTS[9]) & opponent
+    else:
+        single = (pawns >> SHIFTS[8]) & empty
+        double = ((single & BB_RANK_6) >> SHIFTS[8]) & empty
+        left = ((pawns & BB_NOT_FILE_H) >> SHIFTS[7]) & opponent
+        right = ((pawns & BB_NOT_FILE_A) >> SHIFTS[9]) & opponent
+    return np.stack([single, double, left, right], axis=1)
+
+
+def random_playouts(white: int, black: int, turn: chess.Color, number: int) -> np.ndarray:
+    # Plays number random games from one position at the same time and returns 1 for a white
+    # win, -1 for a black win and 0 for a draw. All games move in lock step, so a move is made
+    # for every unfinished game with a few array operations. Each kind of move to each square
+    # is one bit, and the move of a game is its k-th set bit for a random k below its number of
+    # moves. Promotions count as one move and en passant is left out.
+    boards = {
+        chess.WHITE: np.full(number, white, dtype=np.uint64),
+        chess.BLACK: np.full(number, black, dtype=np.uint64)
+    }
+    results = np.zeros(number, dtype=np.int8)
+    active = np.ones(number, dtype=bool)
+    while active.any():
+        pawns, opponent = boards[turn], boards[not turn]
+        targets = _move_targets(pawns, opponent, turn)
+        bits = np.unpackbits(targets.view(np.uint8).reshape(number, -1), axis=1, bitorder='little')
+        cumulative = np.cumsum(bits, axis=1, dtype=np.int16)
+        counts = cumulative[:, -1]
+        # A side without moves draws
+        moving = active & (counts > 0)
+        active = moving
+        choices = (np.random.random(number) * counts).astype(np.int16)
+        indexes = np.argmax(cumulative > choices[:, None], axis=1)
+        to_squares = indexes & 63
+        from_squares = to_squares - MOVE_OFFSETS[turn][indexes >> 6]
+        to_bitboards = UINT64_ONE << to_squares.astype(np.uint64)
+        from_bitboards = UINT64_ONE << np.where(moving, from_squares, 0).astype(np.uint64)
+        boards[turn] = np.where(moving, pawns ^ (from_bitboards | to_bitboards), pawns)
+        boards[not turn] = np.where(moving, opponent & ~to_bitboards, opponent)
+        won = moving & ((to_bitboards & BB_BACKRANKS) != 0)
+        results[won] = 1 if turn == chess.WHITE else -1
+        active &= ~won
+        turn = not turn
+    return results
+
+
+class MCTSNode:
+    # Wins are counted for the side that made the move into the node, with half a win for a draw
+    __slots__ = ('board', 'parent', 'move', 'children', 'untried_moves', 'visits', 'wins', 'terminal_reward')
+
+    def __init__(self, board: PawnBoard, parent: MCTSNode=None, move: Move=None) -> None:
+        self.board = board
+        self.parent = parent
+        self.move = move
+        self.children: List[MCTSNode] = []
+        self.visits = 0
+        self.wins = 0.0
+        self.terminal_reward: float = None
+        if board.outcome() is not None:
+            self.untried_moves: List[Move] = []
+            self.terminal_reward = WIN
+            return
+        # Every promotion wins, so only one of them is kept
+        self.untried_moves = [move for move in board.legal_moves if move.promotion in (None, chess.QUEEN)]
+        np.random.shuffle(self.untried_moves)
+        if not self.untried_moves and parent is not None:
+            self.terminal_reward = DRAW
+
+
+class MCTSPlayer(ChessPlayer):
+    # Monte Carlo tree search with UCT. Each iteration walks down the tree to a node with an
+    # unexpanded move, adds its child and scores it with a batch of random playouts.
+    # The most visited move is played and its subtree is kept for the next move.
+    def __init__(
+        self,
+        time: Any,
+        iterations: int = None,
+        time_budget: float = None,
+        exploration: float = EXPLORATION,
+        playouts_per_leaf: int = PLAYOUTS_PER_LEAF
+    ) -> None:
+        super().__init__(time)
+        self.iterations = ITERATIONS if iterations is None and time_budget is None else iterations
+        self.time_budget = time_budget
+        self.exploration = exploration
+        self.playouts_per_leaf = playouts_per_leaf
+        self.root: MCTSNode = None
+        self.iterations_searched = 0
+        self.reused_visits = 0
+        self.playouts_per_second = 0.0
+        # Playouts and search time of every move, added up
+        self.total_playouts = 0
+        self.total_search_seconds = 0.0
+        self.__name = self.__class__.__name__ + "\n(" + \
+            ("iterations: " + str(self.iterations) if self.iterations is not None else "") + \
+            (";\n " if self.iterations is not None and time_budget is not None else "") + \
+            ("time budget: " + str(time_budget) + "s" if time_budget is not None else "") + ")"
+
+    def get_name(self) -> str:
+        return self.__name
+
+    def average_playouts_per_second(self) -> float:
+        return self.total_playouts / self.total_search_seconds if self.total_search_seconds > 0 else 0.0
+
+    def get_config(self) -> Dict[str, Any]:
+        return dict(super().get_config(), iterations=self.iterations, time_budget=self.time_budget,
+            exploration=self.exploration, playouts_per_leaf=self.playouts_per_leaf)
+
+    def _ChessPlayer__get_next_move(self, board: AIChessBoard) -> Move:
+        return self.search(board)
+
+    def search(self, board: AIChessBoard) -> Move:
+        root = self.__reuse_subtree(PawnBoard.from_board(board) if not isinstance(board, PawnBoard) else board.copy(stack=False))
+        if not root.untried_moves and not root.children:
+            raise ChessPlayer.ChessPlayerException("No legal moves remain")
+        self.reused_visits = root.visits
+        clock = self._ChessPlayer__time
+        start = clock.perf_counter()
+        deadline = start + self.time_budget if self.time_budget is not None else None
+        iterations = 0
+        while self.iterations is None or iterations < self.iterations:
+            if deadline is not None and iterations > 0 and clock.perf_counter() >= deadline:
+                break
+            self.iterate(root)
+            iterations += 1
+        elapsed = clock.perf_counter() - start
+        self.iterations_searched = iterations
+        self.playouts_per_second = iterations * self.playouts_per_leaf / elapsed if elapsed > 0 else 0.0
+        self.total_playouts += iterations * self.playouts_per_leaf
+        self.total_search_seconds += elapsed
+        best_child = max(root.children, key=lambda child: child.visits)
+        best_child.parent = None
+        self.root = best_child
+        return best_child.move
+
+    def new_game(self) -> None:
+        self.root = None
+
+    # The most visited reply below the move that was just played
+    def predict_reply(self, board: AIChessBoard) -> Move:
+        if self.root is None or not self.root.children:
+            return None
+        return max(self.root.children, key=lambda child: child.visits).move
+
+    def __reuse_subtree(self, board: PawnBoard) -> MCTSNode:
+        # The position after the opponent's reply is a child of the node of our last move
+        if self.root is not None:
+            if self.root.board == board:
+                return self.root
+            for child in self.root.children:
+                if child.board == board:
+                    child.parent = None
+                    return child
+        return MCTSNode(board)
+
+    def iterate(self, root: MCTSNode) -> None:
+        node = root
+        while not node.untried_moves and node.children:
+            node = self.select_child(node)
+        if node.untried_moves:
+            move = node.untried_moves.pop()
+            board = node.board.copy(stack=False)
+            board.push(move)
+            child = MCTSNode(board, parent=node, move=move)
+            node.children.append(child)
+            node = child
+        visits = self.playouts_per_leaf
+        if node.terminal_reward is not None:
+            wins = node.terminal_reward * visits
+        else:
+            results = random_playouts(node.board.white, node.board.black, node.board.turn, visits)
+            mover_wins = 1 if node.board.turn == chess.BLACK else -1
+            wins = np.count_nonzero(results == mover_wins) * WIN + np.count_nonzero(results == 0) * DRAW
+        while node is not None:
+            node.visits += visits
+            node.wins += wins
+            wins = visits - wins
+            node = node.parent
+
+    def select_child(self, node: MCTSNode) -> MCTSNode:
+        log_visits = math.log(node.visits)
+        return max(node.children, key=lambda child:
+            child.wins / child.visits + self.exploration * math.sqrt(log_visits / child.visits))
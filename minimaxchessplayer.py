@@ -5,22 +5,51 @@ from chess import Move
 from chessplayer import ChessPlayer
 from dataclasses import dataclass, field
 from enum import Enum
-from heuristics import Heuristic, Heuristics
+from evaluationcache import EvaluationCache
+from heuristics import Heuristic, Heuristics, load_weight_profile
+from incrementalevaluator import IncrementalEvaluator
 import math
+from moveordering import MoveOrderer, MoveOrdering
 import numpy as np
-from typing import Any
+from openingbook import OpeningBook
+from parallelsearch import ParallelSearch
+from pawnboard import PawnBoard
+from pawnrace import race_result
+from searchstats import SearchReport
+from tablebase import Tablebase
+from transpositiontable import Bound, TranspositionEntry, TranspositionTable, ZOBRIST_BLACK_PERSPECTIVE, zobrist_hash
+from typing import Any, Dict, List, Tuple
 
 REWARD_DEFAULT = 0
 ALPHA_DEFAULT = -math.inf
 BETA_DEFAULT = math.inf
 BACK_ROW_FOR_WHITE = 18374686479671623680
 BACK_ROW_FOR_BLACK = 255
-
+BYTES_PER_MEGABYTE = 1 << 20
+NODES_BETWEEN_CLOCK_CHECKS = 64
+# Fewest children of the last ply for which evaluating them in one NumPy batch pays off
+BATCH_MIN_LEAVES = 8
+QUIESCENCE_NODE_LIMIT = 200
+# Largest gain in evaluation a single capture is assumed to make, for delta pruning
+QUIESCENCE_DELTA_MARGIN = 100
+BB_WHITE_PROMOTION_THREATS = chess.BB_RANK_7 | chess.BB_RANK_8
+BB_BLACK_PROMOTION_THREATS = chess.BB_RANK_2 | chess.BB_RANK_1
+# Taken off the reward of a won pawn race or tablebase position per ply to the end of the game,
+# so quicker wins are preferred
+RACE_PLY_DISCOUNT = 1
+FLIPPED_BOUNDS = {Bound.EXACT: Bound.EXACT, Bound.LOWER: Bound.UPPER, Bound.UPPER: Bound.LOWER}
+
+# Wins and losses, whether found on the board, in the tablebase or in a pawn race, outweigh any
+# evaluation of the heuristics. They are moved toward a draw by a point per ply below the root
+# (win_reward), so a quicker win and a slower loss score higher.
 class WinReward(Enum):
-    WIN = 10
-    LOSS = -10
+    WIN = 10 ** 6
+    LOSS = -10 ** 6
     DRAW = 0
 
+# Scores further than this from a draw are wins or losses, whatever their number of plies
+WIN_SCORE_MIN = WinReward.WIN.value - 10 ** 4
+
 class WinStatus(Enum):
     WIN = 1
     LOSS = -1
@@ -38,6 +67,8 @@ class Node:
     alpha:            int=field(compare=False)
     beta:            int=field(compare=False)
     parent:         Node=field(compare=False)
+    # The children that were searched, in the order they were searched
+    children:       List[Node]=field(default_factory=list, compare=False, repr=False)
 
     def copy(self) -> Node:
         return Node(
@@ -48,7 +79,8 @@ class Node:
             self.win_status,
             self.alpha,
             self.beta,
-            self.parent
+            self.parent,
+            self.children
         )
 
     def __eq__(self, other) -> bool:
@@ -62,22 +94,177 @@ class MinimaxPlayer(ChessPlayer):
         time: Any,
         depth: int,
         heuristics: list(Heuristic),
-        run_alpha_beta: bool
+        run_alpha_beta: bool,
+        transposition_table_mb: float = 0,
+        pawn_board: bool = False,
+        time_budget: float = None,
+        node_budget: int = None,
+        move_ordering: List[MoveOrdering] = None,
+        quiescence: bool = False,
+        quiescence_node_limit: int = QUIESCENCE_NODE_LIMIT,
+        quiescence_delta_margin: float = QUIESCENCE_DELTA_MARGIN,
+        workers: int = 1,
+        lazy_smp: bool = False,
+        tablebase_directory: str = None,
+        opening_book: str = None,
+        trace: bool = False,
+        race_detection: bool = False,
+        incremental_evaluation: bool = False,
+        verify_evaluation: bool = False,
+        evaluation_cache_mb: float = 0,
+        evaluation_cache: EvaluationCache = None,
+        weight_profile: str = None
     ) -> None:
         super().__init__(time)
         self.depth = depth
-        self.heuristic_calculator = Heuristics(heuristics)
+        # Heuristic values by pawn structure, either a cache of its own or one shared with other
+        # players of the same heuristics. A shared cache is only shared within one process.
+        if evaluation_cache is None and evaluation_cache_mb > 0:
+            evaluation_cache = EvaluationCache(int(evaluation_cache_mb * BYTES_PER_MEGABYTE))
+        self.evaluation_cache = evaluation_cache
+        # Weights of the heuristics tuned by tuning.py, instead of the defaults
+        self.weight_profile = weight_profile
+        self.heuristic_calculator = Heuristics(heuristics, cache=evaluation_cache,
+            weights=load_weight_profile(weight_profile) if weight_profile is not None else None)
+        # Keep the heuristic terms up to date through the pushes and pops of the search, checking
+        # every update against a full evaluation with verify_evaluation
+        self.evaluator: IncrementalEvaluator = IncrementalEvaluator(self.heuristic_calculator, verify=verify_evaluation) \
+            if incremental_evaluation else None
         self.run_alpha_beta = run_alpha_beta
+        # Scores are kept from the point of view of the player to move at the root,
+        # which is folded into the key, so the table can be reused between moves and games.
+        self.transposition_table_mb = transposition_table_mb
+        self.transposition_table: TranspositionTable = TranspositionTable(
+            int(transposition_table_mb * BYTES_PER_MEGABYTE)) if transposition_table_mb > 0 else None
+        # Build the full Node tree of the search for debugging, kept in search_tree
+        self.trace = trace
+        self.search_tree: Node = None
+        # Search on the bitboard PawnBoard instead of python-chess
+        self.pawn_board = pawn_board
+        # With a budget, depth is the deepest iteration of an iterative deepening search
+        self.time_budget = time_budget
+        self.node_budget = node_budget
+        self.completed_depth = 0
+        self.principal_variation: List[Move] = []
+        # Orders the moves of negamax and counts how often the first move causes a cutoff
+        if move_ordering is None:
+            move_ordering = []
+        self.move_orderer = MoveOrderer(move_ordering)
+        # Keep searching captures and promotion threats past the horizon of negamax
+        self.quiescence = quiescence
+        self.quiescence_node_limit = quiescence_node_limit
+        self.quiescence_delta_margin = quiescence_delta_margin
+        self.quiescence_nodes = 0
+        # Fixed depth searches are split over a pool of worker processes when there is more than one
+        # worker, either by root move or as Lazy SMP workers sharing one transposition table
+        self.workers = workers
+        self.lazy_smp = lazy_smp
+        # Exact results for positions with few pawns replace the search below them
+        self.tablebase: Tablebase = Tablebase(tablebase_directory) if tablebase_directory is not None else None
+        # Pawn races that are decided end the search below the root like a promotion
+        self.race_detection = race_detection
+        self.race_wins = 0
+        # Book moves are played without searching
+        self.opening_book: OpeningBook = OpeningBook(opening_book) if opening_book is not None else None
+        # Set from another process to stop the search, as for a node budget
+        self.stop_event: Any = None
+        self.__parallel_search: ParallelSearch = None
+        self.__quiescence_nodes_left = 0
+        # Counters of the search report, kept as plain integers so they cost next to nothing
+        self.search_report = SearchReport()
+        self.total_search_report = SearchReport()
+        self.__nodes_searched = 0
+        self.__leaf_evaluations = 0
+        self.__max_ply = 0
+        self.__search_plies = 0
+        self.__cutoffs = 0
+        self.__first_move_cutoffs = 0
+        self.__report_start_counts: List[int] = []
+        self.__deadline: float = None
+        self.__node_limit: int = None
+        self.__principal_variation_lines: List[List[Move]] = None
         self.__name = self.__class__.__name__ + "\n(depth: " + str(depth) + \
             ";\n heuristics: " + str(self.heuristic_calculator) + \
                 ";\n AB pruning:" + ("on" if self.run_alpha_beta else "off") + ")"
+        self.__config: Dict[str, Any] = {
+            'depth': depth,
+            'heuristics': [heuristic.name for heuristic in self.heuristic_calculator.list_of_heuristics],
+            'weights': {heuristic.name: weight for heuristic, weight in self.heuristic_calculator.weights.items()},
+            'run_alpha_beta': run_alpha_beta,
+            'transposition_table_mb': transposition_table_mb,
+            'pawn_board': pawn_board,
+            'time_budget': time_budget,
+            'node_budget': node_budget,
+            'move_ordering': [ordering.name for ordering in move_ordering],
+            'quiescence': quiescence,
+            'quiescence_node_limit': quiescence_node_limit,
+            'quiescence_delta_margin': quiescence_delta_margin,
+            'workers': workers,
+            'lazy_smp': lazy_smp,
+            'tablebase_directory': tablebase_directory,
+            'opening_book': opening_book,
+            'trace': trace,
+            'race_detection': race_detection,
+            'incremental_evaluation': incremental_evaluation,
+            'verify_evaluation': verify_evaluation,
+            'evaluation_cache_bytes': evaluation_cache.size_in_bytes if evaluation_cache is not None else 0,
+            'weight_profile': weight_profile
+        }
 
     def _ChessPlayer__get_next_move(self, board: AIChessBoard) -> Move:
         return self.min_max(board=board, depth=self.depth)
 
-    # Wrapper function for pre_order
+    # Wrapper function for pre_order and push_pop_search. Leaves a SearchReport of the move in search_report.
     def min_max(self, board: AIChessBoard, depth: int) -> chess.Move:
+        clock = self._ChessPlayer__time
+        start = clock.perf_counter()
+        self.__start_search_report()
+        try:
+            return self.__min_max(board=board, depth=depth)
+        finally:
+            self.search_report = self.__finish_search_report(seconds=clock.perf_counter() - start)
+            self.total_search_report = self.total_search_report.merged(self.search_report)
+
+    def __min_max(self, board: AIChessBoard, depth: int) -> chess.Move:
         node_depth = depth + 1 #increment to let preorder decrement to the proper depth
+        if self.pawn_board and not isinstance(board, PawnBoard):
+            board = PawnBoard.from_board(board)
+        if self.opening_book is not None:
+            book_move = self.opening_book.choose(board)
+            if book_move is not None:
+                return book_move
+        self.new_search()
+        self.__search_plies = node_depth
+        if self.trace:
+            return self.__traced_search(board=board, depth=node_depth)
+        if self.time_budget is not None or self.node_budget is not None:
+            return self.iterative_deepening(board=board, depth=depth)
+        if self.workers > 1:
+            if self.__parallel_search is None:
+                self.__parallel_search = ParallelSearch(player=self, workers=self.workers, lazy_smp=self.lazy_smp)
+            _, best_move = self.__parallel_search.search(board=board, depth=node_depth)
+            if best_move == None:
+                raise ChessPlayer.ChessPlayerException("No legal moves remain")
+            return best_move
+        if self.run_alpha_beta or self.quiescence:
+            _, best_move = self.negamax(
+                board=board.copy(stack=False),
+                depth=node_depth,
+                alpha=ALPHA_DEFAULT,
+                beta=BETA_DEFAULT,
+                maximizer=board.turn
+            )
+            if best_move == None:
+                raise ChessPlayer.ChessPlayerException("No legal moves remain")
+            return best_move
+        # Copy once so the caller's board is untouched even if the search is interrupted
+        _, best_move = self.push_pop_search(board=board.copy(stack=False), depth=node_depth, maximizer=board.turn)
+        if best_move == None:
+            raise ChessPlayer.ChessPlayerException("No legal moves remain")
+        return best_move
+
+    # The search of pre_order, which keeps a Node for every position it visits
+    def __traced_search(self, board: AIChessBoard, depth: int) -> Move:
         root = Node(
             reward_if_taking_best_move=REWARD_DEFAULT,
             board=board,
@@ -88,21 +275,182 @@ class MinimaxPlayer(ChessPlayer):
             beta=BETA_DEFAULT,
             parent=None
         )
-        solution_node = self.pre_order(root_board=board, current=root, depth=node_depth)
+        self.search_tree = root
+        solution_node = self.pre_order(root_board=board, current=root, depth=depth)
         best_move = solution_node.best_move_from_board
         if best_move == None:
             raise ChessPlayer.ChessPlayerException("No legal moves remain")
         return best_move
 
+    def __start_search_report(self) -> None:
+        self.__nodes_searched = 0
+        self.__leaf_evaluations = 0
+        self.__max_ply = 0
+        self.__search_plies = 0
+        self.__cutoffs = 0
+        self.__first_move_cutoffs = 0
+        self.quiescence_nodes = 0
+        self.__report_start_counts = self.__cache_counts()
+
+    # Counters of the search since the last call: nodes, leaf evaluations, quiescence nodes,
+    # cutoffs, first move cutoffs and the deepest ply, then the probes and hits of every cache.
+    # The worker processes of a parallel search send them back with every result.
+    def take_search_counts(self) -> List[int]:
+        counts = [self.__nodes_searched, self.__leaf_evaluations, self.quiescence_nodes, self.__cutoffs,
+            self.__first_move_cutoffs, self.__max_ply]
+        cache_counts = self.__cache_counts()
+        start_counts = self.__report_start_counts or [0] * len(cache_counts)
+        counts += [count - start_count for count, start_count in zip(cache_counts, start_counts)]
+        search_plies = self.__search_plies
+        self.__start_search_report()
+        self.__search_plies = search_plies
+        return counts
+
+    # Adds the counters of a search in another process to the search report of this one
+    def add_search_counts(self, counts: List[int]) -> None:
+        self.__nodes_searched += counts[0]
+        self.__leaf_evaluations += counts[1]
+        self.quiescence_nodes += counts[2]
+        self.__cutoffs += counts[3]
+        self.__first_move_cutoffs += counts[4]
+        self.__max_ply = max(self.__max_ply, counts[5])
+        self.__report_start_counts = [start_count - count for start_count, count in zip(self.__report_start_counts, counts[6:])]
+
+    def __cache_counts(self) -> List[int]:
+        counts = []
+        for cache in [self.transposition_table, self.tablebase, self.opening_book, self.evaluation_cache]:
+            counts += [cache.probes, cache.hits] if cache is not None else [0, 0]
+        return counts
+
+    def __finish_search_report(self, seconds: float) -> SearchReport:
+        cache_counts = [count - start_count for count, start_count in zip(self.__cache_counts(), self.__report_start_counts)]
+        return SearchReport(
+            moves=1,
+            nodes=self.__nodes_searched,
+            leaf_evaluations=self.__leaf_evaluations,
+            quiescence_nodes=self.quiescence_nodes,
+            plies=self.completed_depth if self.time_budget is not None or self.node_budget is not None else self.__search_plies,
+            max_depth=self.__max_ply,
+            cutoffs=self.__cutoffs,
+            first_move_cutoffs=self.__first_move_cutoffs,
+            seconds=seconds,
+            transposition_probes=cache_counts[0],
+            transposition_hits=cache_counts[1],
+            tablebase_probes=cache_counts[2],
+            tablebase_hits=cache_counts[3],
+            book_probes=cache_counts[4],
+            book_hits=cache_counts[5],
+            evaluation_cache_probes=cache_counts[6],
+            evaluation_cache_hits=cache_counts[7]
+        )
+
+    # The reply of the principal variation, or the best move the table remembers for the opponent
+    def predict_reply(self, board: AIChessBoard) -> Move:
+        if len(self.principal_variation) > 1:
+            return self.principal_variation[1]
+        if self.transposition_table is not None:
+            entry = self.transposition_table.probe(self.transposition_key(board=board, maximizer=not board.turn))
+            if entry is not None:
+                return entry.best_move
+        return None
+
+    def new_search(self) -> None:
+        if self.transposition_table is not None:
+            self.transposition_table.new_search()
+        self.move_orderer.new_search()
+
+    # The transposition table, move ordering tables and principal variation only hold what was
+    # learned in this game. Parallel searches start again on fresh workers.
+    def new_game(self) -> None:
+        if self.transposition_table is not None:
+            self.transposition_table.clear()
+        self.move_orderer.new_game()
+        self.principal_variation = []
+        self.search_tree = None
+        self.close()
+
+    # Shut down the worker processes of a parallel search
+    def close(self) -> None:
+        if self.__parallel_search is not None:
+            self.__parallel_search.close()
+            self.__parallel_search = None
+
+    # Worker processes get a copy of the player without the pool and with an empty table
+    def __getstate__(self) -> dict:
+        state = super().__getstate__()
+        state['_MinimaxPlayer__parallel_search'] = None
+        state['transposition_table'] = None
+        state['stop_event'] = None
+        state['search_tree'] = None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        super().__setstate__(state)
+        if self.transposition_table_mb > 0:
+            self.transposition_table = TranspositionTable(int(self.transposition_table_mb * BYTES_PER_MEGABYTE))
+
+    # Search one ply deeper each iteration until the time or node budget runs out, and play the
+    # best move of the last completed iteration. Each iteration searches the principal variation
+    # of the previous one first. The first iteration always completes so there is a move to play.
+    def iterative_deepening(self, board: AIChessBoard, depth: int) -> Move:
+        clock = self._ChessPlayer__time
+        self.__deadline = clock.perf_counter() + self.time_budget if self.time_budget is not None else None
+        self.__nodes_searched = 0
+        self.completed_depth = 0
+        self.principal_variation = []
+        best_move = None
+        for node_depth in range(1, depth + 2):
+            self.__node_limit = self.node_budget if node_depth > 1 else None
+            self.__principal_variation_lines = [[] for _ in range(node_depth + 1)]
+            try:
+                _, move = self.negamax(
+                    board=board.copy(stack=False),
+                    depth=node_depth,
+                    alpha=ALPHA_DEFAULT,
+                    beta=BETA_DEFAULT,
+                    maximizer=board.turn,
+                    on_principal_variation=True
+                )
+            except MinimaxPlayer.SearchBudgetExceeded:
+                break
+            finally:
+                self.__principal_variation_lines, lines = None, self.__principal_variation_lines
+            best_move = move
+            self.completed_depth = node_depth
+            self.principal_variation = lines[0]
+            if move == None or self.__is_out_of_time():
+                break
+        self.__deadline = None
+        self.__node_limit = None
+        if best_move == None:
+            raise ChessPlayer.ChessPlayerException("No legal moves remain")
+        return best_move
 
-    # Preorder DFS of binary tree.
-    def pre_order(self, root_board: AIChessBoard, current: Node, depth: int) -> Node:
+    def __is_out_of_time(self) -> bool:
+        return self.__deadline is not None and self._ChessPlayer__time.perf_counter() >= self.__deadline
+
+    def __check_search_budget(self) -> None:
+        self.__nodes_searched += 1
+        if self.__node_limit is not None and self.__nodes_searched > self.__node_limit:
+            raise MinimaxPlayer.SearchBudgetExceeded()
+        if self.__nodes_searched % NODES_BETWEEN_CLOCK_CHECKS == 0:
+            if self.__deadline is not None and self.completed_depth > 0 and self.__is_out_of_time():
+                raise MinimaxPlayer.SearchBudgetExceeded()
+            if self.stop_event is not None and self.stop_event.is_set():
+                raise MinimaxPlayer.SearchBudgetExceeded()
+
+    # Preorder DFS of binary tree. Only used by the trace mode, as it allocates a Node and a board per position.
+    def pre_order(self, root_board: AIChessBoard, current: Node, depth: int, ply: int = 0) -> Node:
+        self.__nodes_searched += 1
+        if self.__search_plies - depth > self.__max_ply:
+            self.__max_ply = self.__search_plies - depth
 
         early_exit_reward = self.check_terminal_state(
             current=current,
             root_board=root_board,
             depth=depth,
-            maximizer=root_board.turn
+            maximizer=root_board.turn,
+            ply=ply
         )
         if early_exit_reward != None:
             current.reward_if_taking_best_move = early_exit_reward
@@ -114,6 +462,22 @@ class MinimaxPlayer(ChessPlayer):
                 current.win_status = WinStatus.DRAW
             return current
 
+        # The root is always searched so that ties between its moves are still broken randomly
+        transposition_key = None
+        if self.transposition_table is not None and current.parent is not None:
+            transposition_key = self.transposition_key(board=current.board, maximizer=root_board.turn)
+            entry = self.probe_transposition(key=transposition_key, ply=ply)
+            if entry is not None and self.is_transposition_cutoff(
+                entry=entry,
+                depth=depth,
+                is_max_node=current.board.turn == root_board.turn,
+                parent_alpha=current.parent.alpha,
+                parent_beta=current.parent.beta
+            ):
+                current.reward_if_taking_best_move = entry.score
+                current.best_move_from_board = entry.best_move
+                return current
+
         # Unpack each move to see the states
         children: np.array(Node) = self.unpack(root=current)
 
@@ -123,13 +487,16 @@ class MinimaxPlayer(ChessPlayer):
             return current
 
         tree = []
+        is_pruned = False
         for child in children:
-            child_node = self.pre_order(root_board=root_board, current=child, depth=depth - 1)
+            child_node = self.pre_order(root_board=root_board, current=child, depth=depth - 1, ply=ply + 1)
             if self.run_alpha_beta:
                 is_pruned = self.alpha_beta_pruning(max_player=root_board.turn, child=child, current=current)
                 if is_pruned:
+                    self.__count_cutoff(children_searched=len(tree))
                     break
             tree.append(child_node)
+        current.children = tree
 
         # Return a random move in the absence of heuristic difference
         if tree.count(tree[0]) == len(tree):
@@ -139,8 +506,363 @@ class MinimaxPlayer(ChessPlayer):
             best_child: Node = max(tree) if (current.board.turn == root_board.turn) else min(tree)
         current.reward_if_taking_best_move = best_child.reward_if_taking_best_move
         current.best_move_from_board = best_child.move_that_generated_this_board
+
+        if self.transposition_table is not None:
+            self.store_transposition(
+                key=transposition_key if transposition_key is not None else \
+                    self.transposition_key(board=current.board, maximizer=root_board.turn),
+                depth=depth,
+                reward=current.reward_if_taking_best_move,
+                best_move=current.best_move_from_board,
+                is_pruned=is_pruned,
+                is_max_node=current.board.turn == root_board.turn,
+                ply=ply
+            )
         return current
 
+    # Same search as pre_order without pruning, but every child is visited by pushing its move
+    # onto a single board and popping it afterwards. Scores and moves stay in locals, so no Node
+    # or board is created per position. The bounds of the parent are only used to probe the
+    # transposition table and are None at the root. min_max runs every search with alpha-beta
+    # pruning through negamax.
+    def push_pop_search(
+        self,
+        board: AIChessBoard,
+        depth: int,
+        maximizer: chess.Color,
+        parent_alpha: float = None,
+        parent_beta: float = None,
+        ply: int = 0
+    ) -> Tuple[float, Move]:
+        self.__nodes_searched += 1
+        if self.__search_plies - depth > self.__max_ply:
+            self.__max_ply = self.__search_plies - depth
+        is_root = parent_alpha is None
+        early_exit_reward = self.terminal_reward(board=board, depth=depth, maximizer=maximizer, ply=ply)
+        if early_exit_reward == None and not is_root:
+            early_exit_reward = self.exact_reward(board=board, maximizer=maximizer, ply=ply)
+        if early_exit_reward != None:
+            return early_exit_reward, None
+
+        is_max_node = board.turn == maximizer
+        transposition_key = None
+        if self.transposition_table is not None and not is_root:
+            transposition_key = self.transposition_key(board=board, maximizer=maximizer)
+            entry = self.probe_transposition(key=transposition_key, ply=ply)
+            if entry is not None and self.is_transposition_cutoff(
+                entry=entry,
+                depth=depth,
+                is_max_node=is_max_node,
+                parent_alpha=parent_alpha,
+                parent_beta=parent_beta
+            ):
+                return entry.score, entry.best_move
+
+        legalmoves = list(board.legal_moves)
+        if len(legalmoves) == 0:
+            return WinReward.DRAW.value, None
+
+        # Without pruning every child of the last ply is evaluated anyway, so they are evaluated together
+        leaf_rewards = None
+        if depth == 1 and self.evaluator is None and len(legalmoves) >= BATCH_MIN_LEAVES:
+            leaf_rewards = self.leaf_rewards(board=board, moves=legalmoves, maximizer=maximizer, ply=ply)
+
+        best_reward, best_move = None, None
+        all_rewards_equal = True
+        searched = 0
+        for move in legalmoves:
+            if leaf_rewards is not None:
+                reward = leaf_rewards[searched]
+            else:
+                self.push_move(board, move)
+                reward, _ = self.push_pop_search(
+                    board=board,
+                    depth=depth - 1,
+                    maximizer=maximizer,
+                    parent_alpha=ALPHA_DEFAULT,
+                    parent_beta=BETA_DEFAULT,
+                    ply=ply + 1
+                )
+                self.pop_move(board)
+            if searched == 0:
+                best_reward, best_move = reward, move
+            else:
+                all_rewards_equal = all_rewards_equal and reward == best_reward
+                if (reward > best_reward) if is_max_node else (reward < best_reward):
+                    best_reward, best_move = reward, move
+            searched += 1
+
+        # Return a random move in the absence of heuristic difference
+        if all_rewards_equal:
+            best_move = legalmoves[np.random.randint(searched)]
+
+        if self.transposition_table is not None:
+            self.store_transposition(
+                key=transposition_key if transposition_key is not None else \
+                    self.transposition_key(board=board, maximizer=maximizer),
+                depth=depth,
+                reward=best_reward,
+                best_move=best_move,
+                is_pruned=False,
+                is_max_node=is_max_node,
+                ply=ply
+            )
+        return best_reward, best_move
+
+    # The rewards push_pop_search gives the children of board one ply before the horizon, in the
+    # order of moves. The positions after the moves are worked out on the occupancy bitboards
+    # without making the moves, and all that are not won are evaluated in one batch. board is ply
+    # plies below the root.
+    def leaf_rewards(self, board: AIChessBoard, moves: List[Move], maximizer: chess.Color, ply: int = 0) -> List[float]:
+        turn = board.turn
+        own, opponent = board.occupied_co[turn], board.occupied_co[not turn]
+        whites, blacks = [], []
+        for move in moves:
+            to_bitboard = chess.BB_SQUARES[move.to_square]
+            child_opponent = opponent & ~to_bitboard
+            if child_opponent == opponent and chess.square_file(move.from_square) != chess.square_file(move.to_square):
+                # En passant takes the pawn behind the target square
+                child_opponent &= ~chess.BB_SQUARES[move.to_square - 8 if turn == chess.WHITE else move.to_square + 8]
+            child_own = own & ~chess.BB_SQUARES[move.from_square] | to_bitboard
+            whites.append(child_own if turn == chess.WHITE else child_opponent)
+            blacks.append(child_opponent if turn == chess.WHITE else child_own)
+        white, black = np.array(whites, dtype=np.uint64), np.array(blacks, dtype=np.uint64)
+        rewards = self.heuristic_calculator.evaluate_batch(white, black, maximizer)
+        white_wins = (white & np.uint64(BACK_ROW_FOR_WHITE)) != 0
+        black_wins = (black & np.uint64(BACK_ROW_FOR_BLACK)) != 0
+        rewards[white_wins] = self.win_reward(wins=maximizer == chess.WHITE, ply=ply + 1)
+        rewards[black_wins & ~white_wins] = self.win_reward(wins=maximizer == chess.BLACK, ply=ply + 1)
+        self.__nodes_searched += len(moves)
+        self.__leaf_evaluations += len(moves) - int(np.count_nonzero(white_wins | black_wins))
+        if self.__search_plies > self.__max_ply:
+            self.__max_ply = self.__search_plies
+        return rewards.tolist()
+
+    # Fail-soft negamax with alpha-beta pruning. Scores are from the point of view of the
+    # side to move and (alpha, beta) is passed down the recursion, so a cutoff happens inside
+    # the move loop as soon as a move is good enough. Root moves are shuffled so ties between
+    # the best moves are still broken randomly. Without run_alpha_beta every child gets the
+    # full window, which makes this a plain minimax.
+    def negamax(
+        self,
+        board: AIChessBoard,
+        depth: int,
+        alpha: float,
+        beta: float,
+        maximizer: chess.Color,
+        ply: int = 0,
+        on_principal_variation: bool = False
+    ) -> Tuple[float, Move]:
+        self.__check_search_budget()
+        if ply > self.__max_ply:
+            self.__max_ply = ply
+        principal_variation_lines = self.__principal_variation_lines
+        if principal_variation_lines is not None:
+            principal_variation_lines[ply] = []
+        sign = 1 if board.turn == maximizer else -1
+        if ply > 0 and (self.tablebase is not None or self.race_detection):
+            exact_reward = self.exact_reward(board=board, maximizer=maximizer, ply=ply)
+            if exact_reward != None:
+                return sign * exact_reward, None
+        if depth <= 0 and self.quiescence and not self.white_wins(board) and not self.black_wins(board):
+            self.__quiescence_nodes_left = self.quiescence_node_limit
+            return self.quiescence_search(board=board, alpha=alpha, beta=beta, maximizer=maximizer, ply=ply), None
+        early_exit_reward = self.terminal_reward(board=board, depth=depth, maximizer=maximizer, ply=ply)
+        if early_exit_reward != None:
+            return sign * early_exit_reward, None
+
+        transposition_key = None
+        hash_move = None
+        if self.transposition_table is not None:
+            transposition_key = self.transposition_key(board=board, maximizer=maximizer)
+            entry = self.probe_transposition(key=transposition_key, ply=ply)
+            if entry is not None:
+                hash_move = entry.best_move
+                if ply > 0 and entry.depth >= depth:
+                    score = sign * entry.score
+                    bound = entry.bound if sign == 1 else FLIPPED_BOUNDS[entry.bound]
+                    if bound == Bound.EXACT or \
+                            (bound == Bound.LOWER and score >= beta) or \
+                            (bound == Bound.UPPER and score <= alpha):
+                        return score, entry.best_move
+
+        legalmoves = list(board.legal_moves)
+        if len(legalmoves) == 0:
+            return WinReward.DRAW.value, None
+        if ply == 0:
+            np.random.shuffle(legalmoves)
+        principal_variation_move = None
+        if on_principal_variation and ply < len(self.principal_variation):
+            principal_variation_move = self.principal_variation[ply]
+        legalmoves = self.move_orderer.order(
+            board=board,
+            moves=legalmoves,
+            ply=ply,
+            hash_move=principal_variation_move or hash_move
+        )
+        if principal_variation_move in legalmoves:
+            legalmoves.remove(principal_variation_move)
+            legalmoves.insert(0, principal_variation_move)
+
+        original_alpha = alpha
+        best_score, best_move = ALPHA_DEFAULT, None
+        for move_index, move in enumerate(legalmoves):
+            self.push_move(board, move)
+            score, _ = self.negamax(
+                board=board,
+                depth=depth - 1,
+                alpha=-beta if self.run_alpha_beta else ALPHA_DEFAULT,
+                beta=-max(alpha, best_score) if self.run_alpha_beta else BETA_DEFAULT,
+                maximizer=maximizer,
+                ply=ply + 1,
+                on_principal_variation=move == principal_variation_move
+            )
+            score = -score
+            self.pop_move(board)
+            if score > best_score:
+                best_score, best_move = score, move
+                if principal_variation_lines is not None:
+                    principal_variation_lines[ply] = [move] + principal_variation_lines[ply + 1]
+                if best_score >= beta and self.run_alpha_beta:
+                    self.move_orderer.record_cutoff(board=board, move=move, ply=ply, depth=depth, move_index=move_index)
+                    self.__cutoffs += 1
+                    if move_index == 0:
+                        self.__first_move_cutoffs += 1
+                    break
+
+        if self.transposition_table is not None:
+            if best_score <= original_alpha:
+                bound = Bound.UPPER
+            elif best_score >= beta:
+                bound = Bound.LOWER
+            else:
+                bound = Bound.EXACT
+            # The table keeps scores from the point of view of the player at the root
+            self.transposition_table.store(
+                key=transposition_key,
+                depth=depth,
+                score=self.score_to_table(score=sign * best_score, ply=ply),
+                bound=bound if sign == 1 else FLIPPED_BOUNDS[bound],
+                best_move=best_move
+            )
+        return best_score, best_move
+
+    # Search only captures and pushes onto the last two ranks until the position is quiet.
+    # The side to move may stand pat on the static evaluation instead of making one of these
+    # moves, captures that cannot lift the score to alpha are skipped (delta pruning), and each
+    # quiescence search stops extending after its own node limit.
+    def quiescence_search(self, board: AIChessBoard, alpha: float, beta: float, maximizer: chess.Color, ply: int = 0) -> float:
+        self.quiescence_nodes += 1
+        if ply > self.__max_ply:
+            self.__max_ply = ply
+        self.__quiescence_nodes_left -= 1
+        sign = 1 if board.turn == maximizer else -1
+        if self.white_wins(board):
+            return sign * self.win_reward(wins=maximizer == chess.WHITE, ply=ply)
+        elif self.black_wins(board):
+            return sign * self.win_reward(wins=maximizer == chess.BLACK, ply=ply)
+
+        legalmoves = list(board.legal_moves)
+        if len(legalmoves) == 0:
+            return WinReward.DRAW.value
+        self.__leaf_evaluations += 1
+        stand_pat = sign * self.evaluate(board, maximizer)
+        if stand_pat >= beta or self.__quiescence_nodes_left <= 0:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
+
+        promotion_threats = BB_WHITE_PROMOTION_THREATS if board.turn == chess.WHITE else BB_BLACK_PROMOTION_THREATS
+        best_score = stand_pat
+        for move in legalmoves:
+            is_promotion_threat = chess.BB_SQUARES[move.to_square] & promotion_threats
+            if not is_promotion_threat:
+                # A pawn only changes file when it captures
+                if not (move.from_square ^ move.to_square) & 7:
+                    continue
+                if stand_pat + self.quiescence_delta_margin <= alpha:
+                    continue
+            self.push_move(board, move)
+            score = -self.quiescence_search(board=board, alpha=-beta, beta=-alpha, maximizer=maximizer, ply=ply + 1)
+            self.pop_move(board)
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                if score >= beta:
+                    break
+        return best_score
+
+    def transposition_key(self, board: AIChessBoard, maximizer: chess.Color) -> int:
+        key = zobrist_hash(board)
+        return key ^ ZOBRIST_BLACK_PERSPECTIVE if maximizer == chess.BLACK else key
+
+    # Check whether a stored result can stand in for searching this node
+    def is_transposition_cutoff(
+        self,
+        entry: TranspositionEntry,
+        depth: int,
+        is_max_node: bool,
+        parent_alpha: float,
+        parent_beta: float
+    ) -> bool:
+        if entry.depth < depth:
+            return False
+        if entry.bound == Bound.EXACT:
+            return True
+        if not self.run_alpha_beta:
+            return False
+        # Mirror alpha_beta_pruning: the bound only helps if it already prunes this node
+        if entry.bound == Bound.LOWER and is_max_node:
+            return entry.score >= parent_beta
+        if entry.bound == Bound.UPPER and not is_max_node:
+            return entry.score <= parent_alpha
+        return False
+
+    def store_transposition(
+        self,
+        key: int,
+        depth: int,
+        reward: float,
+        best_move: Move,
+        is_pruned: bool,
+        is_max_node: bool,
+        ply: int = 0
+    ) -> None:
+        # A pruned node only saw some of its children, so its score is a bound
+        if not is_pruned:
+            bound = Bound.EXACT
+        elif is_max_node:
+            bound = Bound.LOWER
+        else:
+            bound = Bound.UPPER
+        self.transposition_table.store(key=key, depth=depth, score=self.score_to_table(score=reward, ply=ply),
+            bound=bound, best_move=best_move)
+
+    # The table entry of a position ply plies below the root, or None
+    def probe_transposition(self, key: int, ply: int) -> TranspositionEntry:
+        entry = self.transposition_table.probe(key)
+        if entry is not None:
+            entry.score = self.score_from_table(score=entry.score, ply=ply)
+        return entry
+
+    # Wins and losses count their plies from the root in the search, but from the position in
+    # the table, so an entry holds wherever the position is reached again
+    @staticmethod
+    def score_to_table(score: float, ply: int) -> float:
+        if score >= WIN_SCORE_MIN:
+            return score + ply
+        if score <= -WIN_SCORE_MIN:
+            return score - ply
+        return score
+
+    @staticmethod
+    def score_from_table(score: float, ply: int) -> float:
+        if score >= WIN_SCORE_MIN:
+            return score - ply
+        if score <= -WIN_SCORE_MIN:
+            return score + ply
+        return score
+
 
     # Unpack nodes into their child states
     def unpack(self, root: Node) -> np.array(Node):
@@ -165,6 +887,12 @@ class MinimaxPlayer(ChessPlayer):
             )
         return nodes
 
+    # The legacy searches prune while visiting the child after the one that caused the cutoff
+    def __count_cutoff(self, children_searched: int) -> None:
+        self.__cutoffs += 1
+        if children_searched == 1:
+            self.__first_move_cutoffs += 1
+
     def alpha_beta_pruning(self, max_player: chess.Color, child: Node, current: Node) -> bool:
         is_max_player = True if max_player == current.board.turn else False
 
@@ -181,9 +909,27 @@ class MinimaxPlayer(ChessPlayer):
         return False
 
     def calc_reward(self, current_board: AIChessBoard, root_board: AIChessBoard) -> int:
-        heuristic_value = self.heuristic_calculator.return_heuristic_value(current_board, root_board.turn)
+        heuristic_value = self.evaluate(current_board, root_board.turn)
         return heuristic_value
 
+    def evaluate(self, board: AIChessBoard, player_color: chess.Color) -> int:
+        if self.evaluator is not None:
+            return self.evaluator.value(board, player_color)
+        return self.heuristic_calculator.return_heuristic_value(board, player_color)
+
+    # Moves of the searches on a single board go through these, so the incremental evaluator follows them
+    def push_move(self, board: AIChessBoard, move: Move) -> None:
+        if self.evaluator is not None:
+            self.evaluator.push(board, move)
+        else:
+            board.push(move)
+
+    def pop_move(self, board: AIChessBoard) -> None:
+        if self.evaluator is not None:
+            self.evaluator.pop(board)
+        else:
+            board.pop()
+
 
     def white_wins(self, board: AIChessBoard) -> bool:
         return BACK_ROW_FOR_WHITE & board.occupied_co[chess.WHITE] != 0
@@ -194,16 +940,63 @@ class MinimaxPlayer(ChessPlayer):
 
 
     # Check if the state is an end state and return rewards if so
-    def check_terminal_state(self, current: Node, root_board: AIChessBoard, depth: int, maximizer: chess.Color) -> int:
-        if self.white_wins(current.board):
-            return WinReward.WIN.value if maximizer == chess.WHITE else WinReward.LOSS.value
-        elif self.black_wins(current.board):
-            return WinReward.WIN.value if maximizer == chess.BLACK else WinReward.LOSS.value
+    def check_terminal_state(self, current: Node, root_board: AIChessBoard, depth: int, maximizer: chess.Color, ply: int = 0) -> int:
+        reward = self.terminal_reward(board=current.board, depth=depth, maximizer=maximizer, ply=ply)
+        if reward == None and current.parent is not None:
+            reward = self.exact_reward(board=current.board, maximizer=maximizer, ply=ply)
+        return reward
+
+    # Reward of a game won or lost by maximizer, ply plies below the root
+    @staticmethod
+    def win_reward(wins: bool, ply: int = 0) -> int:
+        return WinReward.WIN.value - ply if wins else WinReward.LOSS.value + ply
+
+    def terminal_reward(self, board: AIChessBoard, depth: int, maximizer: chess.Color, ply: int = 0) -> int:
+        if self.white_wins(board):
+            return self.win_reward(wins=maximizer == chess.WHITE, ply=ply)
+        elif self.black_wins(board):
+            return self.win_reward(wins=maximizer == chess.BLACK, ply=ply)
         elif depth <= 0:
-            return self.calc_reward(current.board, root_board)
+            self.__leaf_evaluations += 1
+            return self.evaluate(board, maximizer)
         else:
             return None
 
+    # Exact reward of a position from the tablebase or a won pawn race, or None. Never used at the root.
+    def exact_reward(self, board: AIChessBoard, maximizer: chess.Color, ply: int = 0) -> float:
+        reward = self.tablebase_reward(board=board, maximizer=maximizer, ply=ply)
+        if reward == None and self.race_detection:
+            reward = self.race_reward(board=board, maximizer=maximizer, ply=ply)
+        return reward
+
+    # A pawn race that is won by force scores a win, less a little for every ply until the pawn promotes
+    def race_reward(self, board: AIChessBoard, maximizer: chess.Color, ply: int = 0) -> float:
+        value = race_result(board)
+        if value == None:
+            return None
+        self.race_wins += 1
+        reward = WinReward.WIN.value - ply - abs(value) * RACE_PLY_DISCOUNT
+        return reward if (value > 0) == (board.turn == maximizer) else -reward
+
+    # Exact reward of a position in the tablebase, or None, less a little for every ply the game
+    # still lasts. The root is never looked up so there is a move to play.
+    def tablebase_reward(self, board: AIChessBoard, maximizer: chess.Color, ply: int = 0) -> int:
+        if self.tablebase is None:
+            return None
+        value = self.tablebase.probe(board)
+        if value == None:
+            return None
+        if value == 0:
+            return WinReward.DRAW.value
+        reward = WinReward.WIN.value - ply - abs(value) * RACE_PLY_DISCOUNT
+        return reward if (value > 0) == (board.turn == maximizer) else -reward
+
 
     def get_name(self) -> str:
         return self.__name
+
+    def get_config(self) -> Dict[str, Any]:
+        return dict(super().get_config(), **self.__config)
+
+    class SearchBudgetExceeded(ChessPlayer.SearchStopped):
+        pass
@@ -0,0 +1,133 @@
+import chess
+from chess import Move
+from enum import Enum
+from typing import List
+
+HASH_MOVE_SCORE = 10 ** 7
+PROMOTION_SCORE = 5 * 10 ** 6
+CAPTURE_SCORE = 4 * 10 ** 6
+PASSED_PAWN_SCORE = 10 ** 5
+KILLER_MOVE_SCORE = 3 * 10 ** 6
+ADVANCE_SCORE = 1000
+MAX_HISTORY_SCORE = 2 * 10 ** 6
+KILLER_MOVES_PER_PLY = 2
+
+
+def _build_passed_pawn_masks(color: chess.Color) -> List[int]:
+    # Squares ahead of a pawn on its own and neighbouring files. A pawn with no
+    # opposing pawns on them can no longer be blocked or captured.
+    masks = []
+    for square in chess.SQUARES:
+        file, rank = chess.square_file(square), chess.square_rank(square)
+        ranks_ahead = range(rank + 1, 8) if color == chess.WHITE else range(0, rank)
+        mask = 0
+        for ahead in ranks_ahead:
+            for neighbour in range(max(file - 1, 0), min(file + 1, 7) + 1):
+                mask |= chess.BB_SQUARES[chess.square(neighbour, ahead)]
+        masks.append(mask)
+    return masks
+
+# Indexed by [color][square]
+PASSED_PAWN_MASKS: List[List[int]] = [_build_passed_pawn_masks(color) for color in (chess.BLACK, chess.WHITE)]
+
+
+class MoveOrdering(Enum):
+    Hash_Move = 0
+    Captures = 1
+    Pushes_Toward_Promotion = 2
+    Killer_Moves = 3
+    History_Heuristic = 4
+
+
+class MoveOrderer:
+    def __init__(self, list_of_orderings: List[MoveOrdering]) -> None:
+        self.list_of_orderings: List[MoveOrdering] = list_of_orderings
+        self.__hash_move = MoveOrdering.Hash_Move in list_of_orderings
+        self.__captures = MoveOrdering.Captures in list_of_orderings
+        self.__advances = MoveOrdering.Pushes_Toward_Promotion in list_of_orderings
+        self.__killers = MoveOrdering.Killer_Moves in list_of_orderings
+        self.__history = MoveOrdering.History_Heuristic in list_of_orderings
+        self.killer_moves: List[List[Move]] = []
+        # Indexed by [color][from_square * 64 + to_square]
+        self.history: List[List[int]] = [[0] * 64 * 64 for _ in chess.COLORS]
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def __str__(self) -> str:
+        return ",".join(str(ordering.value) for ordering in self.list_of_orderings)
+
+    def new_search(self) -> None:
+        # Killers only make sense within one search, history is kept but aged
+        self.killer_moves = []
+        for history in self.history:
+            for index, value in enumerate(history):
+                if value:
+                    history[index] = value >> 1
+
+    def new_game(self) -> None:
+        self.killer_moves = []
+        self.history = [[0] * 64 * 64 for _ in chess.COLORS]
+
+    def first_move_cutoff_rate(self) -> float:
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    def order(self, board: chess.Board, moves: List[Move], ply: int, hash_move: Move=None) -> List[Move]:
+        if not self.list_of_orderings:
+            return moves
+        turn = board.turn
+        opponent_pawns = board.occupied_co[not turn]
+        passed_pawn_masks = PASSED_PAWN_MASKS[turn]
+        history = self.history[turn]
+        killers = self.killer_moves[ply] if self.__killers and ply < len(self.killer_moves) else []
+        scores = {}
+        for move in moves:
+            from_square, to_square = move.from_square, move.to_square
+            score = 0
+            if self.__hash_move and move == hash_move:
+                score = HASH_MOVE_SCORE
+            elif (from_square ^ to_square) & 7:
+                # A pawn only changes file when it captures
+                if self.__captures:
+                    score = CAPTURE_SCORE + self.__advance(to_square, turn)
+                    remaining_pawns = opponent_pawns & ~chess.BB_SQUARES[to_square]
+                    if not remaining_pawns & passed_pawn_masks[to_square]:
+                        score += PASSED_PAWN_SCORE
+                    if move.promotion:
+                        score += PROMOTION_SCORE
+            elif move in killers:
+                score = KILLER_MOVE_SCORE - killers.index(move)
+            else:
+                if self.__advances:
+                    score = self.__advance(to_square, turn) * ADVANCE_SCORE
+                    if move.promotion:
+                        score += PROMOTION_SCORE
+                if self.__history:
+                    score += history[from_square * 64 + to_square]
+            scores[move] = score
+        # sorted is stable, so moves with the same score keep the order they came in
+        return sorted(moves, key=scores.__getitem__, reverse=True)
+
+    def __advance(self, square: chess.Square, color: chess.Color) -> int:
+        rank = chess.square_rank(square)
+        return rank if color == chess.WHITE else 7 - rank
+
+    def record_cutoff(self, board: chess.Board, move: Move, ply: int, depth: int, move_index: int) -> None:
+        self.cutoffs += 1
+        if move_index == 0:
+            self.first_move_cutoffs += 1
+        if (move.from_square ^ move.to_square) & 7:
+            return
+        if self.__killers:
+            while len(self.killer_moves) <= ply:
+                self.killer_moves.append([])
+            killers = self.killer_moves[ply]
+            if move not in killers:
+                killers.insert(0, move)
+                del killers[KILLER_MOVES_PER_PLY:]
+        if self.__history:
+            history = self.history[board.turn]
+            index = move.from_square * 64 + move.to_square
+            history[index] += depth * depth
+            if history[index] > MAX_HISTORY_SCORE:
+                for other, value in enumerate(history):
+                    history[other] = value >> 1
@@ -0,0 +1,106 @@
+from __future__ import annotations
+from aichessboard import AIChessBoard
+import argparse
+import chess
+from chess import Move
+from heuristics import Heuristic
+import math
+from moveordering import MoveOrdering
+import numpy as np
+import time
+from transpositiontable import decode_move, encode_move, zobrist_hash
+from typing import Any, Dict, List, Tuple
+
+STARTING_BOARD = '8/pppppppp/8/8/8/8/PPPPPPPP/8'
+# One record per book move, sorted by the hash of the position it is played from
+BOOK_RECORD = np.dtype([('key', '<u8'), ('move', '<u2'), ('score', '<f4')])
+# Moves scoring this much less than the best move of a position are left out of the book
+BOOK_MARGIN = 1.0
+# Softmax temperature of the choice between book moves, lower plays the best move more often
+BOOK_TEMPERATURE = 0.5
+
+
+def score_moves(player: Any, board: chess.Board, depth: int) -> List[Tuple[Move, float]]:
+    # Exact score of every move from the point of view of the side to move
+    scored_moves = []
+    for move in board.legal_moves:
+        child = board.copy(stack=False)
+        child.push(move)
+        score, _ = player.negamax(board=child, depth=depth, alpha=-math.inf, beta=math.inf, maximizer=board.turn, ply=1)
+        scored_moves.append((move, -score))
+    return scored_moves
+
+
+def build(path: str, player: Any, plies: int, depth: int, margin: float=BOOK_MARGIN, board: chess.Board=None) -> int:
+    # Searches every position reached by book moves in the first plies of the game and writes
+    # the moves within margin of the best one. Returns the number of positions in the book.
+    board = AIChessBoard(STARTING_BOARD) if board is None else board
+    records: Dict[int, List[Tuple[Move, float]]] = {}
+    frontier = [board]
+    for _ in range(plies):
+        next_frontier = []
+        for position in frontier:
+            key = zobrist_hash(position)
+            if key in records or position.outcome() is not None:
+                continue
+            player.new_search()
+            scored_moves = score_moves(player=player, board=position, depth=depth)
+            if not scored_moves:
+                continue
+            best_score = max(score for _, score in scored_moves)
+            records[key] = [(move, score) for move, score in scored_moves if score >= best_score - margin]
+            for move, _ in records[key]:
+                child = position.copy(stack=False)
+                child.push(move)
+                next_frontier.append(child)
+        frontier = next_frontier
+    book = np.array(
+        [(key, encode_move(move), score) for key, moves in records.items() for move, score in moves],
+        dtype=BOOK_RECORD
+    )
+    book.sort(order='key', kind='stable')
+    book.tofile(path)
+    return len(records)
+
+
+class OpeningBook:
+    def __init__(self, path: str, temperature: float=BOOK_TEMPERATURE) -> None:
+        self.path = path
+        self.temperature = temperature
+        self.records: np.ndarray = np.fromfile(path, dtype=BOOK_RECORD)
+        self.probes = 0
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def moves(self, board: chess.Board) -> List[Tuple[Move, float]]:
+        key = np.uint64(zobrist_hash(board))
+        keys = self.records['key']
+        first = np.searchsorted(keys, key, side='left')
+        last = np.searchsorted(keys, key, side='right')
+        return [(decode_move(int(record['move'])), float(record['score'])) for record in self.records[first:last]]
+
+    def choose(self, board: chess.Board) -> Move:
+        # A weighted random book move so that games do not all open the same way, or None out of book
+        self.probes += 1
+        scored_moves = self.moves(board)
+        if not scored_moves:
+            return None
+        self.hits += 1
+        scores = np.array([score for _, score in scored_moves])
+        weights = np.exp((scores - scores.max()) / self.temperature)
+        return scored_moves[np.random.choice(len(scored_moves), p=weights / weights.sum())][0]
+
+
+if __name__ == '__main__':
+    from minimaxchessplayer import MinimaxPlayer
+    parser = argparse.ArgumentParser(description="Build an opening book from deep searches of the first plies")
+    parser.add_argument('path')
+    parser.add_argument('--plies', type=int, default=4)
+    parser.add_argument('--depth', type=int, default=5)
+    parser.add_argument('--margin', type=float, default=BOOK_MARGIN)
+    arguments = parser.parse_args()
+    searcher = MinimaxPlayer(time, depth=arguments.depth, heuristics=list(Heuristic), run_alpha_beta=True,
+        transposition_table_mb=64, move_ordering=list(MoveOrdering), quiescence=True)
+    print(build(arguments.path, searcher, plies=arguments.plies, depth=arguments.depth, margin=arguments.margin), "positions")
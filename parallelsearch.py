@@ -0,0 +1,158 @@
+from __future__ import annotations
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import chess
+from chess import Move
+import math
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+from transpositiontable import TranspositionTable
+from typing import Any, List, Tuple
+import weakref
+
+BYTES_PER_MEGABYTE = 1 << 20
+# Size of the shared table when the player was configured without one
+LAZY_SMP_TABLE_MB = 16
+
+# The player of a worker process and what it shares with the other processes, set by the pool initializer
+_player: Any = None
+_shared_alpha: Any = None
+_shared_memory: shared_memory.SharedMemory = None
+_search_id: int = None
+
+
+def _initialize_worker(player: Any, shared_alpha: Any, stop_event: Any, table_name: str, table_size: int) -> None:
+    global _player, _shared_alpha, _shared_memory
+    _player = player
+    _shared_alpha = shared_alpha
+    player.stop_event = stop_event
+    if table_name is not None:
+        _shared_memory = shared_memory.SharedMemory(name=table_name)
+        player.transposition_table = TranspositionTable(table_size, buffer=_shared_memory.buf)
+
+
+def _start_search(search_id: int) -> None:
+    # A worker runs tasks of many searches, killers and table ages move on once per search.
+    # The counters of the search report start from 0 for every task.
+    global _search_id
+    if search_id != _search_id:
+        _search_id = search_id
+        _player.new_search()
+    _player.take_search_counts()
+
+
+def _search_root_move(search_id: int, board: Any, move: Move, depth: int, maximizer: chess.Color) -> Tuple[float, bool, List[int]]:
+    _start_search(search_id)
+    alpha = _shared_alpha.value if _player.run_alpha_beta else -math.inf
+    board.push(move)
+    score, _ = _player.negamax(board=board, depth=depth - 1, alpha=-math.inf, beta=-alpha, maximizer=maximizer, ply=1)
+    score = -score
+    if score > alpha:
+        with _shared_alpha.get_lock():
+            if score > _shared_alpha.value:
+                _shared_alpha.value = score
+    # A score at or below the alpha the move was searched with is only an upper bound
+    return score, score > alpha, _player.take_search_counts()
+
+
+def _lazy_smp_search(search_id: int, board: Any, depth: int, maximizer: chess.Color, seed: int) -> Tuple[Tuple[float, Move], List[int]]:
+    # The score and move of the search, or None when another worker finished first
+    _start_search(search_id)
+    # Each worker shuffles the root moves differently, so they spread over the tree
+    np.random.seed(seed)
+    try:
+        result = _player.negamax(board=board, depth=depth, alpha=-math.inf, beta=math.inf, maximizer=maximizer)
+    except _player.SearchBudgetExceeded:
+        result = None
+    return result, _player.take_search_counts()
+
+
+def _release(executor: ProcessPoolExecutor, table_memory: shared_memory.SharedMemory) -> None:
+    executor.shutdown(cancel_futures=True)
+    if table_memory is not None:
+        table_memory.close()
+        table_memory.unlink()
+
+
+class ParallelSearch:
+    # Runs the negamax search of a MinimaxPlayer on a pool of worker processes, since threads
+    # cannot search in parallel under the GIL. Each worker has its own copy of the player.
+    # With root splitting every root move is a task. Workers pick up tasks as they finish and
+    # search them with the best score found so far by any worker as alpha, so a move is only
+    # played if its score is exact. With Lazy SMP every worker searches the whole tree with
+    # its own root move order, half of them one ply deeper, and all of them share one
+    # transposition table. The first worker to finish stops the others. The counters of the
+    # searches of the workers are added to the search report of the player.
+    def __init__(self, player: Any, workers: int, lazy_smp: bool) -> None:
+        self.player = player
+        self.workers = workers
+        self.lazy_smp = lazy_smp
+        context = multiprocessing.get_context()
+        self.__shared_alpha = context.Value('d', -math.inf)
+        self.__stop_event = context.Event()
+        self.__search_id = 0
+        table_name, table_size, table_memory = None, None, None
+        if lazy_smp:
+            table_size = int((player.transposition_table_mb or LAZY_SMP_TABLE_MB) * BYTES_PER_MEGABYTE)
+            table_memory = shared_memory.SharedMemory(create=True, size=TranspositionTable.bytes_needed(table_size))
+            TranspositionTable(table_size, buffer=table_memory.buf).clear()
+            table_name = table_memory.name
+        self.__executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_initialize_worker,
+            initargs=(player, self.__shared_alpha, self.__stop_event, table_name, table_size)
+        )
+        self.__finalizer = weakref.finalize(self, _release, self.__executor, table_memory)
+
+    def close(self) -> None:
+        self.__finalizer()
+
+    def search(self, board: Any, depth: int) -> Tuple[float, Move]:
+        self.__search_id += 1
+        maximizer = board.turn
+        moves = list(board.legal_moves)
+        if not moves or self.player.terminal_reward(board=board, depth=depth, maximizer=maximizer) is not None:
+            return self.player.negamax(board=board.copy(stack=False), depth=depth,
+                alpha=-math.inf, beta=math.inf, maximizer=maximizer)
+        if self.lazy_smp:
+            return self.__lazy_smp(board=board, depth=depth)
+        return self.__split_root(board=board, moves=moves, depth=depth)
+
+    def __split_root(self, board: Any, moves: list, depth: int) -> Tuple[float, Move]:
+        # Shuffled so ties between the best moves are broken randomly, as in negamax
+        np.random.shuffle(moves)
+        moves = self.player.move_orderer.order(board=board, moves=moves, ply=0)
+        self.__shared_alpha.value = -math.inf
+        futures = [
+            self.__executor.submit(_search_root_move, self.__search_id, board.copy(stack=False), move, depth, board.turn)
+                for move in moves
+        ]
+        best_score, best_move = -math.inf, None
+        for move, future in zip(moves, futures):
+            score, is_exact, counts = future.result()
+            self.player.add_search_counts(counts)
+            if is_exact and (best_move is None or score > best_score):
+                best_score, best_move = score, move
+        return best_score, best_move
+
+    def __lazy_smp(self, board: Any, depth: int) -> Tuple[float, Move]:
+        seeds = np.random.randint(2 ** 31, size=self.workers)
+        pending = {
+            self.__executor.submit(_lazy_smp_search, self.__search_id, board.copy(stack=False),
+                depth + worker % 2, board.turn, int(seed))
+                for worker, seed in enumerate(seeds)
+        }
+        result = None
+        while result is None and pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                worker_result, counts = future.result()
+                self.player.add_search_counts(counts)
+                if result is None:
+                    result = worker_result
+        self.__stop_event.set()
+        for future in wait(pending).done:
+            self.player.add_search_counts(future.result()[1])
+        self.__stop_event.clear()
+        return result
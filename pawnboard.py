@@ -0,0 +1,234 @@
+from __future__ import annotations
+from aichessboard import AIChessBoard
+import chess
+from chess import Move
+from typing import List, Tuple
+
+BB_ALL = chess.BB_ALL
+BB_BACKRANKS = chess.BB_BACKRANKS
+BB_NOT_FILE_A = ~chess.BB_FILE_A & BB_ALL
+BB_NOT_FILE_H = ~chess.BB_FILE_H & BB_ALL
+BB_WHITE_DOUBLE_PUSH_TARGETS = chess.BB_RANK_3 | chess.BB_RANK_4
+BB_BLACK_DOUBLE_PUSH_TARGETS = chess.BB_RANK_6 | chess.BB_RANK_5
+PROMOTION_PIECES = [chess.QUEEN, chess.ROOK, chess.BISHOP, chess.KNIGHT]
+
+# Every pawn move is created once here and shared, so move generation does not allocate Moves.
+PAWN_MOVES = {}
+for _from_square in chess.SQUARES:
+    for _to_square in chess.SQUARES:
+        if abs(_to_square - _from_square) in [7, 8, 9, 16] and \
+                abs(chess.square_file(_to_square) - chess.square_file(_from_square)) <= 1:
+            PAWN_MOVES[_from_square, _to_square] = Move(_from_square, _to_square)
+PROMOTION_MOVES = {
+    squares: tuple(Move(squares[0], squares[1], piece) for piece in PROMOTION_PIECES)
+        for squares in PAWN_MOVES if chess.square_rank(squares[1]) in [0, 7]
+}
+
+
+class PawnBoard:
+    # A pawn chess position as the occupancy of each side plus the side to move.
+    # The en passant square is kept as well, since python-chess generates en passant
+    # captures and both boards must agree on the legal moves.
+    # Pieces on a back rank are promoted pawns, which means the game is over.
+    __slots__ = ('white', 'black', 'turn', 'ep_square', 'move_stack', '_stack')
+
+    def __init__(self, white: int, black: int, turn: chess.Color=chess.WHITE, ep_square: chess.Square=None) -> None:
+        self.white = white
+        self.black = black
+        self.turn = turn
+        self.ep_square = ep_square
+        self.move_stack: List[Move] = []
+        self._stack: List[Tuple[int, int, chess.Square]] = []
+
+    @classmethod
+    def from_board(cls, board: chess.Board) -> PawnBoard:
+        return cls(
+            white=board.occupied_co[chess.WHITE],
+            black=board.occupied_co[chess.BLACK],
+            turn=board.turn,
+            ep_square=board.ep_square
+        )
+
+    @classmethod
+    def from_fen(cls, fen: str) -> PawnBoard:
+        return cls.from_board(chess.Board(fen))
+
+    def to_board(self) -> AIChessBoard:
+        board = AIChessBoard(None)
+        for square in chess.scan_forward(self.white):
+            board.set_piece_at(square, chess.Piece(self.__piece_type_at(square), chess.WHITE))
+        for square in chess.scan_forward(self.black):
+            board.set_piece_at(square, chess.Piece(self.__piece_type_at(square), chess.BLACK))
+        board.turn = self.turn
+        board.ep_square = self.ep_square
+        return board
+
+    def __piece_type_at(self, square: chess.Square) -> chess.PieceType:
+        return chess.QUEEN if chess.BB_SQUARES[square] & BB_BACKRANKS else chess.PAWN
+
+    def fen(self) -> str:
+        return self.to_board().fen(en_passant='fen')
+
+    def board_fen(self) -> str:
+        return self.to_board().board_fen()
+
+    def __str__(self) -> str:
+        return str(self.to_board())
+
+    def __repr__(self) -> str:
+        return "PawnBoard('" + self.fen() + "')"
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, PawnBoard):
+            return NotImplemented
+        return (self.white, self.black, self.turn, self.ep_square) == \
+            (other.white, other.black, other.turn, other.ep_square)
+
+    def copy(self, stack: bool=True) -> PawnBoard:
+        board = PawnBoard(self.white, self.black, self.turn, self.ep_square)
+        if stack:
+            board.move_stack = self.move_stack.copy()
+            board._stack = self._stack.copy()
+        return board
+
+    @property
+    def occupied_co(self) -> Tuple[int, int]:
+        # Indexed by color like chess.Board.occupied_co
+        return (self.black, self.white)
+
+    @property
+    def occupied(self) -> int:
+        return self.white | self.black
+
+    @property
+    def pawns(self) -> int:
+        return (self.white | self.black) & ~BB_BACKRANKS
+
+    @property
+    def queens(self) -> int:
+        # Every pawn that reached a back rank promoted to a queen
+        return (self.white | self.black) & BB_BACKRANKS
+
+    def pieces(self, piece_type: chess.PieceType, color: chess.Color) -> chess.SquareSet:
+        occupied = self.white if color == chess.WHITE else self.black
+        if piece_type == chess.PAWN:
+            return chess.SquareSet(occupied & ~BB_BACKRANKS)
+        elif piece_type == chess.QUEEN:
+            return chess.SquareSet(occupied & BB_BACKRANKS)
+        return chess.SquareSet()
+
+    def outcome(self) -> chess.Outcome:
+        if self.black & BB_BACKRANKS:
+            return chess.Outcome(chess.Termination.VARIANT_WIN, chess.BLACK)
+        elif self.white & BB_BACKRANKS:
+            return chess.Outcome(chess.Termination.VARIANT_WIN, chess.WHITE)
+        return None
+
+    @property
+    def legal_moves(self) -> List[Move]:
+        # Same moves in the same order as chess.Board.legal_moves on a kingless pawn board:
+        # captures, single pushes, double pushes, then en passant.
+        moves = []
+        empty = ~(self.white | self.black) & BB_ALL
+        if self.turn == chess.WHITE:
+            pawns = self.white & ~BB_BACKRANKS
+            opponent = self.black
+            # Capture targets of each pawn, scanned from the highest square like python-chess
+            captures = (((pawns & BB_NOT_FILE_A) << 7) | ((pawns & BB_NOT_FILE_H) << 9)) & opponent
+            if captures:
+                for from_square in _scan_reversed(pawns):
+                    targets = chess.BB_PAWN_ATTACKS[chess.WHITE][from_square] & opponent
+                    self.__append_moves(moves, from_square, targets)
+            single_moves = (pawns << 8) & empty
+            double_moves = (single_moves << 8) & empty & BB_WHITE_DOUBLE_PUSH_TARGETS
+            push_offset = -8
+        else:
+            pawns = self.black & ~BB_BACKRANKS
+            opponent = self.white
+            captures = (((pawns & BB_NOT_FILE_H) >> 7) | ((pawns & BB_NOT_FILE_A) >> 9)) & opponent
+            if captures:
+                for from_square in _scan_reversed(pawns):
+                    targets = chess.BB_PAWN_ATTACKS[chess.BLACK][from_square] & opponent
+                    self.__append_moves(moves, from_square, targets)
+            single_moves = pawns >> 8
+            double_moves = (single_moves & empty) >> 8 & empty & BB_BLACK_DOUBLE_PUSH_TARGETS
+            single_moves &= empty
+            push_offset = 8
+
+        while single_moves:
+            to_square = single_moves.bit_length() - 1
+            single_moves ^= 1 << to_square
+            if (1 << to_square) & BB_BACKRANKS:
+                moves.extend(PROMOTION_MOVES[to_square + push_offset, to_square])
+            else:
+                moves.append(PAWN_MOVES[to_square + push_offset, to_square])
+        while double_moves:
+            to_square = double_moves.bit_length() - 1
+            double_moves ^= 1 << to_square
+            moves.append(PAWN_MOVES[to_square + 2 * push_offset, to_square])
+
+        if self.ep_square and not (1 << self.ep_square) & (self.white | self.black):
+            capturers = pawns & chess.BB_PAWN_ATTACKS[not self.turn][self.ep_square] & \
+                chess.BB_RANKS[4 if self.turn else 3]
+            for from_square in _scan_reversed(capturers):
+                moves.append(PAWN_MOVES[from_square, self.ep_square])
+        return moves
+
+    def __append_moves(self, moves: List[Move], from_square: chess.Square, targets: int) -> None:
+        while targets:
+            to_square = targets.bit_length() - 1
+            targets ^= 1 << to_square
+            if (1 << to_square) & BB_BACKRANKS:
+                moves.extend(PROMOTION_MOVES[from_square, to_square])
+            else:
+                moves.append(PAWN_MOVES[from_square, to_square])
+
+    def push(self, move: Move) -> None:
+        from_square = move.from_square
+        to_square = move.to_square
+        self._stack.append((self.white, self.black, self.ep_square))
+        self.move_stack.append(move)
+        moved = (1 << from_square) | (1 << to_square)
+        captured = 1 << to_square
+        diff = to_square - from_square
+        if to_square == self.ep_square and diff not in [8, -8, 16, -16]:
+            captured = 1 << (to_square - 8 if self.turn == chess.WHITE else to_square + 8)
+        ep_square = None
+        if self.turn == chess.WHITE:
+            self.white ^= moved
+            self.black &= ~captured
+            if diff == 16:
+                ep_square = from_square + 8
+        else:
+            self.black ^= moved
+            self.white &= ~captured
+            if diff == -16:
+                ep_square = from_square - 8
+        self.ep_square = ep_square
+        self.turn = not self.turn
+
+    def pop(self) -> Move:
+        self.white, self.black, self.ep_square = self._stack.pop()
+        self.turn = not self.turn
+        return self.move_stack.pop()
+
+    def perft(self, depth: int) -> int:
+        # Number of leaf positions at the given depth, counting a won position as a leaf
+        if depth == 0 or self.outcome() is not None:
+            return 1
+        moves = self.legal_moves
+        if depth == 1:
+            return len(moves)
+        nodes = 0
+        for move in moves:
+            self.push(move)
+            nodes += self.perft(depth - 1)
+            self.pop()
+        return nodes
+
+
+def _scan_reversed(bitboard: int):
+    while bitboard:
+        square = bitboard.bit_length() - 1
+        bitboard ^= 1 << square
+        yield square
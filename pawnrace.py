@@ -0,0 +1,89 @@
+from __future__ import annotations
+import chess
+from typing import List
+
+# Squares strictly in front of a pawn, toward its promotion rank, on its own file and on both
+# neighbouring files, and on its own file only
+FRONT_SPANS: List[List[int]] = [[0] * 64, [0] * 64]
+FILE_FRONTS: List[List[int]] = [[0] * 64, [0] * 64]
+for _square in chess.SQUARES:
+    _file, _rank = chess.square_file(_square), chess.square_rank(_square)
+    _files = chess.BB_FILES[_file] | \
+        (chess.BB_FILES[_file - 1] if _file > 0 else 0) | \
+        (chess.BB_FILES[_file + 1] if _file < 7 else 0)
+    _ranks_above = chess.BB_ALL & ~((1 << 8 * (_rank + 1)) - 1)
+    _ranks_below = (1 << 8 * _rank) - 1
+    FRONT_SPANS[chess.WHITE][_square] = _files & _ranks_above
+    FRONT_SPANS[chess.BLACK][_square] = _files & _ranks_below
+    FILE_FRONTS[chess.WHITE][_square] = chess.BB_FILES[_file] & _ranks_above
+    FILE_FRONTS[chess.BLACK][_square] = chess.BB_FILES[_file] & _ranks_below
+
+
+def moves_to_promote(square: chess.Square, color: chess.Color) -> int:
+    # Fewest moves a pawn needs to reach its back rank, with the double push from its starting rank
+    rank = chess.square_rank(square)
+    if color == chess.WHITE:
+        return 7 - rank - (rank == 1)
+    return rank - (rank == 6)
+
+
+def unstoppable_moves(pawns: int, opponent: int, color: chess.Color) -> int:
+    # Moves the fastest unstoppable pawn of color needs to promote, or None if it has none. A pawn
+    # is unstoppable when no pawn of either side stands in front of it on its own or the
+    # neighbouring files. Opponent pawns only move away from it, they can only reach those
+    # squares by capturing a pawn there, and the other pawns of color stay where they are while
+    # it runs, so it is never blocked or captured.
+    occupied = pawns | opponent
+    fastest = None
+    for square in chess.scan_forward(pawns):
+        if FRONT_SPANS[color][square] & occupied:
+            continue
+        moves = moves_to_promote(square, color)
+        if fastest is None or moves < fastest:
+            fastest = moves
+    return fastest
+
+
+def has_free_pawn(pawns: int, occupied: int, color: chess.Color) -> bool:
+    # A pawn with nothing in front of it on its file keeps a push until it promotes, as no
+    # pawn can capture its way onto an empty file
+    return any(not FILE_FRONTS[color][square] & occupied for square in chess.scan_forward(pawns))
+
+
+def race_value(white: int, black: int, turn: chess.Color, ep_square: chess.Square=None) -> int:
+    # Plies to the end of the game for the side to move, in the encoding of the tablebase, when
+    # one side wins a pawn race by force, or None when the race does not decide the game.
+    # A side wins the race when it has an unstoppable pawn that promotes before any pawn of
+    # the other side could, counting the tempo of the side to move. The other side must keep a
+    # free pawn, because a side without moves draws. The result is exact when it is not None,
+    # but the win may come sooner than the race promises.
+    if (white | black) & chess.BB_BACKRANKS:
+        return None
+    if ep_square is not None and chess.BB_PAWN_ATTACKS[not turn][ep_square] & (white if turn == chess.WHITE else black):
+        return None
+    pawns = {chess.WHITE: white, chess.BLACK: black}
+    occupied = white | black
+    for color in [turn, not turn]:
+        moves = unstoppable_moves(pawns[color], pawns[not color], color)
+        if moves is None:
+            continue
+        if color == turn and moves == 1:
+            return 1
+        opponent = pawns[not color]
+        if not has_free_pawn(opponent, occupied, not color):
+            continue
+        opponent_moves = min(moves_to_promote(square, not color) for square in chess.scan_forward(opponent))
+        if color == turn and moves <= opponent_moves:
+            return 2 * moves - 1
+        if color != turn and moves < opponent_moves:
+            return -2 * moves
+    return None
+
+
+def race_result(board: chess.Board) -> int:
+    return race_value(
+        white=board.occupied_co[chess.WHITE],
+        black=board.occupied_co[chess.BLACK],
+        turn=board.turn,
+        ep_square=board.ep_square
+    )
@@ -1,14 +1,22 @@
 from aichessboard import AIChessBoard
 from chess import Move
 from chessplayer import ChessPlayer
+from pawnboard import PawnBoard
 import random
-from typing import Any
+from typing import Any, Dict
 
 class RandomChessPlayer(ChessPlayer):
-    def __init__(self, time: Any) -> None:
+    def __init__(self, time: Any, pawn_board: bool = False) -> None:
         super().__init__(time)
+        # Generate moves with the bitboard PawnBoard instead of python-chess
+        self.pawn_board = pawn_board
+
+    def get_config(self) -> Dict[str, Any]:
+        return dict(super().get_config(), pawn_board=self.pawn_board)
 
     def _ChessPlayer__get_next_move(self, board: AIChessBoard) -> Move:
+        if self.pawn_board and not isinstance(board, PawnBoard):
+            board = PawnBoard.from_board(board)
         legalmoves = list(board.legal_moves)
         if len(legalmoves) < 1:
             raise self.ChessPlayerException("No legal moves remain")
@@ -0,0 +1,32 @@
+import json
+import os
+from typing import Any, Dict, List
+
+
+class ResultStore:
+    # Finished games of tournaments, one JSON object per line, appended as each game finishes
+    # and flushed to disk, so a tournament that dies loses at most the games it was playing.
+    # A line cut off by a crash is dropped when the store is opened again.
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.__drop_partial_line()
+
+    def __drop_partial_line(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb+') as file:
+            content = file.read()
+            if content and not content.endswith(b'\n'):
+                file.truncate(content.rfind(b'\n') + 1)
+
+    def records(self) -> List[Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path) as file:
+            return [json.loads(line) for line in file if line.strip()]
+
+    def append(self, record: Dict[str, Any]) -> None:
+        with open(self.path, 'a') as file:
+            file.write(json.dumps(record) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
@@ -0,0 +1,75 @@
+from __future__ import annotations
+from dataclasses import dataclass, fields
+
+
+@dataclass
+class SearchReport:
+    # Counters of one or more searches. Everything is a plain count, so reports of
+    # several moves add up and rates are worked out when they are read.
+    moves: int = 0
+    nodes: int = 0
+    leaf_evaluations: int = 0
+    quiescence_nodes: int = 0
+    # Nominal depth in plies, summed over the moves
+    plies: int = 0
+    # Deepest ply reached by any search, quiescence included
+    max_depth: int = 0
+    cutoffs: int = 0
+    first_move_cutoffs: int = 0
+    seconds: float = 0.0
+    transposition_probes: int = 0
+    transposition_hits: int = 0
+    tablebase_probes: int = 0
+    tablebase_hits: int = 0
+    book_probes: int = 0
+    book_hits: int = 0
+    evaluation_cache_probes: int = 0
+    evaluation_cache_hits: int = 0
+
+    def merged(self, other: SearchReport) -> SearchReport:
+        report = SearchReport(**{field.name: getattr(self, field.name) + getattr(other, field.name) for field in fields(self)})
+        report.max_depth = max(self.max_depth, other.max_depth)
+        return report
+
+    def since(self, earlier: SearchReport) -> SearchReport:
+        # The searches made after earlier was taken from the same running total
+        report = SearchReport(**{field.name: getattr(self, field.name) - getattr(earlier, field.name) for field in fields(self)})
+        report.max_depth = self.max_depth
+        return report
+
+    def nodes_per_second(self) -> float:
+        return self.nodes / self.seconds if self.seconds > 0 else 0.0
+
+    def effective_branching_factor(self) -> float:
+        # The branching factor of a uniform tree of the average depth with the average number of nodes
+        if self.plies == 0 or self.nodes == 0:
+            return 0.0
+        return (self.nodes / self.moves) ** (self.moves / self.plies)
+
+    def first_move_cutoff_rate(self) -> float:
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    def transposition_hit_rate(self) -> float:
+        return self.transposition_hits / self.transposition_probes if self.transposition_probes else 0.0
+
+    def tablebase_hit_rate(self) -> float:
+        return self.tablebase_hits / self.tablebase_probes if self.tablebase_probes else 0.0
+
+    def book_hit_rate(self) -> float:
+        return self.book_hits / self.book_probes if self.book_probes else 0.0
+
+    def evaluation_cache_hit_rate(self) -> float:
+        return self.evaluation_cache_hits / self.evaluation_cache_probes if self.evaluation_cache_probes else 0.0
+
+    def __str__(self) -> str:
+        return "nodes:" + str(self.nodes) + \
+            " leaf evaluations:" + str(self.leaf_evaluations) + \
+            " nodes/s:" + str(round(self.nodes_per_second())) + \
+            " EBF:" + str(round(self.effective_branching_factor(), 2)) + \
+            " cutoffs:" + str(self.cutoffs) + \
+            " first move cutoffs:" + str(round(self.first_move_cutoff_rate(), 2)) + \
+            " max depth:" + str(self.max_depth) + \
+            " TT hits:" + str(round(self.transposition_hit_rate(), 2)) + \
+            " tablebase hits:" + str(round(self.tablebase_hit_rate(), 2)) + \
+            " book hits:" + str(round(self.book_hit_rate(), 2)) + \
+            " evaluation cache hits:" + str(round(self.evaluation_cache_hit_rate(), 2))
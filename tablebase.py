@@ -0,0 +1,205 @@
+from __future__ import annotations
+import argparse
+import chess
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations, repeat
+import numpy as np
+import os
+from pawnboard import PawnBoard
+from typing import Dict, List, Tuple
+
+# Pawns can only stand on the second to seventh rank, a pawn on a back rank has already won
+TABLE_SQUARES: List[chess.Square] = list(range(chess.A2, chess.H7 + 1))
+BB_TABLE_SQUARES = chess.BB_ALL & ~chess.BB_BACKRANKS
+NUMBER_OF_TABLE_SQUARES = len(TABLE_SQUARES)
+# Marks positions of the configuration being generated that are not solved yet
+UNSOLVED = -128
+DRAW = 0
+MAX_DISTANCE = 127
+WIN_PREFERENCE = 1000
+
+BINOMIALS: List[List[int]] = [[0] * (NUMBER_OF_TABLE_SQUARES + 1) for _ in range(NUMBER_OF_TABLE_SQUARES + 1)]
+for _n in range(NUMBER_OF_TABLE_SQUARES + 1):
+    BINOMIALS[_n][0] = 1
+    for _k in range(1, _n + 1):
+        BINOMIALS[_n][_k] = BINOMIALS[_n - 1][_k - 1] + BINOMIALS[_n - 1][_k]
+
+
+def _popcount(bitboard: int) -> int:
+    return bin(bitboard).count('1')
+
+
+def table_size(white_count: int, black_count: int) -> int:
+    return BINOMIALS[NUMBER_OF_TABLE_SQUARES][white_count] * \
+        BINOMIALS[NUMBER_OF_TABLE_SQUARES - white_count][black_count] * 2
+
+
+def table_file_name(white_count: int, black_count: int) -> str:
+    return str(white_count) + "w" + str(black_count) + "b.tb"
+
+
+def position_index(white: int, black: int, turn: chess.Color) -> int:
+    # The white pawns are ranked among the 48 squares and the black pawns among the squares
+    # left over, with the combinatorial number system, so every index is a real position.
+    white_rank, count = 0, 0
+    for square in chess.scan_forward(white):
+        count += 1
+        white_rank += BINOMIALS[square - chess.A2][count]
+    black_rank, count = 0, 0
+    for square in chess.scan_forward(black):
+        count += 1
+        free_index = square - chess.A2 - _popcount(white & chess.BB_SQUARES[square] - 1)
+        black_rank += BINOMIALS[free_index][count]
+    black_positions = BINOMIALS[NUMBER_OF_TABLE_SQUARES - _popcount(white)][_popcount(black)]
+    return (white_rank * black_positions + black_rank) * 2 + (turn == chess.BLACK)
+
+
+def _value_after_move(child_value: int) -> int:
+    # Values are plies to the end of the game from the side to move: positive when it
+    # wins, negative when it loses and 0 for a draw
+    if child_value > 0:
+        return -(child_value + 1)
+    elif child_value < 0:
+        return 1 - child_value
+    return DRAW
+
+
+def _preference(value: int) -> int:
+    # Quick wins first, then draws, then the slowest losses
+    if value > 0:
+        return WIN_PREFERENCE - value
+    elif value < 0:
+        return -WIN_PREFERENCE - value
+    return 0
+
+
+class Tablebase:
+    # Exact results of pawn endgames, one file per number of white and black pawns.
+    # Every pawn move is irreversible, so the positions of a game form a DAG: pushes lead to
+    # positions of the same configuration closer to promotion and captures to configurations
+    # with fewer pawns. A position is solved from its children, and configurations are
+    # generated in order of their number of pawns.
+    # The files hold one signed byte per position, see _value_after_move. A side without
+    # moves draws, as in the search. The files leave out en passant rights. A position where
+    # en passant is possible is solved on the fly from its children, which have none.
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self.tables: Dict[Tuple[int, int], np.ndarray] = {}
+        self.probes = 0
+        self.hits = 0
+
+    def __getstate__(self) -> dict:
+        # The memory maps are opened again by the process the tablebase is sent to
+        state = self.__dict__.copy()
+        state['tables'] = {}
+        return state
+
+    def hit_rate(self) -> float:
+        return self.hits / self.probes if self.probes else 0.0
+
+    def table(self, white_count: int, black_count: int) -> np.ndarray:
+        key = (white_count, black_count)
+        if key not in self.tables:
+            path = os.path.join(self.directory, table_file_name(white_count, black_count))
+            self.tables[key] = np.memmap(path, dtype=np.int8, mode='r') if os.path.exists(path) else None
+        return self.tables[key]
+
+    def probe(self, board: chess.Board) -> int:
+        # Plies to the end of the game for the side to move, or None if the position is not covered
+        self.probes += 1
+        value = self.position_value(
+            white=board.occupied_co[chess.WHITE],
+            black=board.occupied_co[chess.BLACK],
+            turn=board.turn,
+            ep_square=board.ep_square
+        )
+        if value is not None:
+            self.hits += 1
+        return value
+
+    def position_value(self, white: int, black: int, turn: chess.Color, ep_square: chess.Square=None) -> int:
+        if (white | black) & ~BB_TABLE_SQUARES:
+            return None
+        if ep_square is not None and \
+                chess.BB_PAWN_ATTACKS[not turn][ep_square] & (white if turn == chess.WHITE else black):
+            return self.search_value(white=white, black=black, turn=turn, ep_square=ep_square)
+        table = self.table(_popcount(white), _popcount(black))
+        if table is None:
+            return None
+        index = position_index(white, black, turn)
+        value = int(table[index])
+        if value == UNSOLVED:
+            value = self.search_value(white=white, black=black, turn=turn)
+            # Only the in-memory table being generated is filled in, tables on disk are read only
+            if table.flags.writeable:
+                table[index] = value
+        return value
+
+    def search_value(self, white: int, black: int, turn: chess.Color, ep_square: chess.Square=None) -> int:
+        board = PawnBoard(white, black, turn, ep_square)
+        best_value = None
+        for move in board.legal_moves:
+            board.push(move)
+            if board.outcome() is not None:
+                return 1
+            child_value = self.position_value(white=board.white, black=board.black, turn=board.turn, ep_square=board.ep_square)
+            board.pop()
+            if child_value is None:
+                return None
+            value = _value_after_move(child_value)
+            if best_value is None or _preference(value) > _preference(best_value):
+                best_value = value
+        return DRAW if best_value is None else best_value
+
+
+def _solve_configuration(directory: str, white_count: int, black_count: int) -> str:
+    path = os.path.join(directory, table_file_name(white_count, black_count))
+    if os.path.exists(path):
+        return path
+    tablebase = Tablebase(directory)
+    values = np.full(table_size(white_count, black_count), UNSOLVED, dtype=np.int8)
+    tablebase.tables[white_count, black_count] = values
+    for white_squares in combinations(TABLE_SQUARES, white_count):
+        white = sum(chess.BB_SQUARES[square] for square in white_squares)
+        free_squares = [square for square in TABLE_SQUARES if not chess.BB_SQUARES[square] & white]
+        for black_squares in combinations(free_squares, black_count):
+            black = sum(chess.BB_SQUARES[square] for square in black_squares)
+            for turn in chess.COLORS:
+                tablebase.position_value(white=white, black=black, turn=turn)
+    # Written under a temporary name, so an interrupted run never leaves a partial table behind
+    temporary_path = path + ".tmp"
+    values.tofile(temporary_path)
+    os.replace(temporary_path, path)
+    return path
+
+
+def generate(directory: str, max_pawns_per_side: int, workers: int=1) -> None:
+    # Tables that already exist are kept, so an interrupted generation can be restarted.
+    # Configurations with the same number of pawns only depend on smaller ones and are
+    # solved in parallel.
+    if max_pawns_per_side * 5 * 2 + 1 > MAX_DISTANCE:
+        raise ValueError("Distances to win would not fit in a byte")
+    os.makedirs(directory, exist_ok=True)
+    for total in range(2 * max_pawns_per_side + 1):
+        configurations = [
+            (white_count, total - white_count) for white_count in range(max_pawns_per_side + 1)
+                if 0 <= total - white_count <= max_pawns_per_side and \
+                    not os.path.exists(os.path.join(directory, table_file_name(white_count, total - white_count)))
+        ]
+        if workers > 1 and len(configurations) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(_solve_configuration, repeat(directory),
+                    [white_count for white_count, _ in configurations],
+                    [black_count for _, black_count in configurations]))
+        else:
+            for white_count, black_count in configurations:
+                _solve_configuration(directory, white_count, black_count)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate pawn endgame tablebases")
+    parser.add_argument('directory')
+    parser.add_argument('max_pawns_per_side', type=int)
+    parser.add_argument('--workers', type=int, default=1)
+    arguments = parser.parse_args()
+    generate(arguments.directory, arguments.max_pawns_per_side, arguments.workers)
@@ -0,0 +1,126 @@
+from aichess import AIChess, GameOutcome, play_game
+from heuristics import Heuristic
+from mctschessplayer import MCTSPlayer
+from minimaxchessplayer import MinimaxPlayer
+from moveordering import MoveOrdering
+import pytest
+from randomchessplayer import RandomChessPlayer
+from resultstore import ResultStore
+import time
+
+
+class MoveClock:
+    # Process time that goes up by one every time it is read, so every move takes one second
+    def __init__(self) -> None:
+        self.now = 0
+
+    def process_time(self) -> float:
+        self.now += 1
+        return self.now
+
+
+def tournament(workers: int, seed: int=7, result_store: str=None) -> list:
+    baselines = [RandomChessPlayer(MoveClock(), pawn_board=True)]
+    testplayers = [RandomChessPlayer(MoveClock(), pawn_board=True), RandomChessPlayer(MoveClock())]
+    results = AIChess(iterations=6, baselines=baselines, testplayers=testplayers, workers=workers, seed=seed,
+        result_store=result_store).run()
+    return results, baselines + testplayers
+
+
+def comparable(results: list) -> list:
+    # Everything but the process times, which differ from run to run
+    return [[(result.player1_name, result.player2_name, result.percent_wins_player1, result.percent_draws,
+        result.average_moves_per_game, result.iterations) for result in row] for row in results]
+
+
+class TestAIChess:
+    def test_game_outcome_counts_only_the_moves_of_the_game(self) -> None:
+        player1, player2 = RandomChessPlayer(MoveClock()), RandomChessPlayer(MoveClock())
+        first = play_game(player1, player2, player1_starts=True, seed=1, visual=False, verbose=False, ponder=False)
+        second = play_game(player1, player2, player1_starts=False, seed=2, visual=False, verbose=False, ponder=False)
+        assert sum(first.moves) + sum(second.moves) == player1.total_moves + player2.total_moves
+        assert second.decision_seconds == pytest.approx(second.moves)
+        assert play_game(RandomChessPlayer(MoveClock()), RandomChessPlayer(MoveClock()), True, 1, False, False, False) == first
+
+    def test_average_moves_per_game_is_not_cumulative(self) -> None:
+        results, players = tournament(workers=1)
+        moves = sum(result.average_moves_per_game * result.iterations for row in results for result in row)
+        # Every move is made by one of the players, and the baseline plays every matchup
+        assert moves == sum(player.total_moves for player in players)
+        assert all(result.average_decision_time_player1 == pytest.approx(1.0) for row in results for result in row)
+
+    def test_parallel_tournament_gives_the_same_results(self) -> None:
+        serial, serial_players = tournament(workers=1)
+        parallel, parallel_players = tournament(workers=2)
+        assert comparable(parallel) == comparable(serial)
+        assert [player.total_moves for player in parallel_players] == [player.total_moves for player in serial_players]
+        assert all(result.average_decision_time_player2 == pytest.approx(1.0) for row in parallel for result in row)
+
+    @pytest.mark.parametrize("heuristics,move_ordering", [
+        (list(Heuristic), []),
+        ([Heuristic.Maximize_Number_Of_Pieces], list(MoveOrdering))
+    ])
+    def test_players_that_keep_tables_give_the_same_results_in_parallel(self, heuristics: list, move_ordering: list) -> None:
+        # Each worker's copy of the player keeps its own table, so only clearing it for every game
+        # makes a game independent of the games played before it
+        def stateful_tournament(workers: int) -> list:
+            player = MinimaxPlayer(time, depth=2, heuristics=heuristics, run_alpha_beta=True, transposition_table_mb=1,
+                move_ordering=move_ordering)
+            return AIChess(iterations=8, baselines=[RandomChessPlayer(time)], testplayers=[player], workers=workers, seed=11).run()
+        assert comparable(stateful_tournament(workers=2)) == comparable(stateful_tournament(workers=1))
+
+    def test_parallel_search_reports_are_merged_into_the_players(self) -> None:
+        baseline = RandomChessPlayer(time, pawn_board=True)
+        player = MinimaxPlayer(time, depth=1, heuristics=[Heuristic.Maximize_Number_Of_Pieces], run_alpha_beta=True, pawn_board=True)
+        results = AIChess(iterations=2, baselines=[baseline], testplayers=[player], workers=2, seed=3).run()
+        report = results[0][0].search_report_player1
+        assert report.moves == player.total_moves == player.total_search_report.moves > 0
+        assert results[0][0].search_report_player2 is None
+
+    def test_parallel_playouts_are_added_to_the_players(self) -> None:
+        player = MCTSPlayer(time, iterations=20)
+        results = AIChess(iterations=2, baselines=[RandomChessPlayer(time, pawn_board=True)], testplayers=[player], workers=2, seed=3).run()
+        assert player.total_playouts > 0 and player.total_playouts % (20 * player.playouts_per_leaf) == 0
+        assert player.average_playouts_per_second() > 0
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_restarted_tournament_only_plays_the_missing_games(self, tmp_path, workers: int) -> None:
+        path = str(tmp_path / "results.jsonl")
+        complete, _ = tournament(workers=workers)
+        stored, _ = tournament(workers=workers, result_store=path)
+        assert comparable(stored) == comparable(complete)
+        # A crash after four games, in the middle of writing the fifth
+        with open(path) as file:
+            lines = file.readlines()
+        assert len(lines) == 2 * 6
+        with open(path, 'w') as file:
+            file.writelines(lines[:4])
+            file.write(lines[4][:20])
+        resumed, players = tournament(workers=workers, seed=None, result_store=path)
+        assert comparable(resumed) == comparable(complete)
+        records = ResultStore(path).records()
+        assert len(records) == 2 * 6
+        # The players only made the moves of the games that were not stored
+        assert sum(player.total_moves for player in players) == sum(sum(record['moves']) for record in records[4:]) > 0
+        rebuilt, players = tournament(workers=workers, seed=None, result_store=path)
+        assert rebuilt == resumed
+        assert all(player.total_moves == 0 for player in players)
+
+    def test_stored_games_of_players_with_other_settings_are_played_again(self, tmp_path) -> None:
+        path = str(tmp_path / "results.jsonl")
+        tournament(workers=1, result_store=path)
+        records = ResultStore(path).records()
+        assert records[0]['player2_config'] == {'player': 'RandomChessPlayer', 'pawn_board': True}
+        # Same names as the stored players, but the baseline generates moves with python-chess
+        baseline = RandomChessPlayer(MoveClock())
+        testplayers = [RandomChessPlayer(MoveClock(), pawn_board=True), RandomChessPlayer(MoveClock())]
+        AIChess(iterations=6, baselines=[baseline], testplayers=testplayers, seed=7, result_store=path).run()
+        assert baseline.total_moves > 0
+        assert len(ResultStore(path).records()) == 2 * 2 * 6
+
+    def test_minimax_config_holds_every_option(self) -> None:
+        player = MinimaxPlayer(time, depth=2, heuristics=[Heuristic.Maximize_Number_Of_Pieces], run_alpha_beta=True)
+        other = MinimaxPlayer(time, depth=2, heuristics=[Heuristic.Maximize_Number_Of_Pieces], run_alpha_beta=True, quiescence=True)
+        assert player.get_name() == other.get_name()
+        assert player.get_config() != other.get_config()
+        assert player.get_config()['heuristics'] == ['Maximize_Number_Of_Pieces']
@@ -0,0 +1,105 @@
+from aichessboard import AIChessBoard
+import chess
+from evaluationcache import EvaluationCache, WAYS, heuristic_set_mask
+from heuristics import Heuristic, Heuristics
+from minimaxchessplayer import MinimaxPlayer, ALPHA_DEFAULT, BETA_DEFAULT
+import pickle
+import pytest
+import time
+
+HEURISTICS = list(Heuristic)
+BOARD = '8/pp4pp/8/2pP4/8/8/PP4PP/8'
+
+
+def colliding_positions(cache: EvaluationCache, tag: int, count: int) -> list:
+    # Positions that hash to the same set as the first one
+    slot = cache._EvaluationCache__first_slot
+    positions = []
+    white = 1
+    while len(positions) < count:
+        if not positions or slot(white, 0, tag) == slot(positions[0][0], 0, tag):
+            positions.append((white, 0))
+        white += 1
+    return positions
+
+
+class TestEvaluationCache:
+    def test_hits_and_misses_are_counted(self) -> None:
+        cache = EvaluationCache(1 << 16)
+        tag = EvaluationCache.tag(chess.WHITE, heuristic_set_mask(HEURISTICS))
+        assert cache.probe(chess.BB_RANK_2, chess.BB_RANK_7, tag) is None
+        cache.store(chess.BB_RANK_2, chess.BB_RANK_7, tag, -42)
+        assert cache.probe(chess.BB_RANK_2, chess.BB_RANK_7, tag) == -42
+        assert (cache.hits, cache.misses, cache.probes, len(cache)) == (1, 1, 2, 1)
+        assert cache.hit_rate() == pytest.approx(0.5)
+        cache.clear()
+        assert (cache.probes, len(cache)) == (0, 0)
+        assert cache.probe(chess.BB_RANK_2, chess.BB_RANK_7, tag) is None
+
+    def test_least_recently_used_entry_of_a_set_is_evicted(self) -> None:
+        cache = EvaluationCache(1 << 12)
+        tag = EvaluationCache.tag(chess.WHITE, 1)
+        positions = colliding_positions(cache, tag, WAYS + 1)
+        for value, (white, black) in enumerate(positions[:WAYS]):
+            cache.store(white, black, tag, value)
+        assert cache.probe(*positions[0], tag) == 0
+        cache.store(*positions[WAYS], tag, WAYS)
+        assert cache.probe(*positions[1], tag) is None
+        for value in [0, 2, 3, 4]:
+            assert cache.probe(*positions[value], tag) == value
+
+    def test_keys_are_exact(self) -> None:
+        # Bitboards that differ only in their lowest bit, past the precision of a float
+        cache = EvaluationCache(1 << 16)
+        tag = EvaluationCache.tag(chess.BLACK, 3)
+        cache.store(chess.BB_ALL, chess.BB_ALL - 1, tag, 7)
+        assert cache.probe(chess.BB_ALL, chess.BB_ALL - 1, tag) == 7
+        assert cache.probe(chess.BB_ALL, chess.BB_ALL - 2, tag) is None
+        assert cache.probe(chess.BB_ALL - 1, chess.BB_ALL, tag) is None
+
+    def test_colors_and_heuristic_sets_have_their_own_entries(self) -> None:
+        cache = EvaluationCache(1 << 16)
+        board = AIChessBoard(BOARD)
+        white_pieces = Heuristics([Heuristic.Maximize_Number_Of_Pieces], cache=cache)
+        white_all = Heuristics(HEURISTICS, cache=cache)
+        uncached = Heuristics(HEURISTICS)
+        for _ in range(2):
+            for color in chess.COLORS:
+                assert white_all.return_heuristic_value(board, color) == uncached.return_heuristic_value(board, color)
+                assert white_pieces.return_heuristic_value(board, color) == 0
+        assert (len(cache), cache.hits) == (4, 4)
+
+    def test_back_ranks_are_not_cached(self) -> None:
+        cache = EvaluationCache(1 << 16)
+        heuristics = Heuristics(HEURISTICS, cache=cache)
+        queen = AIChessBoard('Q7/8/8/8/8/8/7p/8')
+        knight = AIChessBoard('N7/8/8/8/8/8/7p/8')
+        assert heuristics.return_heuristic_value(queen, chess.WHITE) != heuristics.return_heuristic_value(knight, chess.WHITE)
+        assert cache.probes == 0
+
+    def test_pickled_cache_arrives_empty(self) -> None:
+        cache = EvaluationCache(1 << 16)
+        cache.store(1, 2, 3, 4)
+        copy = pickle.loads(pickle.dumps(cache))
+        assert copy.size == cache.size and len(copy) == 0
+
+    @pytest.mark.parametrize("run_alpha_beta", [False, True])
+    def test_search_scores_are_unchanged(self, run_alpha_beta: bool) -> None:
+        board = AIChessBoard(BOARD)
+        scores = []
+        for evaluation_cache_mb in [0, 1]:
+            player = MinimaxPlayer(time, depth=2, heuristics=HEURISTICS, run_alpha_beta=run_alpha_beta,
+                evaluation_cache_mb=evaluation_cache_mb)
+            scores.append(player.negamax(board=board.copy(), depth=3, alpha=ALPHA_DEFAULT, beta=BETA_DEFAULT, maximizer=board.turn)[0])
+        assert scores[0] == scores[1]
+
+    def test_players_share_a_cache(self) -> None:
+        cache = EvaluationCache(1 << 20)
+        board = AIChessBoard(BOARD)
+        first = MinimaxPlayer(time, depth=2, heuristics=HEURISTICS, run_alpha_beta=True, evaluation_cache=cache)
+        second = MinimaxPlayer(time, depth=2, heuristics=HEURISTICS, run_alpha_beta=True, evaluation_cache=cache)
+        first.min_max(board=board.copy(), depth=2)
+        second.min_max(board=board.copy(), depth=2)
+        # The root moves are shuffled, so alpha-beta may visit a few leaves the first search cut off
+        assert first.search_report.evaluation_cache_probes > 0
+        assert second.search_report.evaluation_cache_hit_rate() > first.search_report.evaluation_cache_hit_rate()
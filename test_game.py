@@ -0,0 +1,109 @@
+from aichessboard import AIChessBoard
+import chess
+from chess import Move
+from game import Game
+from heuristics import Heuristic
+from minimaxchessplayer import MinimaxPlayer
+import pytest
+from randomchessplayer import RandomChessPlayer
+import time
+
+STARTING_BOARD = '8/pppppppp/8/8/8/8/PPPPPPPP/8'
+
+
+class SlowRandomPlayer(RandomChessPlayer):
+    # Thinks long enough for the other player to ponder every reply
+    def _ChessPlayer__get_next_move(self, board: AIChessBoard) -> Move:
+        time.sleep(0.1)
+        return super()._ChessPlayer__get_next_move(board)
+
+
+class BrokenPlayer(RandomChessPlayer):
+    def _ChessPlayer__get_next_move(self, board: AIChessBoard) -> Move:
+        raise ValueError("broken search")
+
+
+class MoveClock:
+    # Process time that goes up by one every time it is read
+    def __init__(self) -> None:
+        self.now = 0
+
+    def process_time(self) -> float:
+        self.now += 1
+        return self.now
+
+
+# Black to move has only h7h6
+ONE_REPLY_BOARD = '8/7p/8/7P/8/8/P7/8 b - - 0 1'
+
+
+def fast_minimax_player() -> MinimaxPlayer:
+    return MinimaxPlayer(time, depth=1, heuristics=[Heuristic.Maximize_Number_Of_Pieces], run_alpha_beta=True, transposition_table_mb=1)
+
+
+class TestGame:
+    def test_game_without_pondering_has_no_ponder_statistics(self) -> None:
+        game = Game(white=RandomChessPlayer(time), black=RandomChessPlayer(time), visual=False, verbose=False)
+        game.run()
+        assert game.terminated
+        assert game.ponder_probes == {chess.WHITE: 0, chess.BLACK: 0}
+
+    def test_pondered_reply_is_answered_from_the_background_search(self) -> None:
+        player = fast_minimax_player()
+        board = AIChessBoard(STARTING_BOARD)
+        board.push_uci('e2e4')
+        try:
+            player.start_pondering(board)
+            time.sleep(0.5)
+            board.push_uci('d7d5')
+            move = player.get_next_move(board)
+        finally:
+            player.stop_pondering()
+        assert move in board.legal_moves
+        assert player.ponder_hits == 1 and player.ponder_probes == 1
+
+    def test_ponder_hit_is_charged_the_process_time_of_the_background_search(self) -> None:
+        player = RandomChessPlayer(MoveClock())
+        board = AIChessBoard(ONE_REPLY_BOARD)
+        try:
+            player.start_pondering(board)
+            time.sleep(0.5)
+            board.push_uci('h7h6')
+            player.get_next_move(board)
+        finally:
+            player.stop_pondering()
+        assert player.ponder_hits == 1
+        # A second in the background process and one in this one
+        assert player.last_decision_time == 2
+
+    def test_errors_of_the_background_search_are_raised(self) -> None:
+        player = BrokenPlayer(time)
+        board = AIChessBoard(ONE_REPLY_BOARD)
+        try:
+            player.start_pondering(board)
+            time.sleep(0.5)
+            board.push_uci('h7h6')
+            with pytest.raises(ValueError):
+                player.get_next_move(board)
+        finally:
+            player.stop_pondering()
+
+    def test_reply_without_prediction_is_not_pondered_alone(self) -> None:
+        player = fast_minimax_player()
+        board = AIChessBoard(STARTING_BOARD)
+        try:
+            player.start_pondering(board, all_replies=False)
+            board.push_uci('a2a3')
+            assert player.get_next_move(board) in board.legal_moves
+        finally:
+            player.stop_pondering()
+        assert player.ponder_probes == 0
+
+    def test_pondering_game_reports_its_hit_rate(self) -> None:
+        ponderer = fast_minimax_player()
+        game = Game(white=SlowRandomPlayer(time), black=ponderer, visual=False, verbose=False, ponder=True)
+        game.run()
+        assert game.terminated
+        assert game.ponder_probes[chess.BLACK] > 0
+        assert game.ponder_hit_rate(chess.BLACK) > 0.5
+        assert ponderer.ponder_hits == game.ponder_hits[chess.BLACK]
@@ -0,0 +1,101 @@
+from aichessboard import AIChessBoard
+import chess
+from chess import Move
+from game import Game
+from gamerecord import GameRecordReader, GameRecordWriter, decode_moves, encode_moves
+import pytest
+import random
+from randomchessplayer import RandomChessPlayer
+import time
+
+STARTING_BOARD = '8/pppppppp/8/8/8/8/PPPPPPPP/8'
+
+
+def random_game(seed: int) -> AIChessBoard:
+    generator = random.Random(seed)
+    board = AIChessBoard(STARTING_BOARD)
+    while board.outcome() is None:
+        moves = list(board.legal_moves)
+        if not moves:
+            break
+        board.push(generator.choice(moves))
+    return board
+
+
+class TestGameRecord:
+    def test_moves_are_one_byte_and_promotions_two(self) -> None:
+        moves = [Move.from_uci(uci) for uci in ['e2e4', 'd7d5', 'e4d5', 'c7c6', 'd5c6', 'b7b5', 'c6c7', 'b5b4', 'c7c8n']]
+        encoded = encode_moves(moves)
+        assert len(encoded) == len(moves) + 1
+        assert decode_moves(encoded) == [(move.from_square, move.to_square, move.promotion) for move in moves]
+
+    def test_replay_matches_the_board_after_every_move(self, tmp_path) -> None:
+        path = str(tmp_path / "games.bin")
+        boards = [random_game(seed) for seed in range(20)]
+        with GameRecordWriter(path) as writer:
+            for board in boards:
+                writer.write(board.move_stack, board.outcome().winner if board.outcome() is not None else None)
+        with GameRecordReader(path) as reader:
+            assert len(reader) == len(boards)
+            for board, record in zip(boards, reader):
+                assert record.plies == len(board.move_stack)
+                assert record.winner == (board.outcome().winner if board.outcome() is not None else None)
+                whites, blacks = record.replay()
+                replayed = AIChessBoard(STARTING_BOARD)
+                assert (int(whites[0]), int(blacks[0])) == (replayed.occupied_co[chess.WHITE], replayed.occupied_co[chess.BLACK])
+                for ply, move in enumerate(board.move_stack, start=1):
+                    replayed.push(move)
+                    assert (int(whites[ply]), int(blacks[ply])) == (replayed.occupied_co[chess.WHITE], replayed.occupied_co[chess.BLACK])
+
+    def test_en_passant_removes_the_passed_pawn(self, tmp_path) -> None:
+        path = str(tmp_path / "games.bin")
+        moves = [Move.from_uci(uci) for uci in ['e2e4', 'a7a6', 'e4e5', 'd7d5', 'e5d6']]
+        with GameRecordWriter(path) as writer:
+            writer.write(moves, None)
+        with GameRecordReader(path) as reader:
+            whites, blacks = reader[0].replay()
+        assert not int(blacks[-1]) & chess.BB_D5
+        assert int(whites[-1]) & chess.BB_D6
+
+    def test_positions_of_every_game_are_concatenated(self, tmp_path) -> None:
+        path = str(tmp_path / "games.bin")
+        boards = [random_game(seed) for seed in range(3)]
+        with GameRecordWriter(path) as writer:
+            for board in boards:
+                writer.write(board.move_stack, None)
+        with GameRecordReader(path) as reader:
+            whites, blacks, games = reader.positions()
+        assert len(whites) == len(blacks) == sum(len(board.move_stack) + 1 for board in boards)
+        assert list(games).count(2) == len(boards[2].move_stack) + 1
+
+    def test_game_cut_off_by_a_crash_is_not_read_and_writing_continues(self, tmp_path) -> None:
+        path = str(tmp_path / "games.bin")
+        with GameRecordWriter(path) as writer:
+            writer.write(random_game(0).move_stack, None)
+        with open(path, 'ab') as file:
+            file.write(b'\x05\x00\x05')
+        with GameRecordReader(path) as reader:
+            assert len(reader) == 1
+        board = random_game(1)
+        with GameRecordWriter(path) as writer:
+            writer.write(board.move_stack, True)
+        with GameRecordReader(path) as reader:
+            assert len(reader) == 2
+            assert reader[1].winner is True
+            assert reader[1].moves() == [(move.from_square, move.to_square, move.promotion) for move in board.move_stack]
+
+    def test_other_files_are_refused(self, tmp_path) -> None:
+        path = tmp_path / "games.bin"
+        path.write_bytes(b'not a games file')
+        with pytest.raises(GameRecordReader.UnknownFormat):
+            GameRecordReader(str(path))
+
+    def test_game_writes_its_moves_when_it_ends(self, tmp_path) -> None:
+        path = str(tmp_path / "games.bin")
+        with GameRecordWriter(path) as writer:
+            game = Game(white=RandomChessPlayer(time), black=RandomChessPlayer(time), visual=False, verbose=False, record_writer=writer)
+            winner = game.run()
+        with GameRecordReader(path) as reader:
+            assert len(reader) == 1
+            assert reader[0].winner == winner
+            assert reader[0].moves() == [(move.from_square, move.to_square, move.promotion) for move in game.board.move_stack]
@@ -0,0 +1,208 @@
+from aichessboard import AIChessBoard
+import chess
+from heuristics import EvaluationPlan, Heuristic, Heuristics, PLAYER_BLACK, PLAYER_WHITE, rank_pattern_structure, rank_pattern_tables
+import numpy as np
+from pawnboard import PawnBoard
+import pytest
+from itertools import combinations
+import random
+
+
+class MatrixHeuristics:
+    # The 8x8 grid evaluation the bitboard terms replaced, kept as the reference. The grid holds
+    # the color of the piece on each square or "." and is turned around for black, so the first
+    # row is the last rank of the player.
+    def create_matrix_from_board(self, board: chess.Board, player_color: chess.Color) -> np.ndarray:
+        white = self.int_to_array(board.occupied_co[PLAYER_WHITE], PLAYER_WHITE)
+        black = self.int_to_array(board.occupied_co[PLAYER_BLACK], PLAYER_BLACK)
+        mask = (white == ".")
+        white[mask] = black[mask]
+        if player_color == PLAYER_BLACK:
+            white = np.flip(white)
+        return white
+
+    def int_to_array(self, number: int, player: chess.Color) -> np.ndarray:
+        binary = np.array(["." if int(x) == 0 else player for x in format(number, '064b')], dtype=object)
+        return np.flip(np.reshape(binary, (8, 8)), axis=1)
+
+    def pawn_chain_support(self, matrix_board: np.ndarray, player_color: chess.Color) -> int:
+        heuristic_value = 0
+        for counter, row in enumerate(matrix_board):
+            if counter == 0:
+                continue
+            for element, square in enumerate(row):
+                if square is player_color:
+                    if element > 0 and matrix_board[counter - 1][element - 1] is player_color:
+                        heuristic_value += 1
+                    if element < len(row) - 1 and matrix_board[counter - 1][element + 1] is player_color:
+                        heuristic_value += 1
+        return heuristic_value
+
+    def pawn_side_by_side_support(self, matrix_board: np.ndarray, player_color: chess.Color) -> int:
+        heuristic_value = 0
+        for counter, row in enumerate(matrix_board):
+            for element, square in enumerate(row):
+                if square is player_color:
+                    if element > 0 and matrix_board[counter][element - 1] is player_color:
+                        heuristic_value += 1
+                    if element < len(row) - 1 and matrix_board[counter][element + 1] is player_color:
+                        heuristic_value += 1
+        return heuristic_value
+
+    def distance_from_opposite_side_of_board(self, matrix_board: np.ndarray, player_color: chess.Color) -> int:
+        heuristic_value = 0
+        length_of_board = len(matrix_board)
+        for counter, row in enumerate(matrix_board):
+            if counter > length_of_board - 2:
+                continue
+            for square in row:
+                if square is player_color:
+                    heuristic_value += length_of_board - counter - 2
+        return heuristic_value * 5
+
+    def number_of_stacked_pawns(self, matrix_board: np.ndarray, player_color: chess.Color) -> int:
+        heuristic_value = 0
+        for counter, row in enumerate(matrix_board):
+            if counter == 0:
+                continue
+            for element, square in enumerate(row):
+                if square is player_color and matrix_board[counter - 1][element] is player_color:
+                    heuristic_value -= 1
+        return heuristic_value
+
+    def is_piece_at_risk(self, matrix_board: np.ndarray, player_color: chess.Color) -> int:
+        heuristic_value = 0
+        for counter, row in enumerate(matrix_board):
+            if counter == 0:
+                continue
+            for element, square in enumerate(row):
+                if square is player_color:
+                    if element > 0 and matrix_board[counter - 1][element - 1] is (not player_color):
+                        heuristic_value -= 20
+                    if element < len(row) - 1 and matrix_board[counter - 1][element + 1] is (not player_color):
+                        heuristic_value -= 20
+        return heuristic_value
+
+
+MATRIX_TERMS = {
+    Heuristic.Keep_Pawns_Diagonally_Supported: MatrixHeuristics.pawn_chain_support,
+    Heuristic.Side_By_Side_Pawns: MatrixHeuristics.pawn_side_by_side_support,
+    Heuristic.Distance_From_Starting_Location: MatrixHeuristics.distance_from_opposite_side_of_board,
+    Heuristic.Stacked_Pawns: MatrixHeuristics.number_of_stacked_pawns,
+    Heuristic.Piece_Could_Be_Captured: MatrixHeuristics.is_piece_at_risk
+}
+
+
+def random_board(generator: random.Random) -> AIChessBoard:
+    # Pawns anywhere between the second and seventh rank, and now and then a queen on a back rank
+    board = AIChessBoard(None)
+    squares = generator.sample(range(chess.A2, chess.H7 + 1), generator.randint(0, 16))
+    for square in squares:
+        board.set_piece_at(square, chess.Piece(chess.PAWN, generator.choice(chess.COLORS)))
+    if generator.random() < 0.2:
+        color = generator.choice(chess.COLORS)
+        back_rank = chess.SQUARES[56:] if color == chess.WHITE else chess.SQUARES[:8]
+        board.set_piece_at(generator.choice(back_rank), chess.Piece(chess.QUEEN, color))
+    board.turn = generator.choice(chess.COLORS)
+    return board
+
+
+class TestHeuristics:
+    @pytest.mark.parametrize("heuristic", list(MATRIX_TERMS))
+    def test_bitboard_terms_match_the_matrix_evaluation(self, heuristic: Heuristic) -> None:
+        generator = random.Random(heuristic.value)
+        reference = MatrixHeuristics()
+        heuristics = Heuristics([heuristic])
+        for _ in range(1000):
+            board = random_board(generator)
+            for player_color in chess.COLORS:
+                matrix_board = reference.create_matrix_from_board(board, player_color)
+                expected = MATRIX_TERMS[heuristic](reference, matrix_board, player_color)
+                assert heuristics.return_heuristic_value(board, player_color) == expected, (board.fen(), player_color)
+
+    def test_number_of_pieces_counts_queens_as_a_hundred_pawns(self) -> None:
+        generator = random.Random(7)
+        heuristics = Heuristics([Heuristic.Maximize_Number_Of_Pieces])
+        for _ in range(500):
+            board = random_board(generator)
+            for player_color in chess.COLORS:
+                expected = len(board.pieces(chess.PAWN, player_color)) + 100 * len(board.pieces(chess.QUEEN, player_color)) - \
+                    len(board.pieces(chess.PAWN, not player_color)) - 100 * len(board.pieces(chess.QUEEN, not player_color))
+                assert heuristics.return_heuristic_value(board, player_color) == expected
+
+    def test_pawn_board_evaluates_like_the_chess_board(self) -> None:
+        generator = random.Random(11)
+        heuristics = Heuristics(list(Heuristic))
+        for _ in range(500):
+            board = random_board(generator)
+            for player_color in chess.COLORS:
+                assert heuristics.return_heuristic_value(PawnBoard.from_board(board), player_color) == \
+                    heuristics.return_heuristic_value(board, player_color)
+
+    def test_every_subset_adds_up_its_terms(self) -> None:
+        # The subsets of the ablation study and every other one, against the terms one by one
+        generator = random.Random(23)
+        boards = [random_board(generator) for _ in range(50)]
+        single = {heuristic: Heuristics([heuristic]) for heuristic in Heuristic}
+        for size in range(len(Heuristic) + 1):
+            for subset in combinations(list(Heuristic), size):
+                heuristics = Heuristics(list(subset))
+                for board in boards:
+                    for player_color in chess.COLORS:
+                        expected = sum(single[heuristic].return_heuristic_value(board, player_color) for heuristic in subset)
+                        assert heuristics.return_heuristic_value(board, player_color) == expected
+
+    def test_plan_only_holds_the_features_of_the_set(self) -> None:
+        plan = Heuristics([Heuristic.Maximize_Number_Of_Pieces])._Heuristics__plans[PLAYER_WHITE]
+        assert plan == EvaluationPlan(material=1, advancement=(), chain=0, risk=0, side=0, stacked=0)
+        plan = Heuristics([Heuristic.Piece_Could_Be_Captured, Heuristic.Distance_From_Starting_Location,
+            Heuristic.Piece_Could_Be_Captured])._Heuristics__plans[PLAYER_BLACK]
+        assert (plan.material, plan.chain, plan.risk) == (0, 0, -40)
+        assert [weight for _, weight in plan.advancement] == [5, 10, 20]
+
+    def test_terms_of_a_small_position(self) -> None:
+        # White: b2, c3, d3, d4; black: e5
+        board = AIChessBoard('8/8/8/4p3/3P4/2PP4/1P6/8')
+        assert Heuristics([Heuristic.Keep_Pawns_Diagonally_Supported]).return_heuristic_value(board, PLAYER_WHITE) == 2
+        assert Heuristics([Heuristic.Side_By_Side_Pawns]).return_heuristic_value(board, PLAYER_WHITE) == 2
+        assert Heuristics([Heuristic.Stacked_Pawns]).return_heuristic_value(board, PLAYER_WHITE) == -1
+        assert Heuristics([Heuristic.Piece_Could_Be_Captured]).return_heuristic_value(board, PLAYER_WHITE) == -20
+        assert Heuristics([Heuristic.Piece_Could_Be_Captured]).return_heuristic_value(board, PLAYER_BLACK) == -20
+        assert Heuristics([Heuristic.Distance_From_Starting_Location]).return_heuristic_value(board, PLAYER_WHITE) == (0 + 1 + 1 + 2) * 5
+        assert Heuristics([Heuristic.Distance_From_Starting_Location]).return_heuristic_value(board, PLAYER_BLACK) == 2 * 5
+
+    @pytest.mark.parametrize("list_of_heuristics", [list(Heuristic), [Heuristic.Side_By_Side_Pawns, Heuristic.Piece_Could_Be_Captured], []])
+    def test_batch_evaluation_matches_one_position_at_a_time(self, list_of_heuristics: list) -> None:
+        generator = random.Random(13)
+        heuristics = Heuristics(list_of_heuristics)
+        boards = [random_board(generator) for _ in range(500)]
+        # Pawn boards have no other piece to promote to than a queen
+        boards = [PawnBoard.from_board(board) for board in boards]
+        white = np.array([board.white for board in boards], dtype=np.uint64)
+        black = np.array([board.black for board in boards], dtype=np.uint64)
+        for player_color in chess.COLORS:
+            expected = [heuristics.return_heuristic_value(board, player_color) for board in boards]
+            assert heuristics.evaluate_batch(white, black, player_color).tolist() == expected
+
+
+    def test_rank_pattern_tables_count_the_pairs_of_the_bitboard_terms(self) -> None:
+        # On any bitboard, back ranks and all
+        generator = random.Random(17)
+        heuristics = Heuristics([])
+        tables = rank_pattern_tables()
+        for _ in range(1000):
+            pieces = generator.getrandbits(64) & generator.getrandbits(64)
+            rank_pairs = [pieces >> shift & 0xffff for shift in range(0, 56, 8)]
+            assert sum(int(tables['diagonal'][pair]) for pair in rank_pairs) == heuristics.pawn_chain_support(pieces)
+            assert sum(int(tables['stacked'][pair]) for pair in rank_pairs) == heuristics.number_of_stacked_pawns(pieces)
+            assert sum(int(tables['side'][pieces >> shift & 0xff]) for shift in range(0, 64, 8)) == \
+                heuristics.pawn_side_by_side_support(pieces)
+
+    @pytest.mark.parametrize("weights", [(1, 2, -1), (0, 2, 0), (3, 0, -2)])
+    def test_rank_pattern_structure_matches_the_bitboard_terms(self, weights: tuple) -> None:
+        generator = random.Random(19)
+        heuristics = Heuristics([])
+        pieces = [generator.getrandbits(64) & generator.getrandbits(64) for _ in range(500)]
+        expected = [weights[0] * heuristics.pawn_chain_support(bitboard) + weights[1] * heuristics.pawn_side_by_side_support(bitboard) + \
+            weights[2] * heuristics.number_of_stacked_pawns(bitboard) for bitboard in pieces]
+        assert rank_pattern_structure(np.array(pieces, dtype=np.uint64), weights).tolist() == expected
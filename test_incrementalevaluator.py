@@ -0,0 +1,81 @@
+from aichessboard import AIChessBoard
+import chess
+from chess import Move
+from heuristics import Heuristic, Heuristics
+from incrementalevaluator import IncrementalEvaluator
+from minimaxchessplayer import MinimaxPlayer, ALPHA_DEFAULT, BETA_DEFAULT
+import numpy as np
+from pawnboard import PawnBoard
+import pytest
+import random
+import time
+
+STARTING_BOARD = '8/pppppppp/8/8/8/8/PPPPPPPP/8'
+
+
+class TestIncrementalEvaluator:
+    @pytest.mark.parametrize("pawn_board", [False, True])
+    def test_counts_follow_random_games_and_take_backs(self, pawn_board: bool) -> None:
+        # Every push and pop is checked against a full evaluation in verify mode
+        generator = random.Random(5)
+        evaluator = IncrementalEvaluator(Heuristics(list(Heuristic)), verify=True)
+        for _ in range(30):
+            board = AIChessBoard(STARTING_BOARD)
+            board = PawnBoard.from_board(board) if pawn_board else board
+            while board.outcome() is None and list(board.legal_moves):
+                moves = list(board.legal_moves)
+                evaluator.push(board, generator.choice(moves))
+                if generator.random() < 0.3:
+                    evaluator.pop(board)
+                    evaluator.push(board, generator.choice(moves))
+                for color in chess.COLORS:
+                    evaluator.value(board, color)
+            assert evaluator.updates > 0
+
+    def test_captures_en_passant_and_promotions_are_counted(self) -> None:
+        evaluator = IncrementalEvaluator(Heuristics(list(Heuristic)), verify=True)
+        board = AIChessBoard('8/1p6/8/P7/8/4p3/3P1P2/8 b - - 0 1')
+        for uci in ['b7b5', 'a5b6', 'e3d2']:
+            evaluator.push(board, Move.from_uci(uci))
+        board = AIChessBoard('8/1P6/8/8/8/8/6p1/8 w - - 0 1')
+        for promotion in [chess.QUEEN, chess.KNIGHT]:
+            evaluator.push(board, Move(chess.B7, chess.B8, promotion=promotion))
+            assert evaluator.value(board, chess.WHITE) == Heuristics(list(Heuristic)).return_heuristic_value(board, chess.WHITE)
+            evaluator.pop(board)
+
+    def test_value_of_an_unknown_board_is_counted_from_scratch(self) -> None:
+        heuristics = Heuristics(list(Heuristic))
+        evaluator = IncrementalEvaluator(heuristics)
+        board = AIChessBoard('8/1p1p4/2P5/8/8/5p2/1P1P4/8')
+        evaluator.value(board, chess.WHITE)
+        board.push_uci('c6d7')
+        assert evaluator.value(board, chess.BLACK) == heuristics.return_heuristic_value(board, chess.BLACK)
+        assert evaluator.recomputations == 2
+
+    def test_mismatch_is_reported_in_verify_mode(self) -> None:
+        evaluator = IncrementalEvaluator(Heuristics(list(Heuristic)), verify=True)
+        board = AIChessBoard(STARTING_BOARD)
+        evaluator.reset(board)
+        evaluator._IncrementalEvaluator__state = tuple(count + 1 for count in evaluator._IncrementalEvaluator__state)
+        with pytest.raises(IncrementalEvaluator.EvaluationMismatch):
+            evaluator.value(board, chess.WHITE)
+
+    @pytest.mark.parametrize("run_alpha_beta,quiescence", [(False, False), (True, False), (True, True)])
+    def test_search_scores_are_unchanged(self, run_alpha_beta: bool, quiescence: bool) -> None:
+        board = AIChessBoard('8/pp4pp/8/2pP4/8/8/PP4PP/8')
+        scores = []
+        for incremental_evaluation in [False, True]:
+            player = MinimaxPlayer(time, depth=2, heuristics=list(Heuristic), run_alpha_beta=run_alpha_beta, quiescence=quiescence,
+                incremental_evaluation=incremental_evaluation, verify_evaluation=incremental_evaluation)
+            scores.append(player.negamax(board=board.copy(), depth=3, alpha=ALPHA_DEFAULT, beta=BETA_DEFAULT, maximizer=board.turn)[0])
+        assert scores[0] == scores[1]
+
+    def test_push_pop_search_uses_the_evaluator(self) -> None:
+        board = AIChessBoard('8/1p1p4/8/8/8/5p2/1P1P4/8')
+        board.turn = chess.BLACK
+        player = MinimaxPlayer(time, depth=2, heuristics=list(Heuristic), run_alpha_beta=False,
+            incremental_evaluation=True, verify_evaluation=True)
+        reward, _ = player.push_pop_search(board=board.copy(), depth=3, maximizer=board.turn)
+        reference = MinimaxPlayer(time, depth=2, heuristics=list(Heuristic), run_alpha_beta=False)
+        assert reward == reference.push_pop_search(board=board.copy(), depth=3, maximizer=board.turn)[0]
+        assert player.evaluator.updates > 0 and player.evaluator.recomputations == 1
@@ -0,0 +1,72 @@
+from aichess import AIChess
+from aichessboard import AIChessBoard
+import chess
+from chess import Move
+from heuristics import Heuristic
+from mctschessplayer import MCTSPlayer, random_playouts
+from minimaxchessplayer import MinimaxPlayer
+import numpy as np
+from pawnboard import PawnBoard
+import pytest
+from randomchessplayer import RandomChessPlayer
+import time
+
+STARTING_BOARD = '8/pppppppp/8/8/8/8/PPPPPPPP/8'
+
+
+class TestMCTSChessPlayer:
+    @pytest.mark.parametrize("fen,result", [
+        # The only move promotes
+        ('8/P7/8/8/8/8/7p/8 w - - 0 1', 1),
+        ('8/P7/8/8/8/8/7p/8 b - - 0 1', -1),
+        # White is blocked and has no moves
+        ('8/8/8/8/8/p7/P7/8 w - - 0 1', 0)
+    ])
+    def test_playouts_of_forced_positions(self, fen: str, result: int) -> None:
+        board = PawnBoard.from_fen(fen)
+        assert np.all(random_playouts(board.white, board.black, board.turn, 16) == result)
+
+    def test_playouts_only_make_legal_moves(self) -> None:
+        # Every finished playout has exactly one promoted pawn or no moves for the side to move
+        np.random.seed(0)
+        board = PawnBoard.from_fen(STARTING_BOARD)
+        results = random_playouts(board.white, board.black, board.turn, 200)
+        assert set(results.tolist()) <= {-1, 0, 1}
+        assert np.count_nonzero(results == 1) > 50 and np.count_nonzero(results == -1) > 50
+
+    def test_player_takes_an_immediate_win(self) -> None:
+        np.random.seed(1)
+        board = AIChessBoard('8/1P6/8/8/8/8/4P1p1/8 w - - 0 1')
+        player = MCTSPlayer(time, iterations=50)
+        assert player.get_next_move(board) == Move.from_uci('b7b8q')
+
+    def test_player_blocks_a_losing_race(self) -> None:
+        # Black promotes in two moves unless white captures on b3 at once
+        np.random.seed(2)
+        board = AIChessBoard('8/8/8/8/8/1p6/P6P/8 w - - 0 1')
+        player = MCTSPlayer(time, iterations=300)
+        assert player.get_next_move(board) == Move.from_uci('a2b3')
+
+    def test_subtree_is_reused_after_the_opponent_moves(self) -> None:
+        np.random.seed(3)
+        board = AIChessBoard(STARTING_BOARD)
+        player = MCTSPlayer(time, iterations=100)
+        board.push(player.get_next_move(board))
+        board.push(player.root.children[0].move)
+        player.get_next_move(board)
+        assert player.reused_visits > 0
+        assert player.root.parent is None
+
+    def test_time_budget_is_respected(self) -> None:
+        player = MCTSPlayer(time, time_budget=0.05)
+        start = time.perf_counter()
+        player.get_next_move(AIChessBoard(STARTING_BOARD))
+        assert time.perf_counter() - start < 0.5
+        assert player.iterations_searched > 0 and player.playouts_per_second > 0
+
+    def test_player_runs_in_tournaments(self) -> None:
+        baselines = [RandomChessPlayer(time), MinimaxPlayer(time, depth=1, heuristics=[Heuristic.Maximize_Number_Of_Pieces], run_alpha_beta=True)]
+        results = AIChess(iterations=2, baselines=baselines, testplayers=[MCTSPlayer(time, iterations=20)]).run()
+        assert len(results) == 2
+        for results_per_baseline in results:
+            assert results_per_baseline[0].average_decision_time_player1 > 0
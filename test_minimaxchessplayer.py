@@ -3,12 +3,14 @@ import chess
 from chess import Move
 from chessplayer import ChessPlayer
 from heuristics import Heuristic, Heuristics
-from minimaxchessplayer import MinimaxPlayer, Node, ALPHA_DEFAULT, BETA_DEFAULT
+import minimaxchessplayer
+from minimaxchessplayer import MinimaxPlayer, Node, WinReward, ALPHA_DEFAULT, BETA_DEFAULT
 import numpy as np
 import pytest
 import time
 
 WINNING_BOARD_FOR_WHITE = 'P7/1ppppppp/8/8/8/8/1PPPPPPP/8'
+WHITE_WINS_WITH_ANY_PAWN_ON_C6 = {Move.from_uci('c6d7'), Move.from_uci('c6b7'), Move.from_uci('c6c7')}
 WINNING_BOARD_FOR_BLACK = '8/1ppppppp/8/8/8/8/1PPPPPPP/p7'
 NOT_WINNING_BOARD = '8/1ppppppp/8/8/8/8/1PPPPPPP/8'
 
@@ -129,9 +131,9 @@ class TestMinimaxChessPlayer:
         )
 
         if player_wins:
-            assert result_reward == 10
+            assert result_reward == WinReward.WIN.value
         elif player_loses:
-            assert result_reward == -10
+            assert result_reward == WinReward.LOSS.value
         elif max_depth_reached:
             assert result_reward == 0
         else:
@@ -333,3 +335,181 @@ class TestMinimaxChessPlayer:
         )
         is_pruned = alphabetaplayer.alpha_beta_pruning(max_player=chess.BLACK, child=None, current=current)
         assert is_pruned == True
+
+    def test_push_pop_search_returns_best_move(self) -> None:
+        board = AIChessBoard('8/1p1p4/8/8/8/5p2/1P1P4/8')
+        board.turn = chess.BLACK
+        minimaxplayer = MinimaxPlayer(time, depth=3, heuristics=[], run_alpha_beta=False)
+        assert minimaxplayer.get_next_move(board=board) == Move.from_uci('f3f2')
+
+    def test_push_pop_search_returns_best_move_when_turn_is_white(self) -> None:
+        board = AIChessBoard('8/1p1p4/2P5/8/8/5p2/1P1P4/8')
+        minimaxplayer = MinimaxPlayer(time, depth=3, heuristics=[], run_alpha_beta=False)
+        assert minimaxplayer.get_next_move(board=board) == Move.from_uci('c6d7')
+
+    def test_search_leaves_the_board_unchanged(self) -> None:
+        board = AIChessBoard('8/pppppppp/8/8/8/8/PPPPPPPP/8')
+        board.push_uci('e2e4')
+        fen = board.fen()
+        minimaxplayer = MinimaxPlayer(time, depth=2, heuristics=list(Heuristic), run_alpha_beta=True)
+        minimaxplayer.get_next_move(board=board)
+        assert board.fen() == fen and len(board.move_stack) == 1
+
+    @pytest.mark.parametrize("run_alpha_beta", [False, True])
+    def test_default_search_creates_no_nodes(self, run_alpha_beta: bool, monkeypatch) -> None:
+        def no_node(*args, **kwargs) -> Node:
+            raise AssertionError("a Node was created")
+        monkeypatch.setattr(minimaxchessplayer, 'Node', no_node)
+        board = AIChessBoard('8/1p1p4/8/8/8/5p2/1P1P4/8')
+        board.turn = chess.BLACK
+        minimaxplayer = MinimaxPlayer(time, depth=3, heuristics=[], run_alpha_beta=run_alpha_beta)
+        assert minimaxplayer.min_max(board=board, depth=3) == Move.from_uci('f3f2')
+        assert minimaxplayer.search_tree is None
+
+    @pytest.mark.parametrize("board_fen,turn", [
+        ('8/pppppppp/8/8/8/8/PPPPPPPP/8', chess.WHITE),
+        ('8/pp4pp/8/2pP4/8/8/PP4PP/8', chess.WHITE),
+        ('8/1p1p4/8/8/8/5p2/1P1P4/8', chess.BLACK),
+        ('8/1P1p2p1/8/8/3pP3/8/8/8', chess.BLACK)
+    ])
+    def test_batched_leaves_give_the_same_rewards(self, board_fen: str, turn: chess.Color, monkeypatch) -> None:
+        board = AIChessBoard(board_fen)
+        board.turn = turn
+        board.ep_square = chess.E3 if board_fen == '8/1P1p2p1/8/8/3pP3/8/8/8' else None
+        minimaxplayer = MinimaxPlayer(time, depth=1, heuristics=list(Heuristic), run_alpha_beta=False)
+        moves = list(board.legal_moves)
+        expected = []
+        for move in moves:
+            board.push(move)
+            expected.append(minimaxplayer.terminal_reward(board=board, depth=0, maximizer=chess.WHITE, ply=1))
+            board.pop()
+        assert minimaxplayer.leaf_rewards(board=board, moves=moves, maximizer=chess.WHITE) == expected
+        monkeypatch.setattr(minimaxchessplayer, 'BATCH_MIN_LEAVES', 1)
+        batched_reward, _ = minimaxplayer.push_pop_search(board=board.copy(), depth=3, maximizer=turn)
+        monkeypatch.setattr(minimaxchessplayer, 'BATCH_MIN_LEAVES', 10 ** 6)
+        assert batched_reward == minimaxplayer.push_pop_search(board=board.copy(), depth=3, maximizer=turn)[0]
+
+    @pytest.mark.parametrize('depth', [1, 2, 3])
+    @pytest.mark.parametrize('run_alpha_beta', [False, True])
+    @pytest.mark.parametrize('trace', [False, True])
+    def test_promotion_in_one_is_played_with_every_heuristic(self, depth: int, run_alpha_beta: bool, trace: bool) -> None:
+        # Every move wins in two plies here, so only a quicker win scoring higher picks the promotion
+        board = AIChessBoard('8/P5pp/8/8/8/8/1PPP4/8 w - - 0 1')
+        minimaxplayer = MinimaxPlayer(time, depth=depth, heuristics=list(Heuristic), run_alpha_beta=run_alpha_beta, trace=trace)
+        move = minimaxplayer.min_max(board=board, depth=depth)
+        assert move.from_square == chess.A7 and move.to_square == chess.A8
+
+    def test_trace_keeps_the_search_tree(self) -> None:
+        board = AIChessBoard('8/1p1p4/2P5/8/8/5p2/1P1P4/8')
+        minimaxplayer = MinimaxPlayer(time, depth=1, heuristics=[], run_alpha_beta=False, trace=True)
+        move = minimaxplayer.min_max(board=board, depth=1)
+        root = minimaxplayer.search_tree
+        assert root.best_move_from_board == move
+        assert {child.move_that_generated_this_board for child in root.children} == set(board.legal_moves)
+        assert all(child.parent is root for child in root.children)
+        assert max(root.children).reward_if_taking_best_move == root.reward_if_taking_best_move
+
+    @pytest.mark.parametrize("run_alpha_beta", [False, True])
+    @pytest.mark.parametrize("board_fen,turn", [
+        ('8/1p1p4/2P5/8/8/5p2/1P1P4/8', chess.WHITE),
+        ('8/1p1p4/8/8/8/5p2/1P1P4/8', chess.BLACK),
+        ('8/ppp5/8/8/8/8/PPP5/8', chess.WHITE),
+        ('8/pp4pp/8/8/8/8/PP4PP/8', chess.BLACK)
+    ])
+    def test_push_pop_search_returns_the_same_root_score_as_pre_order(self, run_alpha_beta: bool, board_fen: str, turn: chess.Color) -> None:
+        board = AIChessBoard(board_fen)
+        board.turn = turn
+        minimaxplayer = MinimaxPlayer(
+            time,
+            depth=3,
+            heuristics=[Heuristic.Maximize_Number_Of_Pieces, Heuristic.Distance_From_Starting_Location],
+            run_alpha_beta=run_alpha_beta
+        )
+        root = Node(0, board, None, None, None, ALPHA_DEFAULT, BETA_DEFAULT, None)
+        tree_reward = minimaxplayer.pre_order(root_board=board, current=root, depth=minimaxplayer.depth + 1).reward_if_taking_best_move
+        push_pop_reward, _ = minimaxplayer.push_pop_search(board=board, depth=minimaxplayer.depth + 1, maximizer=turn)
+        assert push_pop_reward == tree_reward
+
+    @pytest.mark.parametrize("board_fen,turn", [
+        (WINNING_BOARD_FOR_WHITE, chess.BLACK),
+        (WINNING_BOARD_FOR_BLACK, chess.WHITE),
+        (NOT_WINNING_BOARD, chess.WHITE),
+        (NOT_WINNING_BOARD, chess.BLACK),
+        ('8/1p1p4/8/8/8/5p2/1P1P4/8', chess.BLACK),
+        ('8/1p1p4/2P5/8/8/5p2/1P1P4/8', chess.WHITE),
+        ('8/1p1p4/1P1P4/8/8/8/8/8', chess.WHITE)
+    ])
+    @pytest.mark.parametrize("depth", [1, 2])
+    @pytest.mark.parametrize("heuristics", [[], list(Heuristic)])
+    def test_negamax_returns_the_same_root_score_as_minimax(self, board_fen: str, turn: chess.Color, depth: int, heuristics: list) -> None:
+        board = AIChessBoard(board_fen)
+        board.turn = turn
+        minimaxplayer = MinimaxPlayer(time, depth=depth, heuristics=heuristics, run_alpha_beta=False)
+        root = Node(0, board, None, None, None, ALPHA_DEFAULT, BETA_DEFAULT, None)
+        minimax_reward = minimaxplayer.pre_order(root_board=board, current=root, depth=depth + 1).reward_if_taking_best_move
+        negamax_reward, _ = minimaxplayer.negamax(board=board, depth=depth + 1, alpha=ALPHA_DEFAULT, beta=BETA_DEFAULT, maximizer=turn)
+        assert negamax_reward == minimax_reward
+
+    def test_negamax_returns_a_best_move_with_alpha_beta_pruning(self) -> None:
+        board = AIChessBoard('8/1p1p4/2P5/8/8/5p2/1P1P4/8')
+        alphabetaplayer = MinimaxPlayer(time, depth=3, heuristics=[], run_alpha_beta=True)
+        assert alphabetaplayer.get_next_move(board=board) in WHITE_WINS_WITH_ANY_PAWN_ON_C6
+        board.turn = chess.BLACK
+        assert alphabetaplayer.get_next_move(board=board) == Move.from_uci('f3f2')
+
+    def test_negamax_breaks_ties_randomly(self) -> None:
+        board = AIChessBoard('8/1p1p4/2P5/8/8/5p2/1P1P4/8')
+        alphabetaplayer = MinimaxPlayer(time, depth=3, heuristics=[], run_alpha_beta=True)
+        moves = {alphabetaplayer.get_next_move(board=board) for _ in range(30)}
+        assert moves == WHITE_WINS_WITH_ANY_PAWN_ON_C6
+
+    def test_iterative_deepening_finds_the_same_move_as_a_fixed_depth_search(self) -> None:
+        board = AIChessBoard('8/1p1p4/8/8/8/5p2/1P1P4/8')
+        board.turn = chess.BLACK
+        minimaxplayer = MinimaxPlayer(time, depth=3, heuristics=[], run_alpha_beta=True, node_budget=10 ** 6)
+        assert minimaxplayer.get_next_move(board=board) == Move.from_uci('f3f2')
+        assert minimaxplayer.completed_depth == 4
+        assert minimaxplayer.principal_variation[0] == Move.from_uci('f3f2')
+
+    @pytest.mark.parametrize("run_alpha_beta", [False, True])
+    def test_iterative_deepening_stops_when_the_node_budget_runs_out(self, run_alpha_beta: bool) -> None:
+        board = AIChessBoard('8/pppppppp/8/8/8/8/PPPPPPPP/8')
+        minimaxplayer = MinimaxPlayer(time, depth=10, heuristics=[Heuristic.Distance_From_Starting_Location],
+            run_alpha_beta=run_alpha_beta, node_budget=500)
+        move = minimaxplayer.get_next_move(board=board)
+        assert move in board.legal_moves
+        assert 1 <= minimaxplayer.completed_depth < 11
+        assert minimaxplayer.principal_variation[0] == move
+
+    def test_iterative_deepening_stops_when_the_time_budget_runs_out(self) -> None:
+        board = AIChessBoard('8/pppppppp/8/8/8/8/PPPPPPPP/8')
+        minimaxplayer = MinimaxPlayer(time, depth=20, heuristics=list(Heuristic), run_alpha_beta=True, time_budget=0.2)
+        start = time.perf_counter()
+        move = minimaxplayer.get_next_move(board=board)
+        assert time.perf_counter() - start < 2
+        assert move in board.legal_moves
+        assert 1 <= minimaxplayer.completed_depth < 21
+
+    @pytest.mark.parametrize("board_fen", [
+        '8/p7/5p2/4p3/3P4/8/P7/8',
+        '8/pp6/5p2/4p3/3P4/2P5/PP6/8',
+        '8/p7/8/1p2p3/P2P4/8/5P2/8'
+    ])
+    def test_quiescence_sees_recaptures_past_the_horizon(self, board_fen: str) -> None:
+        scores = {}
+        for quiescence, depth in [(False, 0), (True, 0), (False, 2)]:
+            board = AIChessBoard(board_fen)
+            minimaxplayer = MinimaxPlayer(time, depth=depth, heuristics=[Heuristic.Maximize_Number_Of_Pieces],
+                run_alpha_beta=True, quiescence=quiescence)
+            scores[quiescence, depth], _ = minimaxplayer.negamax(board=board, depth=depth + 1, alpha=ALPHA_DEFAULT,
+                beta=BETA_DEFAULT, maximizer=board.turn)
+        assert scores[True, 0] == scores[False, 2]
+        assert scores[False, 0] > scores[False, 2]
+
+    def test_quiescence_stops_at_its_node_limit(self) -> None:
+        board = AIChessBoard('8/pp6/5p2/4p3/3P4/2P5/PP6/8')
+        minimaxplayer = MinimaxPlayer(time, depth=0, heuristics=[Heuristic.Maximize_Number_Of_Pieces],
+            run_alpha_beta=True, quiescence=True, quiescence_node_limit=1)
+        score, _ = minimaxplayer.negamax(board=board, depth=1, alpha=ALPHA_DEFAULT, beta=BETA_DEFAULT, maximizer=board.turn)
+        assert score == 1
+        assert minimaxplayer.quiescence_nodes == len(list(board.legal_moves))
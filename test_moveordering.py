@@ -0,0 +1,95 @@
+from aichessboard import AIChessBoard
+import chess
+from chess import Move
+from heuristics import Heuristic
+from minimaxchessplayer import MinimaxPlayer, ALPHA_DEFAULT, BETA_DEFAULT
+from moveordering import MoveOrderer, MoveOrdering
+import pytest
+import time
+
+# White can capture on e5, where the pawn on f7 still guards its path, or on b5, which creates a passed pawn
+CAPTURES_BOARD = '8/5p2/8/1p2p3/P2P4/8/5P2/8'
+
+
+class TestMoveOrdering:
+    def test_no_orderings_keeps_the_generated_order(self) -> None:
+        board = AIChessBoard(CAPTURES_BOARD)
+        moves = list(board.legal_moves)
+        assert MoveOrderer([]).order(board=board, moves=moves, ply=0) == moves
+
+    def test_hash_move_is_searched_first(self) -> None:
+        board = AIChessBoard(CAPTURES_BOARD)
+        hash_move = Move.from_uci('f2f3')
+        ordered = MoveOrderer(list(MoveOrdering)).order(board=board, moves=list(board.legal_moves), ply=0, hash_move=hash_move)
+        assert ordered[0] == hash_move
+
+    def test_captures_creating_passed_pawns_come_before_other_captures(self) -> None:
+        board = AIChessBoard(CAPTURES_BOARD)
+        ordered = MoveOrderer([MoveOrdering.Captures]).order(board=board, moves=list(board.legal_moves), ply=0)
+        assert list(board.legal_moves)[:2] == [Move.from_uci('d4e5'), Move.from_uci('a4b5')]
+        assert ordered[:2] == [Move.from_uci('a4b5'), Move.from_uci('d4e5')]
+
+    def test_pushes_closer_to_promotion_come_first(self) -> None:
+        board = AIChessBoard('8/8/1P6/8/8/8/6P1/8')
+        ordered = MoveOrderer([MoveOrdering.Pushes_Toward_Promotion]).order(board=board, moves=list(board.legal_moves), ply=0)
+        assert ordered[0] == Move.from_uci('b6b7')
+        assert ordered[-1] == Move.from_uci('g2g3')
+
+    def test_promotions_come_before_captures(self) -> None:
+        board = AIChessBoard('8/P7/8/8/8/1p6/P7/8')
+        ordered = MoveOrderer(list(MoveOrdering)).order(board=board, moves=list(board.legal_moves), ply=0)
+        assert ordered[0].promotion is not None
+
+    def test_killer_moves_are_remembered_per_ply(self) -> None:
+        board = AIChessBoard(CAPTURES_BOARD)
+        orderer = MoveOrderer([MoveOrdering.Killer_Moves])
+        killer = Move.from_uci('f2f4')
+        orderer.record_cutoff(board=board, move=killer, ply=2, depth=1, move_index=3)
+        assert orderer.order(board=board, moves=list(board.legal_moves), ply=2)[0] == killer
+        assert orderer.order(board=board, moves=list(board.legal_moves), ply=1)[0] != killer
+        orderer.new_search()
+        assert orderer.order(board=board, moves=list(board.legal_moves), ply=2)[0] != killer
+
+    def test_history_prefers_moves_that_caused_cutoffs(self) -> None:
+        board = AIChessBoard(CAPTURES_BOARD)
+        orderer = MoveOrderer([MoveOrdering.History_Heuristic])
+        orderer.record_cutoff(board=board, move=Move.from_uci('f2f3'), ply=5, depth=3, move_index=1)
+        assert orderer.order(board=board, moves=list(board.legal_moves), ply=0)[0] == Move.from_uci('f2f3')
+
+    def test_first_move_cutoff_rate(self) -> None:
+        board = AIChessBoard(CAPTURES_BOARD)
+        orderer = MoveOrderer([])
+        for move_index in [0, 0, 0, 2]:
+            orderer.record_cutoff(board=board, move=Move.from_uci('d4e5'), ply=0, depth=1, move_index=move_index)
+        assert orderer.first_move_cutoff_rate() == 0.75
+
+    @pytest.mark.parametrize("board_fen,turn", [
+        ('8/pppppppp/8/8/8/8/PPPPPPPP/8', chess.WHITE),
+        (CAPTURES_BOARD, chess.WHITE),
+        (CAPTURES_BOARD, chess.BLACK),
+        ('8/1p1p4/2P5/8/8/5p2/1P1P4/8', chess.WHITE)
+    ])
+    def test_ordering_does_not_change_the_root_score(self, board_fen: str, turn: chess.Color) -> None:
+        scores = []
+        for move_ordering in [[], list(MoveOrdering)]:
+            board = AIChessBoard(board_fen)
+            board.turn = turn
+            minimaxplayer = MinimaxPlayer(
+                time,
+                depth=2,
+                heuristics=[Heuristic.Maximize_Number_Of_Pieces, Heuristic.Distance_From_Starting_Location],
+                run_alpha_beta=True,
+                transposition_table_mb=1,
+                move_ordering=move_ordering
+            )
+            score, _ = minimaxplayer.negamax(board=board, depth=3, alpha=ALPHA_DEFAULT, beta=BETA_DEFAULT, maximizer=turn)
+            scores.append(score)
+            assert minimaxplayer.move_orderer.cutoffs > 0
+        assert scores[0] == scores[1]
+
+    def test_players_without_orderings_do_not_share_a_list(self) -> None:
+        player = MinimaxPlayer(time, depth=2, heuristics=[], run_alpha_beta=True)
+        player.move_orderer.list_of_orderings.append(MoveOrdering.Captures)
+        other_player = MinimaxPlayer(time, depth=2, heuristics=[], run_alpha_beta=True)
+        assert other_player.move_orderer.list_of_orderings == []
+        assert other_player.get_config()['move_ordering'] == []
@@ -0,0 +1,72 @@
+from aichessboard import AIChessBoard
+import chess
+from chess import Move
+from heuristics import Heuristic
+from minimaxchessplayer import MinimaxPlayer
+import numpy as np
+import openingbook
+from openingbook import OpeningBook, STARTING_BOARD
+import pytest
+import time
+
+HEURISTICS = [Heuristic.Maximize_Number_Of_Pieces, Heuristic.Distance_From_Starting_Location]
+
+
+@pytest.fixture(scope="module")
+def book_path(tmp_path_factory) -> str:
+    path = str(tmp_path_factory.mktemp("book") / "pawns.book")
+    searcher = MinimaxPlayer(time, depth=1, heuristics=HEURISTICS, run_alpha_beta=True, transposition_table_mb=1)
+    assert openingbook.build(path, searcher, plies=2, depth=1) == 9
+    return path
+
+
+class TestOpeningBook:
+    def test_book_is_sorted_by_position_hash(self, book_path: str) -> None:
+        book = OpeningBook(book_path)
+        assert len(book) > 0
+        assert np.all(np.diff(book.records['key'].astype(np.float64)) >= 0)
+
+    def test_book_moves_are_legal_and_within_the_margin(self, book_path: str) -> None:
+        book = OpeningBook(book_path)
+        board = AIChessBoard(STARTING_BOARD)
+        board.push_uci('a2a4')
+        moves = book.moves(board)
+        assert moves
+        best_score = max(score for _, score in moves)
+        for move, score in moves:
+            assert move in board.legal_moves
+            assert score >= best_score - openingbook.BOOK_MARGIN
+
+    def test_scores_match_the_search(self) -> None:
+        board = AIChessBoard('8/1p1p4/2P5/8/8/5p2/1P1P4/8')
+        searcher = MinimaxPlayer(time, depth=2, heuristics=HEURISTICS, run_alpha_beta=True)
+        scored_moves = openingbook.score_moves(searcher, board, depth=2)
+        best_score, _ = searcher.negamax(board=board.copy(), depth=3, alpha=-np.inf, beta=np.inf, maximizer=board.turn)
+        assert max(score for _, score in scored_moves) == best_score
+
+    def test_choice_is_weighted_by_score(self, book_path: str) -> None:
+        board = AIChessBoard(STARTING_BOARD)
+        np.random.seed(3)
+        varied = OpeningBook(book_path)
+        assert len({varied.choose(board) for _ in range(50)}) > 1
+        greedy = OpeningBook(book_path, temperature=1e-6)
+        best_score = max(score for _, score in greedy.moves(board))
+        best_moves = {move for move, score in greedy.moves(board) if score == best_score}
+        assert all(greedy.choose(board) in best_moves for _ in range(20))
+        assert greedy.hits == greedy.probes == 20
+
+    def test_position_out_of_book_has_no_move(self, book_path: str) -> None:
+        book = OpeningBook(book_path)
+        assert book.choose(AIChessBoard('8/1p1p4/2P5/8/8/5p2/1P1P4/8')) is None
+        assert book.hits == 0 and book.probes == 1
+
+    def test_player_plays_book_moves_without_searching(self, book_path: str) -> None:
+        board = AIChessBoard(STARTING_BOARD)
+        player = MinimaxPlayer(time, depth=3, heuristics=HEURISTICS, run_alpha_beta=True, transposition_table_mb=1, opening_book=book_path)
+        move = player.min_max(board=board, depth=3)
+        assert move in {book_move for book_move, _ in player.opening_book.moves(board)}
+        assert player.opening_book.hits == 1
+        assert player.transposition_table.stores == 0
+        out_of_book = AIChessBoard('8/1p1p4/2P5/8/8/5p2/1P1P4/8')
+        assert player.min_max(board=out_of_book, depth=3) in out_of_book.legal_moves
+        assert player.transposition_table.stores > 0
@@ -0,0 +1,97 @@
+from aichessboard import AIChessBoard
+import chess
+from heuristics import Heuristic
+from minimaxchessplayer import MinimaxPlayer, ALPHA_DEFAULT, BETA_DEFAULT
+import numpy as np
+from parallelsearch import ParallelSearch
+import pickle
+import pytest
+import time
+from transpositiontable import Bound
+
+HEURISTICS = [Heuristic.Maximize_Number_Of_Pieces, Heuristic.Distance_From_Starting_Location]
+MIDDLE_GAME_BOARD = '8/1p1p4/2P5/8/8/5p2/1P1P4/8'
+
+
+def serial_score(board: AIChessBoard, depth: int, run_alpha_beta: bool) -> float:
+    player = MinimaxPlayer(time, depth=depth, heuristics=HEURISTICS, run_alpha_beta=run_alpha_beta)
+    score, _ = player.negamax(board=board.copy(), depth=depth + 1, alpha=ALPHA_DEFAULT, beta=BETA_DEFAULT, maximizer=board.turn)
+    return score
+
+
+class TestParallelSearch:
+    @pytest.mark.parametrize("run_alpha_beta", [False, True])
+    @pytest.mark.parametrize("board_fen,turn", [
+        (MIDDLE_GAME_BOARD, chess.WHITE),
+        ('8/1p1p4/8/8/8/5p2/1P1P4/8', chess.BLACK),
+        ('8/ppp5/8/8/8/8/PPP5/8', chess.WHITE)
+    ])
+    def test_root_splitting_returns_the_serial_root_score(self, run_alpha_beta: bool, board_fen: str, turn: chess.Color) -> None:
+        board = AIChessBoard(board_fen)
+        board.turn = turn
+        player = MinimaxPlayer(time, depth=2, heuristics=HEURISTICS, run_alpha_beta=run_alpha_beta,
+            transposition_table_mb=1, workers=2)
+        search = ParallelSearch(player=player, workers=2, lazy_smp=False)
+        try:
+            score, move = search.search(board=board, depth=3)
+        finally:
+            search.close()
+        assert score == serial_score(board=board, depth=2, run_alpha_beta=run_alpha_beta)
+        assert move in board.legal_moves
+
+    def test_lazy_smp_workers_share_one_table(self) -> None:
+        board = AIChessBoard(MIDDLE_GAME_BOARD)
+        player = MinimaxPlayer(time, depth=2, heuristics=HEURISTICS, run_alpha_beta=True, workers=2, lazy_smp=True)
+        search = ParallelSearch(player=player, workers=2, lazy_smp=True)
+        try:
+            score, move = search.search(board=board, depth=3)
+        finally:
+            search.close()
+        # Either the worker at the requested depth or the one searching a ply deeper finishes first
+        assert score in [serial_score(board=board, depth=2, run_alpha_beta=True), serial_score(board=board, depth=3, run_alpha_beta=True)]
+        assert move in board.legal_moves
+
+    def test_player_with_workers_plays_a_winning_move(self) -> None:
+        board = AIChessBoard(MIDDLE_GAME_BOARD)
+        for lazy_smp in [False, True]:
+            player = MinimaxPlayer(time, depth=2, heuristics=[], run_alpha_beta=True, workers=2, lazy_smp=lazy_smp)
+            try:
+                move = player.min_max(board=board, depth=2)
+            finally:
+                player.close()
+            assert move.uci() in ['c6d7', 'c6b7', 'c6c7']
+
+    @pytest.mark.parametrize("lazy_smp", [False, True])
+    def test_search_report_counts_the_searches_of_the_workers(self, lazy_smp: bool) -> None:
+        board = AIChessBoard(MIDDLE_GAME_BOARD)
+        player = MinimaxPlayer(time, depth=2, heuristics=HEURISTICS, run_alpha_beta=True, transposition_table_mb=1,
+            workers=2, lazy_smp=lazy_smp)
+        try:
+            player.min_max(board=board, depth=3)
+        finally:
+            player.close()
+        report = player.search_report
+        assert report.nodes > 0
+        assert report.leaf_evaluations > 0
+        assert report.cutoffs > 0
+        assert report.max_depth >= 3
+        assert report.transposition_probes > 0
+
+    def test_one_worker_searches_in_process_and_is_deterministic(self) -> None:
+        board = AIChessBoard('8/pppppppp/8/8/8/8/PPPPPPPP/8')
+        moves = []
+        for _ in range(2):
+            np.random.seed(7)
+            player = MinimaxPlayer(time, depth=2, heuristics=HEURISTICS, run_alpha_beta=True, workers=1)
+            moves.append(player.min_max(board=board, depth=2))
+            assert player._MinimaxPlayer__parallel_search is None
+        assert moves[0] == moves[1]
+
+    def test_player_survives_pickling(self) -> None:
+        player = MinimaxPlayer(time, depth=2, heuristics=HEURISTICS, run_alpha_beta=True, transposition_table_mb=1)
+        player.transposition_table.store(key=1, depth=1, score=0, bound=Bound.EXACT, best_move=None)
+        copy = pickle.loads(pickle.dumps(player))
+        assert copy._ChessPlayer__time is time
+        assert copy.transposition_table.size == player.transposition_table.size
+        assert len(copy.transposition_table) == 0
+        assert copy.min_max(board=AIChessBoard(MIDDLE_GAME_BOARD), depth=2).uci() in ['c6d7', 'c6b7', 'c6c7']
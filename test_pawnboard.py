@@ -0,0 +1,97 @@
+from aichessboard import AIChessBoard
+import chess
+from chess import Move
+from heuristics import Heuristic
+from minimaxchessplayer import MinimaxPlayer
+from pawnboard import PawnBoard
+import pytest
+import random
+from randomchessplayer import RandomChessPlayer
+import time
+
+STARTING_BOARD = '8/pppppppp/8/8/8/8/PPPPPPPP/8'
+PERFT_POSITIONS = [
+    (STARTING_BOARD, 3),
+    ('8/1p1p4/2P5/8/8/5p2/1P1P4/8', 4),
+    ('8/p6p/8/1pP5/8/8/P6P/8 w - b6 0 1', 4),
+    ('8/8/8/8/3pP3/8/8/8 b - e3 0 1', 3),
+    ('8/1P4p1/8/8/8/8/1p4P1/8 w - - 0 1', 3),
+    ('8/pp1ppp1p/8/2pP2p1/1P4P1/8/P1P1PP1P/8 b - - 0 1', 3)
+]
+
+
+def chess_perft(board: AIChessBoard, depth: int) -> int:
+    if depth == 0 or board.outcome() is not None:
+        return 1
+    nodes = 0
+    for move in board.legal_moves:
+        board.push(move)
+        nodes += chess_perft(board, depth - 1)
+        board.pop()
+    return nodes
+
+
+class TestPawnBoard:
+    @pytest.mark.parametrize("fen,depth", PERFT_POSITIONS)
+    def test_perft_matches_python_chess(self, fen: str, depth: int) -> None:
+        for current_depth in range(1, depth + 1):
+            assert PawnBoard.from_fen(fen).perft(current_depth) == chess_perft(AIChessBoard(fen), current_depth)
+
+    @pytest.mark.parametrize("seed", range(20))
+    def test_random_games_generate_the_same_moves_in_the_same_order(self, seed: int) -> None:
+        generator = random.Random(seed)
+        board = AIChessBoard(STARTING_BOARD)
+        pawn_board = PawnBoard.from_board(board)
+        fens = []
+        while board.outcome() is None:
+            moves = list(board.legal_moves)
+            assert pawn_board.legal_moves == moves
+            if not moves:
+                break
+            move = generator.choice(moves)
+            fens.append(board.epd(en_passant='fen'))
+            board.push(move)
+            pawn_board.push(move)
+            assert pawn_board == PawnBoard.from_board(board)
+        while fens:
+            pawn_board.pop()
+            assert pawn_board.to_board().epd(en_passant='fen') == fens.pop()
+
+    def test_conversion_to_and_from_aichessboard_is_lossless(self) -> None:
+        board = AIChessBoard(STARTING_BOARD)
+        for uci in ['e2e4', 'd7d5', 'e4e5', 'f7f5']:
+            board.push_uci(uci)
+        pawn_board = PawnBoard.from_board(board)
+        converted = pawn_board.to_board()
+        assert converted.epd(en_passant='fen') == board.epd(en_passant='fen')
+        assert list(converted.legal_moves) == list(board.legal_moves)
+        assert PawnBoard.from_fen(pawn_board.fen()) == pawn_board
+
+    def test_en_passant_capture_removes_the_passed_pawn(self) -> None:
+        pawn_board = PawnBoard.from_fen('8/5p2/8/4P3/8/8/8/8 b - - 0 1')
+        pawn_board.push(Move.from_uci('f7f5'))
+        assert pawn_board.ep_square == chess.F6
+        pawn_board.push(Move.from_uci('e5f6'))
+        assert pawn_board.black == 0 and pawn_board.white == chess.BB_F6
+
+    def test_promotion_wins_the_game(self) -> None:
+        pawn_board = PawnBoard.from_fen('8/P7/8/8/8/8/7p/8 w - - 0 1')
+        assert pawn_board.outcome() is None
+        pawn_board.push(Move.from_uci('a7a8q'))
+        assert pawn_board.outcome().winner == chess.WHITE
+        assert len(pawn_board.pieces(chess.QUEEN, chess.WHITE)) == 1
+
+    def test_random_player_runs_on_pawn_board(self) -> None:
+        pawn_board = PawnBoard.from_fen(STARTING_BOARD)
+        player = RandomChessPlayer(time)
+        assert player.get_next_move(pawn_board) in pawn_board.legal_moves
+        player = RandomChessPlayer(time, pawn_board=True)
+        assert player.get_next_move(AIChessBoard(STARTING_BOARD)) in pawn_board.legal_moves
+
+    def test_minimax_player_runs_on_pawn_board(self) -> None:
+        board = AIChessBoard('8/1p1p4/2P5/8/8/5p2/1P1P4/8')
+        player = MinimaxPlayer(time, depth=3, heuristics=[], run_alpha_beta=True)
+        assert player.get_next_move(PawnBoard.from_board(board)) in \
+            {Move.from_uci('c6d7'), Move.from_uci('c6b7'), Move.from_uci('c6c7')}
+        player = MinimaxPlayer(time, depth=3, heuristics=list(Heuristic), run_alpha_beta=False, pawn_board=True)
+        assert player.get_next_move(board) == Move.from_uci('c6d7')
@@ -0,0 +1,95 @@
+from aichessboard import AIChessBoard
+import chess
+from chess import Move
+from heuristics import Heuristic
+from itertools import combinations
+from minimaxchessplayer import MinimaxPlayer, WinReward
+import pawnrace
+from pawnrace import race_result, race_value
+import pytest
+import tablebase
+from tablebase import Tablebase, TABLE_SQUARES
+import time
+
+CONFIGURATIONS = [(1, 0), (0, 1), (1, 1), (2, 0), (0, 2), (2, 1), (1, 2)]
+
+
+@pytest.fixture(scope="module")
+def tablebase_directory(tmp_path_factory) -> str:
+    directory = str(tmp_path_factory.mktemp("tablebase"))
+    tablebase.generate(directory, max_pawns_per_side=1)
+    for white_count, black_count in CONFIGURATIONS:
+        tablebase._solve_configuration(directory, white_count, black_count)
+    return directory
+
+
+def positions(white_count: int, black_count: int):
+    for white_squares in combinations(TABLE_SQUARES, white_count):
+        white = sum(chess.BB_SQUARES[square] for square in white_squares)
+        free_squares = [square for square in TABLE_SQUARES if not chess.BB_SQUARES[square] & white]
+        for black_squares in combinations(free_squares, black_count):
+            black = sum(chess.BB_SQUARES[square] for square in black_squares)
+            for turn in chess.COLORS:
+                yield white, black, turn
+
+
+class TestPawnRace:
+    def test_moves_to_promote_counts_the_double_push(self) -> None:
+        assert pawnrace.moves_to_promote(chess.A2, chess.WHITE) == 5
+        assert pawnrace.moves_to_promote(chess.A3, chess.WHITE) == 5
+        assert pawnrace.moves_to_promote(chess.H7, chess.BLACK) == 5
+        assert pawnrace.moves_to_promote(chess.H2, chess.BLACK) == 1
+
+    def test_blocked_and_guarded_pawns_are_not_unstoppable(self) -> None:
+        white = chess.BB_D4
+        assert pawnrace.unstoppable_moves(white, chess.BB_H7, chess.WHITE) == 4
+        assert pawnrace.unstoppable_moves(white, chess.BB_E6, chess.WHITE) is None
+        assert pawnrace.unstoppable_moves(white, chess.BB_D7, chess.WHITE) is None
+        assert pawnrace.unstoppable_moves(white, chess.BB_E4 | chess.BB_C3, chess.WHITE) == 4
+
+    @pytest.mark.parametrize("white_count,black_count", CONFIGURATIONS)
+    def test_races_agree_with_the_tablebase_on_every_position(self, tablebase_directory: str, white_count: int, black_count: int) -> None:
+        # Every race that is called must be won by the same side, at the latest in the plies the race promises
+        exact = Tablebase(tablebase_directory)
+        decided = 0
+        for white, black, turn in positions(white_count, black_count):
+            value = race_value(white, black, turn)
+            if value is None:
+                continue
+            decided += 1
+            exact_value = exact.position_value(white, black, turn)
+            assert exact_value != 0 and (exact_value > 0) == (value > 0), (white, black, turn)
+            assert abs(exact_value) <= abs(value), (white, black, turn)
+        assert decided > 0
+
+    def test_a_side_without_moves_is_not_lost(self) -> None:
+        # White's pawn runs unopposed, but black is blocked and draws by having no move
+        board = AIChessBoard('8/8/8/8/8/p7/P6P/8 b - - 0 1')
+        assert race_result(board) is None
+        board.turn = chess.WHITE
+        assert race_result(board) is None
+
+    def test_en_passant_is_left_to_the_search(self) -> None:
+        board = AIChessBoard('8/7p/8/8/1Pp5/8/8/8 b - b3 0 1')
+        assert race_result(board) is None
+        board.ep_square = None
+        assert race_result(board) == 5
+
+    @pytest.mark.parametrize("trace", [False, True])
+    @pytest.mark.parametrize("run_alpha_beta", [False, True])
+    def test_player_stops_at_decided_races(self, run_alpha_beta: bool, trace: bool) -> None:
+        heuristics = [Heuristic.Maximize_Number_Of_Pieces, Heuristic.Distance_From_Starting_Location]
+        board = AIChessBoard('8/6p1/8/8/8/8/P7/8 w - - 0 1')
+        racer = MinimaxPlayer(time, depth=3, heuristics=heuristics, run_alpha_beta=run_alpha_beta, trace=trace, race_detection=True)
+        searcher = MinimaxPlayer(time, depth=3, heuristics=heuristics, run_alpha_beta=run_alpha_beta, trace=trace)
+        assert racer.min_max(board=board, depth=3) == Move.from_uci('a2a4')
+        searcher.min_max(board=board, depth=3)
+        assert racer.race_wins > 0
+        assert racer.search_report.nodes < searcher.search_report.nodes
+
+    def test_quicker_races_score_higher(self) -> None:
+        player = MinimaxPlayer(time, depth=1, heuristics=[], run_alpha_beta=True, race_detection=True)
+        quick = player.race_reward(board=AIChessBoard('8/6p1/8/8/P7/8/8/8 b - - 0 1'), maximizer=chess.WHITE)
+        slow = player.race_reward(board=AIChessBoard('8/6p1/8/8/8/P7/8/8 w - - 0 1'), maximizer=chess.WHITE)
+        assert WinReward.WIN.value > quick > slow > 0
+        assert player.race_reward(board=AIChessBoard('8/6p1/8/8/P7/8/8/8 b - - 0 1'), maximizer=chess.BLACK) == -quick
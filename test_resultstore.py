@@ -0,0 +1,17 @@
+from resultstore import ResultStore
+
+
+class TestResultStore:
+    def test_records_are_read_back_in_order(self, tmp_path) -> None:
+        store = ResultStore(str(tmp_path / "results.jsonl"))
+        assert store.records() == []
+        store.append({'game': 0, 'winner': 1})
+        store.append({'game': 1, 'winner': None})
+        assert ResultStore(store.path).records() == [{'game': 0, 'winner': 1}, {'game': 1, 'winner': None}]
+
+    def test_line_cut_off_by_a_crash_is_dropped(self, tmp_path) -> None:
+        path = tmp_path / "results.jsonl"
+        path.write_text('{"game": 0}\n{"game": 1, "win')
+        store = ResultStore(str(path))
+        store.append({'game': 1})
+        assert store.records() == [{'game': 0}, {'game': 1}]
@@ -0,0 +1,66 @@
+from aichess import Results
+from aichessboard import AIChessBoard
+from heuristics import Heuristic
+from minimaxchessplayer import MinimaxPlayer
+import pytest
+from searchstats import SearchReport
+import time
+
+HEURISTICS = [Heuristic.Maximize_Number_Of_Pieces, Heuristic.Distance_From_Starting_Location]
+BOARD = '8/1p1p4/2P5/8/8/5p2/1P1P4/8'
+
+
+class TestSearchReport:
+    def test_rates_of_an_empty_report_are_zero(self) -> None:
+        report = SearchReport()
+        assert report.nodes_per_second() == 0.0
+        assert report.effective_branching_factor() == 0.0
+        assert report.first_move_cutoff_rate() == 0.0
+        assert report.transposition_hit_rate() == 0.0
+
+    def test_effective_branching_factor_of_a_uniform_tree(self) -> None:
+        report = SearchReport(moves=2, nodes=2 * 1000, plies=2 * 3)
+        assert report.effective_branching_factor() == pytest.approx(10.0)
+
+    def test_merged_adds_counts_and_keeps_the_deepest_search(self) -> None:
+        first = SearchReport(moves=1, nodes=10, max_depth=3, cutoffs=2, seconds=0.5)
+        second = SearchReport(moves=1, nodes=30, max_depth=5, cutoffs=1, seconds=1.5)
+        merged = first.merged(second)
+        assert (merged.moves, merged.nodes, merged.max_depth, merged.cutoffs) == (2, 40, 5, 3)
+        assert merged.nodes_per_second() == pytest.approx(20.0)
+        assert merged.since(first).nodes == 30
+
+    def test_negamax_search_is_reported(self) -> None:
+        player = MinimaxPlayer(time, depth=2, heuristics=HEURISTICS, run_alpha_beta=True, transposition_table_mb=1)
+        player.min_max(board=AIChessBoard(BOARD), depth=2)
+        report = player.search_report
+        assert report.moves == 1 and report.plies == 3
+        assert report.nodes > report.leaf_evaluations > 0
+        assert report.max_depth == 3
+        assert 0 < report.first_move_cutoffs <= report.cutoffs
+        assert 0 < report.transposition_probes <= report.nodes
+        assert report.seconds > 0
+
+    def test_reports_of_the_legacy_searches_agree_on_the_tree(self) -> None:
+        pre_order = MinimaxPlayer(time, depth=2, heuristics=HEURISTICS, run_alpha_beta=False, trace=True)
+        push_pop = MinimaxPlayer(time, depth=2, heuristics=HEURISTICS, run_alpha_beta=False)
+        for player in [pre_order, push_pop]:
+            player.min_max(board=AIChessBoard(BOARD), depth=2)
+        assert pre_order.search_report.nodes == push_pop.search_report.nodes > 0
+        assert pre_order.search_report.max_depth == push_pop.search_report.max_depth == 3
+        assert pre_order.search_report.cutoffs == push_pop.search_report.cutoffs == 0
+
+    def test_total_report_adds_up_the_moves(self) -> None:
+        player = MinimaxPlayer(time, depth=1, heuristics=HEURISTICS, run_alpha_beta=True)
+        nodes = 0
+        for _ in range(3):
+            player.min_max(board=AIChessBoard(BOARD), depth=1)
+            nodes += player.search_report.nodes
+        assert player.total_search_report.moves == 3
+        assert player.total_search_report.nodes == nodes
+
+    def test_results_print_the_search_reports(self) -> None:
+        report = SearchReport(moves=1, nodes=42)
+        results = Results("one", "two", 0.5, 0.5, 0.0, 0.1, 0.1, 20.0, 2, report)
+        assert "one search:nodes:42" in str(results)
+        assert "two search" not in str(results)
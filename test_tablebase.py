@@ -0,0 +1,131 @@
+from aichessboard import AIChessBoard
+import chess
+from chess import Move
+from heuristics import Heuristic
+from minimaxchessplayer import MinimaxPlayer, WinReward
+import numpy as np
+import os
+import pytest
+import random
+import tablebase
+from tablebase import Tablebase, position_index, table_size, TABLE_SQUARES
+import time
+
+
+def solve(board: AIChessBoard) -> int:
+    # Plain game tree search on python-chess, with en passant, in the encoding of the tablebase
+    wins, draw, losses = [], False, []
+    for move in board.legal_moves:
+        board.push(move)
+        if board.outcome() is not None:
+            wins.append(1)
+        else:
+            value = solve(board)
+            if value < 0:
+                wins.append(1 - value)
+            elif value > 0:
+                losses.append(value + 1)
+            else:
+                draw = True
+        board.pop()
+    if wins:
+        return min(wins)
+    if draw or not losses:
+        return 0
+    return -max(losses)
+
+
+def random_board(generator: random.Random, white_count: int, black_count: int) -> AIChessBoard:
+    squares = generator.sample(TABLE_SQUARES, white_count + black_count)
+    board = AIChessBoard(None)
+    for index, square in enumerate(squares):
+        board.set_piece_at(square, chess.Piece(chess.PAWN, chess.WHITE if index < white_count else chess.BLACK))
+    board.turn = generator.choice(chess.COLORS)
+    return board
+
+
+@pytest.fixture(scope="module")
+def tablebase_directory(tmp_path_factory) -> str:
+    directory = str(tmp_path_factory.mktemp("tablebase"))
+    tablebase.generate(directory, max_pawns_per_side=1)
+    tablebase._solve_configuration(directory, 2, 0)
+    tablebase._solve_configuration(directory, 2, 1)
+    return directory
+
+
+class TestTablebase:
+    def test_position_indexes_are_dense_and_unique(self) -> None:
+        indexes = set()
+        for white_square in TABLE_SQUARES:
+            for black_square in TABLE_SQUARES:
+                if white_square != black_square:
+                    for turn in chess.COLORS:
+                        indexes.add(position_index(chess.BB_SQUARES[white_square], chess.BB_SQUARES[black_square], turn))
+        assert indexes == set(range(table_size(1, 1)))
+
+    @pytest.mark.parametrize("white_count,black_count", [(1, 1), (2, 1), (0, 1)])
+    def test_values_match_a_full_game_tree_search(self, tablebase_directory: str, white_count: int, black_count: int) -> None:
+        generator = random.Random(white_count * 10 + black_count)
+        probes = Tablebase(tablebase_directory)
+        for _ in range(100):
+            board = random_board(generator, white_count, black_count)
+            assert probes.probe(board) == solve(board), board.fen()
+
+    def test_en_passant_is_solved_from_the_children(self, tablebase_directory: str) -> None:
+        board = AIChessBoard('8/8/8/8/1p6/8/P7/8 w - - 0 1')
+        board.push_uci('a2a4')
+        assert board.has_legal_en_passant()
+        assert Tablebase(tablebase_directory).probe(board) == solve(board)
+
+    def test_positions_without_a_table_are_not_covered(self, tablebase_directory: str) -> None:
+        probes = Tablebase(tablebase_directory)
+        assert probes.probe(AIChessBoard('8/pppppppp/8/8/8/8/PPPPPPPP/8')) is None
+        assert probes.probe(AIChessBoard('P7/8/8/8/8/8/7p/8')) is None
+        assert probes.hits == 0 and probes.probes == 2
+
+    def test_generation_skips_existing_tables(self, tablebase_directory: str) -> None:
+        path = os.path.join(tablebase_directory, tablebase.table_file_name(1, 1))
+        modified = os.path.getmtime(path)
+        tablebase.generate(tablebase_directory, max_pawns_per_side=1)
+        assert os.path.getmtime(path) == modified
+
+    def test_parallel_generation_writes_the_same_tables(self, tablebase_directory: str, tmp_path) -> None:
+        tablebase.generate(str(tmp_path), max_pawns_per_side=1, workers=2)
+        for white_count, black_count in [(0, 0), (0, 1), (1, 0), (1, 1)]:
+            name = tablebase.table_file_name(white_count, black_count)
+            assert np.array_equal(np.fromfile(os.path.join(tmp_path, name), dtype=np.int8),
+                np.fromfile(os.path.join(tablebase_directory, name), dtype=np.int8))
+
+    def test_quicker_tablebase_wins_score_higher(self, tablebase_directory: str) -> None:
+        player = MinimaxPlayer(time, depth=1, heuristics=[], run_alpha_beta=True, tablebase_directory=tablebase_directory)
+        quick_win = AIChessBoard('8/P7/8/8/8/8/7p/8 w - - 0 1')
+        slow_win = AIChessBoard('8/8/7p/P7/8/8/8/8 w - - 0 1')
+        assert 0 < player.tablebase.probe(quick_win) < player.tablebase.probe(slow_win)
+        assert player.tablebase_reward(board=quick_win, maximizer=chess.WHITE) > player.tablebase_reward(board=slow_win, maximizer=chess.WHITE)
+
+    def test_unsolved_entry_of_a_table_on_disk_is_searched_without_writing(self, tablebase_directory: str, tmp_path) -> None:
+        board = AIChessBoard('8/8/p7/8/8/8/7P/8 w - - 0 1')
+        name = tablebase.table_file_name(1, 1)
+        values = np.fromfile(os.path.join(tablebase_directory, name), dtype=np.int8)
+        index = position_index(board.occupied_co[chess.WHITE], board.occupied_co[chess.BLACK], board.turn)
+        expected = int(values[index])
+        values[index] = tablebase.UNSOLVED
+        values.tofile(os.path.join(tmp_path, name))
+        for white_count, black_count in [(0, 0), (0, 1), (1, 0)]:
+            other_name = tablebase.table_file_name(white_count, black_count)
+            np.fromfile(os.path.join(tablebase_directory, other_name), dtype=np.int8).tofile(os.path.join(tmp_path, other_name))
+        assert Tablebase(str(tmp_path)).probe(board) == expected
+
+    @pytest.mark.parametrize("run_alpha_beta", [True, False])
+    def test_player_uses_exact_results_below_the_root(self, tablebase_directory: str, run_alpha_beta: bool) -> None:
+        # Only the double push wins the race, which a one ply search cannot see
+        board = AIChessBoard('8/8/p7/8/8/8/7P/8 w - - 0 1')
+        player = MinimaxPlayer(time, depth=1, heuristics=[Heuristic.Distance_From_Starting_Location],
+            run_alpha_beta=run_alpha_beta, tablebase_directory=tablebase_directory)
+        value = player.tablebase.probe(board)
+        assert value > 0
+        assert player.tablebase_reward(board=board, maximizer=chess.WHITE) == WinReward.WIN.value - value
+        assert player.tablebase_reward(board=board, maximizer=chess.BLACK) == WinReward.LOSS.value + value
+        for _ in range(5):
+            assert player.min_max(board=board, depth=1) == Move.from_uci('h2h4')
+        assert player.tablebase.hits > 0
@@ -0,0 +1,140 @@
+from aichessboard import AIChessBoard
+import chess
+from chess import Move
+from heuristics import Heuristic
+from minimaxchessplayer import MinimaxPlayer, Node, ALPHA_DEFAULT, BETA_DEFAULT
+import pytest
+import time
+from transpositiontable import Bound, TranspositionTable, decode_move, encode_move, zobrist_hash, BYTES_PER_ENTRY
+
+STARTING_BOARD = '8/pppppppp/8/8/8/8/PPPPPPPP/8'
+MIDDLE_GAME_BOARD = '8/1p1p4/2P5/8/8/5p2/1P1P4/8'
+
+
+class TestTranspositionTable:
+    def test_transposed_move_orders_hash_the_same(self) -> None:
+        board1 = AIChessBoard(STARTING_BOARD)
+        board2 = AIChessBoard(STARTING_BOARD)
+        for uci in ['a2a3', 'h7h6', 'b2b3', 'g7g6']:
+            board1.push_uci(uci)
+        for uci in ['b2b3', 'g7g6', 'a2a3', 'h7h6']:
+            board2.push_uci(uci)
+        assert zobrist_hash(board1) == zobrist_hash(board2)
+
+    def test_side_to_move_changes_the_hash(self) -> None:
+        board = AIChessBoard(MIDDLE_GAME_BOARD)
+        white_to_move = zobrist_hash(board)
+        board.turn = chess.BLACK
+        assert zobrist_hash(board) != white_to_move
+
+    def test_uncapturable_en_passant_square_does_not_change_the_hash(self) -> None:
+        board1 = AIChessBoard(STARTING_BOARD)
+        board1.push_uci('a2a4')
+        board2 = AIChessBoard('8/pppppppp/8/8/P7/8/1PPPPPPP/8 b - - 0 1')
+        assert zobrist_hash(board1) == zobrist_hash(board2)
+
+    def test_moves_survive_encoding(self) -> None:
+        for move in [Move.from_uci('a2a4'), Move.from_uci('c6d7'), Move.from_uci('h7h8q'), None]:
+            assert decode_move(encode_move(move)) == move
+
+    def test_stored_entry_is_returned_by_probe(self) -> None:
+        table = TranspositionTable(size_in_bytes=1024)
+        move = Move.from_uci('b2b4')
+        table.store(key=12345, depth=3, score=-7, bound=Bound.LOWER, best_move=move)
+        entry = table.probe(12345)
+        assert (entry.depth, entry.score, entry.bound, entry.best_move) == (3, -7, Bound.LOWER, move)
+        assert table.probe(54321) is None
+        assert table.hits == 1 and table.probes == 2
+
+    def test_table_stays_within_its_memory_cap(self) -> None:
+        table = TranspositionTable(size_in_bytes=10000)
+        assert table.size_in_bytes() <= 10000
+        with pytest.raises(ValueError):
+            TranspositionTable(size_in_bytes=BYTES_PER_ENTRY)
+
+    def test_shallow_entry_does_not_evict_deeper_one_in_the_same_bucket(self) -> None:
+        table = TranspositionTable(size_in_bytes=BYTES_PER_ENTRY * 2)
+        table.store(key=1, depth=5, score=1, bound=Bound.EXACT, best_move=None)
+        table.store(key=2, depth=1, score=2, bound=Bound.EXACT, best_move=None)
+        table.store(key=3, depth=2, score=3, bound=Bound.EXACT, best_move=None)
+        assert table.probe(1).depth == 5
+        assert table.probe(2) is None
+        assert table.probe(3).score == 3
+
+    def test_entries_from_an_old_search_can_be_replaced(self) -> None:
+        table = TranspositionTable(size_in_bytes=BYTES_PER_ENTRY * 2)
+        table.store(key=1, depth=5, score=1, bound=Bound.EXACT, best_move=None)
+        table.new_search()
+        table.store(key=2, depth=1, score=2, bound=Bound.EXACT, best_move=None)
+        assert table.probe(1) is None
+        assert table.probe(2).score == 2
+
+    @pytest.mark.parametrize("run_alpha_beta", [False, True])
+    @pytest.mark.parametrize("board_fen,turn", [
+        (MIDDLE_GAME_BOARD, chess.WHITE),
+        ('8/1p1p4/8/8/8/5p2/1P1P4/8', chess.BLACK),
+        ('8/ppp5/8/8/8/8/PPP5/8', chess.WHITE)
+    ])
+    def test_search_with_table_returns_the_same_root_score(self, run_alpha_beta: bool, board_fen: str, turn: chess.Color) -> None:
+        scores = []
+        for transposition_table_mb in [0, 1]:
+            board = AIChessBoard(board_fen)
+            board.turn = turn
+            minimaxplayer = MinimaxPlayer(
+                time,
+                depth=3,
+                heuristics=[Heuristic.Maximize_Number_Of_Pieces, Heuristic.Distance_From_Starting_Location],
+                run_alpha_beta=run_alpha_beta,
+                transposition_table_mb=transposition_table_mb
+            )
+            root = Node(0, board, None, None, None, ALPHA_DEFAULT, BETA_DEFAULT, None)
+            scores.append(minimaxplayer.pre_order(root_board=board, current=root, depth=minimaxplayer.depth + 1).reward_if_taking_best_move)
+            if transposition_table_mb:
+                assert minimaxplayer.transposition_table.hits > 0
+        assert scores[0] == scores[1]
+
+    @pytest.mark.parametrize("run_alpha_beta", [False, True])
+    def test_win_found_at_another_ply_keeps_its_distance(self, run_alpha_beta: bool) -> None:
+        # White promotes three plies after the second search starts, five after the first
+        board = AIChessBoard('8/7p/8/P7/8/8/8/8 w - - 0 1')
+        later_board = board.copy()
+        for uci in ['a5a6', 'h7h6']:
+            later_board.push_uci(uci)
+        scores = []
+        for transposition_table_mb in [0, 1]:
+            minimaxplayer = MinimaxPlayer(time, depth=5, heuristics=[], run_alpha_beta=run_alpha_beta,
+                transposition_table_mb=transposition_table_mb)
+            if run_alpha_beta:
+                minimaxplayer.negamax(board=board.copy(), depth=5, alpha=ALPHA_DEFAULT, beta=BETA_DEFAULT, maximizer=chess.WHITE)
+                score, _ = minimaxplayer.negamax(board=later_board.copy(), depth=3, alpha=ALPHA_DEFAULT, beta=BETA_DEFAULT, maximizer=chess.WHITE)
+            else:
+                minimaxplayer.push_pop_search(board=board.copy(), depth=5, maximizer=chess.WHITE)
+                score, _ = minimaxplayer.push_pop_search(board=later_board.copy(), depth=3, maximizer=chess.WHITE)
+            scores.append(score)
+            if transposition_table_mb:
+                assert minimaxplayer.transposition_table.hits > 0
+        assert scores[0] == scores[1] == MinimaxPlayer.win_reward(wins=True, ply=3)
+
+    def test_win_scores_are_stored_from_the_node(self) -> None:
+        win_three_plies_below_the_node = MinimaxPlayer.win_reward(wins=True, ply=5)
+        stored = MinimaxPlayer.score_to_table(score=win_three_plies_below_the_node, ply=2)
+        assert stored == MinimaxPlayer.win_reward(wins=True, ply=3)
+        assert MinimaxPlayer.score_from_table(score=stored, ply=4) == MinimaxPlayer.win_reward(wins=True, ply=7)
+        assert MinimaxPlayer.score_from_table(score=MinimaxPlayer.score_to_table(score=-win_three_plies_below_the_node, ply=2), ply=4) == \
+            MinimaxPlayer.win_reward(wins=False, ply=7)
+        assert MinimaxPlayer.score_to_table(score=150, ply=2) == MinimaxPlayer.score_from_table(score=150, ply=2) == 150
+
+    def test_tables_over_one_buffer_share_their_entries(self) -> None:
+        buffer = bytearray(TranspositionTable.bytes_needed(1024))
+        writer = TranspositionTable(size_in_bytes=1024, buffer=buffer)
+        writer.clear()
+        reader = TranspositionTable(size_in_bytes=1024, buffer=buffer)
+        writer.store(key=777, depth=2, score=1.5, bound=Bound.EXACT, best_move=Move.from_uci('a2a3'))
+        assert reader.probe(777).best_move == Move.from_uci('a2a3')
+
+    def test_torn_entry_is_not_returned(self) -> None:
+        table = TranspositionTable(size_in_bytes=1024)
+        table.store(key=777, depth=2, score=1.5, bound=Bound.EXACT, best_move=None)
+        # Another process overwrote the score but not yet the key
+        table.scores[:] = 3.0
+        assert table.probe(777) is None
@@ -0,0 +1,96 @@
+from aichessboard import AIChessBoard
+import chess
+from evaluationcache import EvaluationCache
+from heuristics import DEFAULT_WEIGHTS, Heuristic, Heuristics, load_weight_profile
+from incrementalevaluator import IncrementalEvaluator
+from minimaxchessplayer import MinimaxPlayer
+import numpy as np
+from pawnboard import PawnBoard
+import pytest
+import random
+from test_heuristics import random_board
+import time
+from tuning import DRAW, FEATURES, LOSS, RESULT, WIN, evaluation_weights, extract, feature_matrix, fit_weights, self_play, \
+    write_weight_profile
+
+TUNED_WEIGHTS = np.array([20, -2, 0, 1, -13, 6])
+
+
+@pytest.fixture
+def weight_profile(tmp_path) -> str:
+    path = str(tmp_path / "profile.json")
+    write_weight_profile(path, TUNED_WEIGHTS)
+    return path
+
+
+class TestTuning:
+    def test_features_add_up_to_the_evaluation(self) -> None:
+        generator = random.Random(29)
+        boards = [PawnBoard.from_board(random_board(generator)) for _ in range(300)]
+        features = feature_matrix([board.white for board in boards], [board.black for board in boards], [board.turn for board in boards])
+        heuristics = Heuristics(list(Heuristic))
+        weights = np.array([DEFAULT_WEIGHTS[heuristic] for heuristic in FEATURES])
+        assert (features @ weights).tolist() == [heuristics.return_heuristic_value(board, board.turn) for board in boards]
+
+    def test_self_play_rows_are_scored_for_the_side_to_move(self) -> None:
+        rows = self_play(seed=3, games=4)
+        assert rows.shape[1] == RESULT + 1
+        assert set(rows[:, RESULT].tolist()) <= {LOSS, DRAW, WIN}
+        assert np.array_equal(rows, self_play(seed=3, games=4))
+        # Within a decided game the side to move alternates, and so does the result
+        decided = [row for row in range(1, len(rows)) if rows[row, RESULT] != DRAW and rows[row - 1, RESULT] != DRAW]
+        assert any(rows[row, RESULT] + rows[row - 1, RESULT] == WIN for row in decided)
+
+    def test_extraction_does_not_depend_on_the_number_of_workers(self, tmp_path) -> None:
+        serial = extract(str(tmp_path / "serial.npy"), positions=500, workers=1, games_per_task=4)
+        parallel = extract(str(tmp_path / "parallel.npy"), positions=500, workers=2, games_per_task=4)
+        assert serial.shape == (500, RESULT + 1)
+        assert np.array_equal(serial, parallel)
+        assert np.array_equal(np.load(str(tmp_path / "parallel.npy")), serial)
+
+    def test_fit_recovers_the_weights_behind_the_results(self) -> None:
+        generator = np.random.default_rng(31)
+        features = generator.integers(-4, 5, size=(20000, len(FEATURES)))
+        true_weights = np.array([0.6, -0.3, 0.0, 0.2, -0.5, 0.1])
+        expected = 1 / (1 + np.exp(-(features @ true_weights)))
+        results = np.where(generator.random(len(features)) < expected, WIN, LOSS)
+        weights = fit_weights(features, results, iterations=800, learning_rate=0.02)
+        assert np.allclose(weights, true_weights, atol=0.1)
+        assert np.max(np.abs(evaluation_weights(weights))) == pytest.approx(max(abs(weight) for weight in DEFAULT_WEIGHTS.values()))
+
+    def test_self_play_results_follow_the_material(self) -> None:
+        rows = self_play(seed=5, games=60)
+        material, results = rows[:, FEATURES.index(Heuristic.Maximize_Number_Of_Pieces)], rows[:, RESULT]
+        assert results[material > 0].mean() > DRAW > results[material < 0].mean()
+        weights = evaluation_weights(fit_weights(rows[:, :RESULT], results))
+        assert weights[FEATURES.index(Heuristic.Maximize_Number_Of_Pieces)] > 0
+
+    def test_profile_weights_are_used_by_every_evaluation(self, weight_profile: str) -> None:
+        weights = load_weight_profile(weight_profile)
+        assert [weights[heuristic] for heuristic in FEATURES] == TUNED_WEIGHTS.tolist()
+        heuristics = Heuristics(list(Heuristic), weights=weights)
+        evaluator = IncrementalEvaluator(heuristics, verify=True)
+        generator = random.Random(37)
+        boards = [PawnBoard.from_board(random_board(generator)) for _ in range(200)]
+        white, black = np.array([board.white for board in boards], dtype=np.uint64), np.array([board.black for board in boards], dtype=np.uint64)
+        for color in chess.COLORS:
+            features = feature_matrix(white, black, np.full(len(boards), color))
+            expected = (features @ TUNED_WEIGHTS).tolist()
+            assert [heuristics.return_heuristic_value(board, color) for board in boards] == expected
+            assert heuristics.evaluate_batch(white, black, color).tolist() == expected
+            assert [evaluator.value(board, color) for board in boards] == expected
+
+    def test_tuned_and_default_weights_have_their_own_cache_entries(self) -> None:
+        cache = EvaluationCache(1 << 16)
+        board = AIChessBoard('8/pp4pp/8/2pP4/8/8/PP4PP/8')
+        default = Heuristics(list(Heuristic), cache=cache)
+        tuned = Heuristics(list(Heuristic), cache=cache, weights={Heuristic.Distance_From_Starting_Location: 1})
+        assert default.return_heuristic_value(board, chess.WHITE) != tuned.return_heuristic_value(board, chess.WHITE)
+        assert default.return_heuristic_value(board, chess.WHITE) != tuned.return_heuristic_value(board, chess.WHITE)
+        assert cache.hits == 2
+
+    def test_player_loads_a_profile(self, weight_profile: str) -> None:
+        player = MinimaxPlayer(time, depth=1, heuristics=list(Heuristic), run_alpha_beta=True, weight_profile=weight_profile)
+        assert player.heuristic_calculator.weights[Heuristic.Maximize_Number_Of_Pieces] == 20
+        assert "weights" in str(player.heuristic_calculator)
+        assert player.min_max(board=AIChessBoard('8/pppppppp/8/8/8/8/PPPPPPPP/8'), depth=1) is not None
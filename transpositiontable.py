@@ -0,0 +1,217 @@
+import chess
+from chess import Move
+from dataclasses import dataclass
+from enum import Enum
+import numpy as np
+import random
+import struct
+from typing import Any, List
+
+ZOBRIST_SEED = 2022
+BYTES_PER_BOARD = 8
+# keys, scores, depths, bounds, moves and ages are stored in parallel arrays
+BYTES_PER_ENTRY = 8 + 8 + 2 + 1 + 2 + 1
+SLOTS_PER_BUCKET = 2
+DEPTH_PREFERRED_SLOT = 0
+ALWAYS_REPLACE_SLOT = 1
+EMPTY_DEPTH = -1
+NO_MOVE = 0
+
+# Seeded so that hashes are stable between runs and processes.
+_zobrist_random = random.Random(ZOBRIST_SEED)
+# Indexed by [color][square]
+ZOBRIST_PAWNS: List[List[int]] = [[_zobrist_random.getrandbits(64) for _ in chess.SQUARES] for _ in chess.COLORS]
+ZOBRIST_BLACK_TO_MOVE: int = _zobrist_random.getrandbits(64)
+ZOBRIST_EN_PASSANT: List[int] = [_zobrist_random.getrandbits(64) for _ in chess.FILE_NAMES]
+ZOBRIST_BLACK_PERSPECTIVE: int = _zobrist_random.getrandbits(64)
+
+
+def _build_byte_table(color: chess.Color) -> List[List[int]]:
+    # XOR of the pawn keys for every value one byte of a bitboard can take,
+    # so that hashing a bitboard needs 8 lookups instead of one per pawn.
+    table = []
+    for byte_index in range(BYTES_PER_BOARD):
+        keys = [0] * 256
+        for value in range(1, 256):
+            low_bit = value & -value
+            square = byte_index * 8 + low_bit.bit_length() - 1
+            keys[value] = keys[value ^ low_bit] ^ ZOBRIST_PAWNS[color][square]
+        table.append(keys)
+    return table
+
+ZOBRIST_BYTES: List[List[List[int]]] = [_build_byte_table(color) for color in (chess.BLACK, chess.WHITE)]
+
+
+def zobrist_hash_bitboards(white: int, black: int, turn: chess.Color, ep_file: int=None) -> int:
+    key = 0
+    white_bytes = ZOBRIST_BYTES[chess.WHITE]
+    black_bytes = ZOBRIST_BYTES[chess.BLACK]
+    for byte_index in range(BYTES_PER_BOARD):
+        shift = byte_index * 8
+        key ^= white_bytes[byte_index][(white >> shift) & 0xff]
+        key ^= black_bytes[byte_index][(black >> shift) & 0xff]
+    if turn == chess.BLACK:
+        key ^= ZOBRIST_BLACK_TO_MOVE
+    if ep_file is not None:
+        key ^= ZOBRIST_EN_PASSANT[ep_file]
+    return key
+
+
+def capturable_en_passant_file(board: chess.Board) -> int:
+    # Only hash the en passant square when a capture is actually possible,
+    # otherwise every double push would hide a transposition.
+    if board.ep_square is None:
+        return None
+    attackers = chess.BB_PAWN_ATTACKS[not board.turn][board.ep_square] & board.occupied_co[board.turn]
+    return chess.square_file(board.ep_square) if attackers else None
+
+
+def zobrist_hash(board: chess.Board) -> int:
+    return zobrist_hash_bitboards(
+        white=board.occupied_co[chess.WHITE],
+        black=board.occupied_co[chess.BLACK],
+        turn=board.turn,
+        ep_file=capturable_en_passant_file(board)
+    )
+
+
+def encode_move(move: Move) -> int:
+    if move is None:
+        return NO_MOVE
+    return move.from_square | (move.to_square << 6) | ((move.promotion or 0) << 12)
+
+
+def decode_move(code: int) -> Move:
+    if code == NO_MOVE:
+        return None
+    promotion = code >> 12
+    return Move(code & 63, (code >> 6) & 63, promotion if promotion else None)
+
+
+class Bound(Enum):
+    EXACT = 0
+    LOWER = 1
+    UPPER = 2
+
+_BOUNDS = list(Bound)
+_SCORE_FORMAT = struct.Struct('<d')
+_SCORE_BITS_FORMAT = struct.Struct('<Q')
+
+
+@dataclass
+class TranspositionEntry:
+    depth: int
+    score: float
+    bound: Bound
+    best_move: Move
+
+
+def _number_of_buckets(size_in_bytes: int) -> int:
+    if size_in_bytes < BYTES_PER_ENTRY * SLOTS_PER_BUCKET:
+        raise ValueError("Transposition table needs at least " +
+            str(BYTES_PER_ENTRY * SLOTS_PER_BUCKET) + " bytes")
+    return 1 << ((size_in_bytes // (BYTES_PER_ENTRY * SLOTS_PER_BUCKET)).bit_length() - 1)
+
+
+class TranspositionTable:
+    # Each bucket has a depth-preferred slot that keeps the deepest result seen
+    # for the current search and an always-replace slot for everything else.
+    # The arrays can be laid over a shared buffer so that several processes use one table.
+    # Processes write to it without locks, so the stored key is XORed with the rest of
+    # the entry and an entry that was torn by two concurrent writes no longer matches its key.
+    def __init__(self, size_in_bytes: int, buffer: Any=None) -> None:
+        number_of_buckets = _number_of_buckets(size_in_bytes)
+        self.__mask = number_of_buckets - 1
+        self.size = number_of_buckets * SLOTS_PER_BUCKET
+        if buffer is None:
+            self.keys = np.zeros(self.size, dtype=np.uint64)
+            self.scores = np.zeros(self.size, dtype=np.float64)
+            self.depths = np.full(self.size, EMPTY_DEPTH, dtype=np.int16)
+            self.bounds = np.zeros(self.size, dtype=np.int8)
+            self.moves = np.zeros(self.size, dtype=np.uint16)
+            self.ages = np.zeros(self.size, dtype=np.uint8)
+        else:
+            # Largest items first so every array is aligned. The owner of the buffer calls clear().
+            arrays = []
+            offset = 0
+            for dtype in [np.uint64, np.float64, np.int16, np.uint16, np.int8, np.uint8]:
+                arrays.append(np.ndarray(self.size, dtype=dtype, buffer=buffer, offset=offset))
+                offset += self.size * np.dtype(dtype).itemsize
+            self.keys, self.scores, self.depths, self.moves, self.bounds, self.ages = arrays
+        self.__score_bits = self.scores.view(np.uint64)
+        self.age = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    @staticmethod
+    def bytes_needed(size_in_bytes: int) -> int:
+        # Size of the buffer a table with this memory cap is laid over
+        return _number_of_buckets(size_in_bytes) * SLOTS_PER_BUCKET * BYTES_PER_ENTRY
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.depths != EMPTY_DEPTH))
+
+    def size_in_bytes(self) -> int:
+        return self.size * BYTES_PER_ENTRY
+
+    def new_search(self) -> None:
+        # Entries from earlier searches stay usable but lose their depth priority.
+        self.age = (self.age + 1) & 0xff
+
+    def clear(self) -> None:
+        self.depths.fill(EMPTY_DEPTH)
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def hit_rate(self) -> float:
+        return self.hits / self.probes if self.probes else 0.0
+
+    def probe(self, key: int) -> TranspositionEntry:
+        self.probes += 1
+        first_slot = (key & self.__mask) * SLOTS_PER_BUCKET
+        for slot in range(first_slot, first_slot + SLOTS_PER_BUCKET):
+            depth = int(self.depths[slot])
+            if depth == EMPTY_DEPTH:
+                continue
+            # Read every field once, so the check covers the values that are returned
+            score_bits = int(self.__score_bits[slot])
+            bound = int(self.bounds[slot])
+            move = int(self.moves[slot])
+            if int(self.keys[slot]) ^ _entry_check(depth, score_bits, bound, move) == key:
+                self.hits += 1
+                return TranspositionEntry(
+                    depth=depth,
+                    score=_SCORE_FORMAT.unpack(_SCORE_BITS_FORMAT.pack(score_bits))[0],
+                    bound=_BOUNDS[bound],
+                    best_move=decode_move(move)
+                )
+        return None
+
+    def __stored_key(self, slot: int) -> int:
+        return int(self.keys[slot]) ^ _entry_check(
+            int(self.depths[slot]), int(self.__score_bits[slot]), int(self.bounds[slot]), int(self.moves[slot]))
+
+    def store(self, key: int, depth: int, score: float, bound: Bound, best_move: Move) -> None:
+        self.stores += 1
+        first_slot = (key & self.__mask) * SLOTS_PER_BUCKET
+        slot = first_slot + DEPTH_PREFERRED_SLOT
+        stored_depth = self.depths[slot]
+        replace_depth_preferred = stored_depth == EMPTY_DEPTH or \
+            self.__stored_key(slot) == key or \
+            self.ages[slot] != self.age or \
+            depth >= stored_depth
+        if not replace_depth_preferred:
+            slot = first_slot + ALWAYS_REPLACE_SLOT
+        move = encode_move(best_move)
+        self.scores[slot] = score
+        self.depths[slot] = depth
+        self.bounds[slot] = bound.value
+        self.moves[slot] = move
+        self.ages[slot] = self.age
+        self.keys[slot] = key ^ _entry_check(depth, int(self.__score_bits[slot]), bound.value, move)
+
+
+def _entry_check(depth: int, score_bits: int, bound: int, move: int) -> int:
+    return score_bits ^ (depth & 0xffff) ^ (bound << 16) ^ (move << 24)
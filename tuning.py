@@ -0,0 +1,195 @@
+import argparse
+import chess
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from heuristics import DEFAULT_WEIGHTS, Heuristic, Heuristics
+import json
+from minimaxchessplayer import MinimaxPlayer, ALPHA_DEFAULT, BETA_DEFAULT
+import numpy as np
+from pawnboard import PawnBoard
+import random
+import time
+from tqdm import tqdm
+from typing import Dict, List
+
+STARTING_FEN = '8/pppppppp/8/8/8/8/PPPPPPPP/8 w - - 0 1'
+# Columns of a training matrix: the feature behind every heuristic, counted for the side to
+# move in the units DEFAULT_WEIGHTS weighs, followed by the result of the game for that side
+FEATURES: List[Heuristic] = list(Heuristic)
+RESULT = len(FEATURES)
+# Results in half points
+LOSS, DRAW, WIN = 0, 1, 2
+# Games that have not ended by then are scored as draws
+MAX_PLIES = 200
+GAMES_PER_TASK = 32
+RANDOM_MOVE_RATE = 0.1
+# Plies the self-play player searches. The heuristics only look at the pawns of the player, so
+# at one ply it walks past enemy pawns that are about to promote and the side with fewer pawns
+# wins most games. From two plies on the results follow the material, as they should.
+SELF_PLAY_DEPTH = 2
+# Tasks waiting in the pool per worker, so results stream in without queueing the whole run
+TASKS_PER_WORKER = 2
+# Factors between evaluation and the logit of the expected result that fit_scale tries
+SCALE_CANDIDATES = np.geomspace(1e-4, 1.0, 200)
+# One heuristic at a weight of 1 each, so evaluate_batch counts the feature behind it
+UNIT_HEURISTICS: Dict[Heuristic, Heuristics] = {heuristic: Heuristics([heuristic], weights={heuristic: 1}) for heuristic in FEATURES}
+
+
+def feature_matrix(white: np.ndarray, black: np.ndarray, turn: np.ndarray) -> np.ndarray:
+    # Features of positions given as arrays of occupancy bitboards and sides to move. Weighted by
+    # DEFAULT_WEIGHTS they add up to return_heuristic_value with every heuristic.
+    white = np.asarray(white, dtype=np.uint64)
+    black = np.asarray(black, dtype=np.uint64)
+    turn = np.asarray(turn, dtype=bool)
+    features = np.zeros((len(white), len(FEATURES)), dtype=np.int64)
+    for color in chess.COLORS:
+        positions = turn == color
+        if not positions.any():
+            continue
+        for column, heuristic in enumerate(FEATURES):
+            features[positions, column] = UNIT_HEURISTICS[heuristic].evaluate_batch(white[positions], black[positions], color)
+    return features
+
+
+def self_play(seed: int, games: int, depth: int=SELF_PLAY_DEPTH, random_move_rate: float=RANDOM_MOVE_RATE) -> np.ndarray:
+    # Training rows of games of a MinimaxPlayer with every heuristic against itself, which plays a
+    # random move at random_move_rate so the games differ. Every position a move is played from is
+    # a row, scored with the result of its game. Won pawn races are seen below the root.
+    generator = random.Random(seed)
+    np.random.seed(generator.getrandbits(32))
+    player = MinimaxPlayer(time, depth=depth, heuristics=list(Heuristic), run_alpha_beta=depth > 1, pawn_board=True, race_detection=True)
+    whites, blacks, turns, results = [], [], [], []
+    for _ in range(games):
+        board = PawnBoard.from_fen(STARTING_FEN)
+        first_row = len(turns)
+        for _ in range(MAX_PLIES):
+            moves = board.legal_moves
+            if board.outcome() is not None or not moves:
+                break
+            whites.append(board.white)
+            blacks.append(board.black)
+            turns.append(board.turn)
+            if generator.random() < random_move_rate:
+                move = generator.choice(moves)
+            else:
+                _, move = player.negamax(board=board, depth=depth, alpha=ALPHA_DEFAULT, beta=BETA_DEFAULT, maximizer=board.turn)
+            board.push(move)
+        outcome = board.outcome()
+        for row in range(first_row, len(turns)):
+            if outcome is None:
+                results.append(DRAW)
+            else:
+                results.append(WIN if outcome.winner == turns[row] else LOSS)
+    rows = np.empty((len(turns), RESULT + 1), dtype=np.int32)
+    rows[:, :RESULT] = feature_matrix(np.array(whites, dtype=np.uint64), np.array(blacks, dtype=np.uint64), np.array(turns, dtype=bool))
+    rows[:, RESULT] = results
+    return rows
+
+
+def extract(path: str, positions: int, workers: int=1, depth: int=SELF_PLAY_DEPTH, random_move_rate: float=RANDOM_MOVE_RATE,
+        seed: int=0, games_per_task: int=GAMES_PER_TASK) -> np.ndarray:
+    # Writes a training matrix of positions rows to the .npy file at path, as the self-play tasks
+    # finish. Tasks are seeded by their number and taken in order, so the matrix does not depend
+    # on the number of workers, and at most TASKS_PER_WORKER tasks per worker wait for a result.
+    matrix = np.lib.format.open_memmap(path, mode='w+', dtype=np.int32, shape=(positions, RESULT + 1))
+    task_seeds = (seed * (1 << 32) + task for task in range(1 << 32))
+    filled = 0
+    progress = tqdm(total=positions, unit="positions")
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        pending = deque()
+        while filled < positions:
+            while executor is not None and len(pending) < workers * TASKS_PER_WORKER:
+                pending.append(executor.submit(self_play, next(task_seeds), games_per_task, depth, random_move_rate))
+            rows = pending.popleft().result() if executor is not None else \
+                self_play(next(task_seeds), games_per_task, depth, random_move_rate)
+            rows = rows[:positions - filled]
+            matrix[filled:filled + len(rows)] = rows
+            filled += len(rows)
+            progress.update(len(rows))
+    finally:
+        progress.close()
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    matrix.flush()
+    return matrix
+
+
+def texel_loss(scores: np.ndarray, results: np.ndarray, scale: float) -> float:
+    # Mean squared difference between the results and the expected results the scores predict
+    expected = 1 / (1 + np.exp(-scale * scores))
+    return float(np.mean((results / 2 - expected) ** 2))
+
+
+def fit_scale(features: np.ndarray, results: np.ndarray, weights: np.ndarray) -> float:
+    # The factor under which the evaluation with weights predicts the results best
+    scores = features @ weights
+    losses = [texel_loss(scores, results, scale) for scale in SCALE_CANDIDATES]
+    return float(SCALE_CANDIDATES[int(np.argmin(losses))])
+
+
+def fit_weights(features: np.ndarray, results: np.ndarray, iterations: int=500, learning_rate: float=0.01) -> np.ndarray:
+    # The logit of the expected result per unit of every feature, minimizing texel_loss at a scale
+    # of 1 by Adam full batch gradient descent from all zeros
+    features = np.asarray(features, dtype=np.float64)
+    targets = np.asarray(results, dtype=np.float64) / 2
+    weights = np.zeros(features.shape[1])
+    first_moment, second_moment = np.zeros_like(weights), np.zeros_like(weights)
+    beta1, beta2, epsilon = 0.9, 0.999, 1e-12
+    for iteration in range(1, iterations + 1):
+        expected = 1 / (1 + np.exp(-(features @ weights)))
+        gradient = features.T @ (2 * (expected - targets) * expected * (1 - expected)) / len(features)
+        first_moment = beta1 * first_moment + (1 - beta1) * gradient
+        second_moment = beta2 * second_moment + (1 - beta2) * gradient ** 2
+        step = first_moment / (1 - beta1 ** iteration) / (np.sqrt(second_moment / (1 - beta2 ** iteration)) + epsilon)
+        weights -= learning_rate * step
+    return weights
+
+
+def evaluation_weights(logit_weights: np.ndarray) -> np.ndarray:
+    # Evaluations only need to rank positions, so the fitted weights are scaled until the largest
+    # is as large as the largest default weight, which keeps them apart once they are rounded
+    largest_default = max(abs(weight) for weight in DEFAULT_WEIGHTS.values())
+    largest = np.max(np.abs(logit_weights))
+    return logit_weights * (largest_default / largest) if largest > 0 else logit_weights
+
+
+def write_weight_profile(path: str, weights: np.ndarray) -> Dict[str, int]:
+    # Weights are rounded, as evaluations are whole numbers
+    profile = {heuristic.name: int(round(weight)) for heuristic, weight in zip(FEATURES, weights)}
+    with open(path, 'w') as file:
+        json.dump(profile, file, indent=4)
+    return profile
+
+
+def tune(data_path: str, profile_path: str, iterations: int=500, learning_rate: float=0.01) -> Dict[str, int]:
+    matrix = np.load(data_path, mmap_mode='r')
+    features, results = np.asarray(matrix[:, :RESULT], dtype=np.float64), np.asarray(matrix[:, RESULT])
+    default_weights = np.array([DEFAULT_WEIGHTS[heuristic] for heuristic in FEATURES], dtype=np.float64)
+    logit_weights = fit_weights(features, results, iterations, learning_rate)
+    weights = evaluation_weights(logit_weights)
+    print("loss of the default weights:", texel_loss(features @ default_weights, results, fit_scale(features, results, default_weights)),
+        "tuned:", texel_loss(features @ logit_weights, results, 1.0))
+    return write_weight_profile(profile_path, weights)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Tune the weights of the heuristics on self-play games")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    extract_parser = subparsers.add_parser('extract', help="write a training matrix of self-play positions to a .npy file")
+    extract_parser.add_argument('data')
+    extract_parser.add_argument('--positions', type=int, default=1000000)
+    extract_parser.add_argument('--workers', type=int, default=1)
+    extract_parser.add_argument('--depth', type=int, default=SELF_PLAY_DEPTH)
+    extract_parser.add_argument('--random-move-rate', type=float, default=RANDOM_MOVE_RATE)
+    extract_parser.add_argument('--seed', type=int, default=0)
+    fit_parser = subparsers.add_parser('fit', help="fit the weights to a training matrix and write a weight profile")
+    fit_parser.add_argument('data')
+    fit_parser.add_argument('profile')
+    fit_parser.add_argument('--iterations', type=int, default=500)
+    fit_parser.add_argument('--learning-rate', type=float, default=0.01)
+    arguments = parser.parse_args()
+    if arguments.command == 'extract':
+        extract(arguments.data, arguments.positions, arguments.workers, arguments.depth, arguments.random_move_rate, arguments.seed)
+    else:
+        print(tune(arguments.data, arguments.profile, arguments.iterations, arguments.learning_rate))